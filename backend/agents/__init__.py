@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# .env proses üzrə bir dəfə - hər hansı agent modulundan əvvəl oxunur
+load_dotenv()
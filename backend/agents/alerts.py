@@ -0,0 +1,430 @@
+'''Server tərəfində AQI xəbərdarlıq abunələri.
+
+Abunə: (rayon, metrik, hədd, xəstəlik profili) və çatdırılma yeri -
+webhook URL-i və ya lokal sink. Hər yeni snapshot-da yalnız dəyəri
+dəyişən (rayon, metrik) cütləri yoxlanılır: hədlər hər cüt üçün
+sıralanmış massivdə saxlanılır və əvvəlki ilə yeni dəyər arasında qalan
+hədlər bisect ilə tapılır - abunə sayından asılı olmayaraq yalnız
+keçilən hədlərə toxunulur.
+
+Hədd yuxarı keçiləndə 'above', aşağı düşəndə 'below' hadisəsi yaranır.
+Çatdırılma ayrı pool-dadır, poller thread-i gözləmir: webhook-a URL
+başına bir POST ({'events': [...]}), lokal sink-ə isə yaddaşdakı son
+hadisələr və ALERTS_SINK_FILE verilibsə JSONL fayl.
+
+Abunələr və lokal sink hadisələri default olaraq SQLite-da (ALERTS_DB,
+data/alerts.db) saxlanılır - bütün gunicorn worker-ləri eyni abunələri
+və hadisələri görür; hadisələri yalnız fayl kilidini tutan bir worker
+göndərir (təkrar çatdırılma olmur). ALERTS_DB= (boş) yaddaş rejimidir
+və yalnız bir worker üçün yararlıdır.
+'''
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from agents.history_store import METRICS
+from agents.http_client import DEFAULT_TIMEOUT, get_shared_session
+from agents.log import get_logger
+from agents.metrics import REGISTRY
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = get_logger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS subscriptions (
+    id TEXT PRIMARY KEY,
+    district TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    condition TEXT NOT NULL DEFAULT '',
+    webhook TEXT,
+    created REAL NOT NULL,
+    seq INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS subscriptions_seq ON subscriptions (seq);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    subscription TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+'''
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'alerts.db')
+
+# Hədd verilməyəndə: xəstəlik profili olanlar üçün həssas qrup sərhədi
+DEFAULT_THRESHOLD = 150
+SENSITIVE_THRESHOLD = 100
+
+EVALUATION_SECONDS = REGISTRY.histogram(
+    'alert_evaluation_seconds', 'Bir snapshot-un abunələrə qarşı yoxlanma müddəti', (),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5))
+EVENTS = REGISTRY.counter('alert_events_total', 'Yaranan xəbərdarlıq hadisələri', ('direction',))
+DELIVERIES = REGISTRY.counter('alert_deliveries_total', 'Çatdırılma cəhdləri', ('sink', 'result'))
+
+
+class Subscription:
+    __slots__ = ('id', 'district', 'metric', 'threshold', 'condition', 'webhook', 'created')
+
+    def __init__(self, id, district, metric, threshold, condition='', webhook=None, created=None):
+        self.id = id
+        self.district = district
+        self.metric = metric
+        self.threshold = threshold
+        self.condition = condition
+        self.webhook = webhook
+        self.created = created if created is not None else time.time()
+
+    @property
+    def key(self):
+        return (self.district, self.metric)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ThresholdIndex:
+    '''(rayon, metrik) üzrə artan sırada hədlər və paralel id massivi'''
+
+    def __init__(self):
+        self._thresholds = {}  # key -> [hədd, ...] sıralı
+        self._ids = {}  # key -> [id, ...] eyni sıra ilə
+
+    def add(self, key, threshold, sub_id):
+        thresholds = self._thresholds.setdefault(key, [])
+        ids = self._ids.setdefault(key, [])
+        pos = bisect.bisect_right(thresholds, threshold)
+        thresholds.insert(pos, threshold)
+        ids.insert(pos, sub_id)
+
+    def remove(self, key, threshold, sub_id):
+        thresholds = self._thresholds.get(key)
+        if not thresholds:
+            return False
+        ids = self._ids[key]
+        pos = bisect.bisect_left(thresholds, threshold)
+        while pos < len(thresholds) and thresholds[pos] == threshold:
+            if ids[pos] == sub_id:
+                del thresholds[pos]
+                del ids[pos]
+                return True
+            pos += 1
+        return False
+
+    def bulk_load(self, items):
+        '''[(key, hədd, id)] - bir dəfə sıralanır (başlanğıcda yükləmə üçün)'''
+        grouped = {}
+        for key, threshold, sub_id in items:
+            grouped.setdefault(key, []).append((threshold, sub_id))
+        for key, pairs in grouped.items():
+            pairs.extend(zip(self._thresholds.get(key, ()), self._ids.get(key, ())))
+            pairs.sort(key=lambda pair: pair[0])
+            self._thresholds[key] = [threshold for threshold, _ in pairs]
+            self._ids[key] = [sub_id for _, sub_id in pairs]
+
+    def crossed(self, key, previous, current):
+        '''previous -> current dəyişəndə keçilən hədlərin id-ləri və istiqamət.
+
+        Yuxarı: previous < hədd <= current ('above'); aşağı: current < hədd <= previous ('below').
+        '''
+        thresholds = self._thresholds.get(key)
+        if not thresholds or previous == current:
+            return [], None
+        low, high, direction = (previous, current, 'above') if current > previous else \
+            (current, previous, 'below')
+        start = bisect.bisect_right(thresholds, low)
+        end = bisect.bisect_right(thresholds, high)
+        return self._ids[key][start:end], direction
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._ids.values())
+
+
+class AlertEngine:
+    '''Snapshot abunəçisi: keçilən hədlər üçün hadisə yaradıb çatdırır'''
+
+    def __init__(self, locations, path=None, max_subscriptions=None, webhook_hosts=None,
+                 sink_file=None, recent=None):
+        self.locations = locations
+        self.path = path if path is not None else os.getenv('ALERTS_DB', DEFAULT_DB)
+        self.max_subscriptions = max_subscriptions or int(os.getenv('ALERTS_MAX_SUBSCRIPTIONS', 500_000))
+        hosts = webhook_hosts if webhook_hosts is not None else \
+            os.getenv('ALERTS_WEBHOOK_HOSTS', 'localhost,127.0.0.1')
+        # Webhook yalnız icazə verilən host-lara (daxili şəbəkəyə ixtiyari sorğu olmasın)
+        self.webhook_hosts = {host.strip() for host in hosts.split(',') if host.strip()}
+        self.sink_file = sink_file if sink_file is not None else os.getenv('ALERTS_SINK_FILE')
+        self.recent = deque(maxlen=recent or int(os.getenv('ALERTS_RECENT', 1000)))
+        self.index = ThresholdIndex()
+        self._subscriptions = {}
+        self._last = {}  # (rayon, metrik) -> son dəyər
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._seq = 0  # SQLite-dan oxunan son dəyişiklik
+        self._event_seq = 0
+        self._lock_file = None
+        # Snapshot-lar ardıcıl çatdırılır (eyni URL-ə 'above' 'below'-dan sonra gəlməsin),
+        # bir snapshot daxilində isə URL-lər paralel
+        self._dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='alert-dispatch')
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('ALERTS_DELIVERY_WORKERS', 4)), thread_name_prefix='alert-delivery')
+        self.delivered = 0
+        self.failed = 0
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn().executescript(SCHEMA)
+            self._sync()
+        elif int(os.getenv('WEB_CONCURRENCY', 1)) > 1:
+            log.warning('Xeberdarliq abuneleri yaddasdadir, amma bir nece worker var - '
+                        'abune/hadiseler worker-ler arasinda paylasilmir; ALERTS_DB verin',
+                        workers=os.getenv('WEB_CONCURRENCY'))
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # --- abunələr ---
+
+    def subscribe(self, district, metric='aqi', threshold=None, condition='', webhook=None):
+        '''Yeni abunə; yanlış parametrlərdə ValueError'''
+        if district not in self.locations:
+            raise ValueError('Rayon tapılmadı')
+        if metric not in METRICS:
+            raise ValueError(f"metric bunlardan biri olmalıdır: {', '.join(METRICS)}")
+        condition = str(condition or '')[:64]
+        if threshold is None:
+            if metric != 'aqi':
+                raise ValueError('threshold lazımdır')
+            threshold = SENSITIVE_THRESHOLD if condition else DEFAULT_THRESHOLD
+        try:
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            raise ValueError('threshold rəqəm olmalıdır') from None
+        if not 0 < threshold < 100_000:
+            raise ValueError('threshold aralıqdan kənardır')
+        if webhook is not None:
+            parsed = urlparse(str(webhook))
+            if parsed.scheme not in ('http', 'https') or parsed.hostname not in self.webhook_hosts:
+                raise ValueError('webhook host-una icazə yoxdur')
+            webhook = str(webhook)
+
+        subscription = Subscription(uuid.uuid4().hex, district, metric, threshold, condition, webhook)
+        # Limit yoxlaması və əlavə bir kilid altında - paralel abunələr limiti birlikdə keçməsin
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscriptions:
+                raise ValueError('Abunə limiti dolub')
+            if self.path:
+                conn = self._conn()
+                with conn:
+                    conn.execute(
+                        'INSERT INTO subscriptions (id, district, metric, threshold, condition, webhook, created, seq) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM subscriptions))',
+                        (subscription.id, district, metric, threshold, condition, webhook, subscription.created))
+            self._add(subscription)
+        return subscription
+
+    def unsubscribe(self, sub_id):
+        if self.path:
+            conn = self._conn()
+            with conn:
+                cursor = conn.execute(
+                    'UPDATE subscriptions SET deleted = 1, '
+                    'seq = (SELECT MAX(seq) + 1 FROM subscriptions) WHERE id = ? AND deleted = 0', (sub_id,))
+            if not cursor.rowcount:
+                return False
+        with self._lock:
+            removed = self._remove(sub_id)
+        # SQLite-da silinibsə (abunə başqa worker-də yaradılıb olsa da) uğurludur
+        return removed or bool(self.path)
+
+    def get(self, sub_id):
+        if self.path:
+            self._sync()
+        return self._subscriptions.get(sub_id)
+
+    def current_value(self, subscription):
+        return self._last.get(subscription.key)
+
+    def _add(self, subscription):
+        # self._lock tutulub
+        if subscription.id in self._subscriptions:
+            return
+        self._subscriptions[subscription.id] = subscription
+        self.index.add(subscription.key, subscription.threshold, subscription.id)
+
+    def _remove(self, sub_id):
+        # self._lock tutulub
+        subscription = self._subscriptions.pop(sub_id, None)
+        if subscription is None:
+            return False
+        self.index.remove(subscription.key, subscription.threshold, sub_id)
+        return True
+
+    def _sync(self):
+        '''Başqa worker-lərin əlavə/sildiyi abunələri SQLite-dan götür (yalnız dəyişikliklər)'''
+        rows = self._conn().execute(
+            'SELECT id, district, metric, threshold, condition, webhook, created, seq, deleted '
+            'FROM subscriptions WHERE seq > ? ORDER BY seq', (self._seq,)).fetchall()
+        if not rows:
+            return
+        with self._lock:
+            added = []
+            for sub_id, district, metric, threshold, condition, webhook, created, seq, deleted in rows:
+                self._seq = max(self._seq, seq)
+                if deleted:
+                    self._remove(sub_id)
+                elif sub_id not in self._subscriptions:
+                    subscription = Subscription(sub_id, district, metric, threshold, condition, webhook, created)
+                    self._subscriptions[sub_id] = subscription
+                    added.append((subscription.key, threshold, sub_id))
+            # Çox sətir gələndə (başlanğıc) hər birini ayrıca insert etmək əvəzinə bir dəfə sırala
+            self.index.bulk_load(added)
+
+    # --- yoxlama ---
+
+    def _is_leader(self):
+        '''Çox worker-li rejimdə hadisələri yalnız fayl kilidini tutan worker göndərir'''
+        if not self.path or fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        log.info('Xeberdarliq gonderen worker', pid=os.getpid())
+        return True
+
+    def evaluate(self, snapshot):
+        '''Snapshot-dakı dəyişən dəyərlər üçün keçilən hədlər -> hadisələr'''
+        start = time.perf_counter()
+        if self.path:
+            self._sync()
+        leader = self._is_leader()
+        events = []
+        by_webhook = {}  # webhook (None - lokal sink) -> hadisələr
+        now = time.time()
+        with self._lock:
+            for district, reading in snapshot.data.items():
+                if snapshot.status.get(district) == 'stale':
+                    # Köhnə dəyər yeni ölçü deyil
+                    continue
+                for metric in METRICS:
+                    value = reading.get(metric)
+                    if value is None:
+                        continue
+                    key = (district, metric)
+                    previous = self._last.get(key)
+                    self._last[key] = value
+                    if previous is None or not leader:
+                        continue
+                    ids, direction = self.index.crossed(key, previous, value)
+                    for sub_id in ids:
+                        subscription = self._subscriptions[sub_id]
+                        event = {
+                            'subscription': sub_id,
+                            'district': district,
+                            'metric': metric,
+                            'threshold': subscription.threshold,
+                            'value': value,
+                            'previous': previous,
+                            'direction': direction,
+                            'condition': subscription.condition,
+                            'ts': now,
+                        }
+                        events.append(event)
+                        by_webhook.setdefault(subscription.webhook, []).append(event)
+        EVALUATION_SECONDS.observe(time.perf_counter() - start)
+        if events:
+            for direction in ('above', 'below'):
+                count = sum(1 for event in events if event['direction'] == direction)
+                if count:
+                    EVENTS.inc(count, direction=direction)
+            log.info('Xeberdarliqlar yarandi', events=len(events), version=snapshot.version)
+            self._dispatcher.submit(self._deliver, by_webhook)
+        return events
+
+    # --- çatdırılma ---
+
+    def _deliver(self, by_webhook):
+        local = by_webhook.pop(None, None)
+        if local:
+            self._deliver_local(local)
+        wait([self._executor.submit(self._post, url, batch) for url, batch in by_webhook.items()])
+
+    def _post(self, url, batch):
+        try:
+            response = get_shared_session().post(url, json={'events': batch}, timeout=DEFAULT_TIMEOUT)
+            response.raise_for_status()
+            self.delivered += len(batch)
+            DELIVERIES.inc(len(batch), sink='webhook', result='ok')
+        except Exception as e:
+            self.failed += len(batch)
+            DELIVERIES.inc(len(batch), sink='webhook', result='error')
+            log.warning('Webhook catdirilmadi', url=url, events=len(batch), error=str(e))
+
+    def _deliver_local(self, events):
+        if self.path:
+            # Hadisələr bütün worker-lərdən oxunsun deyə SQLite-a; yalnız son ALERTS_RECENT saxlanılır
+            conn = self._conn()
+            with conn:
+                for event in events:
+                    cursor = conn.execute('INSERT INTO events (subscription, body) VALUES (?, ?)',
+                                          (event['subscription'], json.dumps(event, ensure_ascii=False)))
+                    event['seq'] = cursor.lastrowid
+                conn.execute('DELETE FROM events WHERE seq <= ?', (events[-1]['seq'] - self.recent.maxlen,))
+        else:
+            with self._lock:
+                for event in events:
+                    self._event_seq += 1
+                    event['seq'] = self._event_seq
+                    self.recent.append(event)
+        if self.sink_file:
+            try:
+                with open(self.sink_file, 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(event, ensure_ascii=False) + '\n' for event in events)
+            except OSError as e:
+                log.warning('Xeberdarliq faylina yazilmadi', path=self.sink_file, error=str(e))
+        self.delivered += len(events)
+        DELIVERIES.inc(len(events), sink='local', result='ok')
+
+    def recent_events(self, since=0, subscription=None):
+        '''Lokal sink-dəki son hadisələr (seq > since)'''
+        if self.path:
+            query = 'SELECT seq, body FROM events WHERE seq > ?'
+            params = [since]
+            if subscription is not None:
+                query += ' AND subscription = ?'
+                params.append(subscription)
+            rows = self._conn().execute(query + ' ORDER BY seq LIMIT ?', (*params, self.recent.maxlen))
+            return [dict(json.loads(body), seq=seq) for seq, body in rows]
+        with self._lock:
+            return [event for event in self.recent
+                    if event['seq'] > since and (subscription is None or event['subscription'] == subscription)]
+
+    def stats(self):
+        return {
+            'subscriptions': len(self._subscriptions),
+            'keys': len(self._last),
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'leader': self._lock_file is not None or not self.path or fcntl is None,
+        }
@@ -0,0 +1,120 @@
+'''EPA üslubunda AQI hesablanması - NumPy ilə, bütün massivlər üzərində.
+
+OpenWeather konsentrasiyaları µg/m³ ilə verir. CO, NO2 və O3 EPA
+cədvəllərinə uyğun olaraq ppm/ppb-yə çevrilir (25°C, 1 atm). Hər
+çirkləndirici üçün sub-indeks breakpoint interpolyasiyası ilə tapılır,
+AQI isə onların maksimumudur.
+'''
+import numpy as np
+
+POLLUTANTS = ('pm2_5', 'pm10', 'co', 'no2', 'o3')
+
+# µg/m³ -> EPA vahidi (molar həcm 24.45 L / molekulyar kütlə)
+UNIT_FACTORS = {
+    'pm2_5': 1.0,                   # µg/m³
+    'pm10': 1.0,                    # µg/m³
+    'co': 24.45 / 28.01 / 1000,     # ppm
+    'no2': 24.45 / 46.01,           # ppb
+    'o3': 24.45 / 48.00,            # ppb
+}
+
+# EPA-nın kəsmə qaydası: konsentrasiya bu addımla aşağı yuvarlaqlaşdırılır
+TRUNCATION = {'pm2_5': 0.1, 'pm10': 1.0, 'co': 0.1, 'no2': 1.0, 'o3': 1.0}
+
+# (C_lo, C_hi, I_lo, I_hi)
+BREAKPOINTS = {
+    'pm2_5': [(0.0, 9.0, 0, 50), (9.1, 35.4, 51, 100), (35.5, 55.4, 101, 150),
+              (55.5, 125.4, 151, 200), (125.5, 225.4, 201, 300), (225.5, 325.4, 301, 500)],
+    'pm10': [(0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150),
+             (255, 354, 151, 200), (355, 424, 201, 300), (425, 604, 301, 500)],
+    'co': [(0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150),
+           (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300), (30.5, 50.4, 301, 500)],
+    'no2': [(0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150),
+            (361, 649, 151, 200), (650, 1249, 201, 300), (1250, 2049, 301, 500)],
+    # 8 saatlıq O3 cədvəli; 200 ppb-dən yuxarı 1 saatlıq cədvəlin yuxarı hissəsi
+    'o3': [(0, 54, 0, 50), (55, 70, 51, 100), (71, 85, 101, 150),
+           (86, 105, 151, 200), (106, 200, 201, 300), (201, 604, 301, 500)],
+}
+
+_TABLES = {p: np.array(BREAKPOINTS[p], dtype=np.float64).T for p in POLLUTANTS}
+# Hər bucket üçün hazır interpolyasiya əmsalları: I = slope * (C - C_lo) + I_lo
+_SLOPES = {p: (t[3] - t[2]) / (t[1] - t[0]) for p, t in _TABLES.items()}
+
+
+def _raw_sub_index(pollutant, concentrations):
+    c_lo, c_hi, i_lo, _ = _TABLES[pollutant]
+    step = TRUNCATION[pollutant]
+    # Vahid çevrilməsi və EPA kəsməsi bir addımda
+    c = np.floor(np.maximum(np.asarray(concentrations, dtype=np.float64),
+                            0) * (UNIT_FACTORS[pollutant] / step) + 1e-9) * step
+    # c step şəbəkəsindədir; yarım addım tolerans float xətasını udur
+    idx = np.searchsorted(c_hi + step / 2, c, side='left')
+    np.minimum(idx, len(c_hi) - 1, out=idx)
+    return _SLOPES[pollutant][idx] * (c - c_lo[idx]) + i_lo[idx]
+
+
+def sub_index(pollutant, concentrations):
+    '''Bir çirkləndiricinin sub-indeksləri (µg/m³ massivi -> AQI massivi)'''
+    return np.clip(np.rint(_raw_sub_index(pollutant, concentrations)), 0, 500)
+
+
+def compute(pm2_5, pm10, co, no2, o3):
+    '''Bütün massivlər üçün (aqi, dominant_index) qaytarır.
+
+    Parametrlər eyni formalı massivlərdir (rayonlar, proqnoz saatları və ya
+    tarixçə sətirləri). NaN olan çirkləndirici nəzərə alınmır.
+    '''
+    aqi = None
+    dominant = None
+    for k, (pollutant, values) in enumerate(zip(POLLUTANTS, (pm2_5, pm10, co, no2, o3))):
+        si = _raw_sub_index(pollutant, values)
+        if aqi is None:
+            aqi = np.nan_to_num(si, nan=-1.0)
+            dominant = np.zeros(aqi.shape, dtype=np.int8)
+            continue
+        # NaN müqayisəsi False verir - olmayan çirkləndirici seçilmir
+        better = si > aqi
+        np.copyto(aqi, si, where=better)
+        np.copyto(dominant, k, where=better)
+    return np.clip(np.rint(aqi), 0, 500).astype(np.int16), dominant
+
+
+def compute_from_components(components):
+    '''Tək oxunuş: {'pm2_5': ..., ...} -> (aqi, dominant_pollutant)'''
+    aqi, dominant = compute(*(np.array([components.get(p, np.nan)], dtype=np.float64)
+                              for p in POLLUTANTS))
+    return int(aqi[0]), POLLUTANTS[int(dominant[0])]
+
+
+# (yuxarı sərhəd, açar) - AQI kateqoriyaları
+CATEGORIES = [
+    (50, 'good'),
+    (100, 'moderate'),
+    (150, 'unhealthy_sensitive'),
+    (200, 'unhealthy'),
+    (300, 'very_unhealthy'),
+    (500, 'hazardous'),
+]
+
+
+def category(aqi):
+    '''Tək AQI dəyərinin kateqoriya açarı'''
+    for upper, name in CATEGORIES:
+        if aqi <= upper:
+            return name
+    return CATEGORIES[-1][1]
+
+
+def category_range(aqi):
+    '''Kateqoriyanın AQI aralığı, məs. (101, 150)'''
+    lower = 0
+    for upper, _ in CATEGORIES:
+        if aqi <= upper:
+            return lower, upper
+        lower = upper + 1
+    return CATEGORIES[-2][0] + 1, CATEGORIES[-1][0]
+
+
+def dominant_names(dominant):
+    '''dominant indeks massivini çirkləndirici adlarına çevir'''
+    return np.array(POLLUTANTS)[dominant]
@@ -0,0 +1,247 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
+
+from agents.log import get_logger
+from agents.metrics import UPSTREAM_LATENCY, UPSTREAM_REJECTED
+from agents.scheduler import QuotaExceeded
+
+log = get_logger(__name__)
+
+# Upstream üzrə hədlər: bu müddətdən uzun çəkən uğurlu çağırış da xəta sayılır
+BREAKER_DEFAULTS = {
+    'openweather': {'slow_seconds': 3.0, 'open_seconds': 30.0, 'hedge_delay': 0.8},
+    'gemini': {'slow_seconds': 20.0, 'open_seconds': 60.0, 'hedge_delay': None},
+}
+
+
+class CircuitOpen(Exception):
+    '''Upstream üçün breaker açıqdır - sorğu göndərilmədi'''
+
+    def __init__(self, upstream, retry_after):
+        super().__init__(f'{upstream} breaker açıqdır (~{retry_after:.0f}s)')
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    '''closed -> open -> half_open dövrü olan breaker.
+
+    Son window çağırışdan ən azı min_calls olub, xəta (və ya slow_seconds-dan
+    yavaş) payı error_ratio-nu keçəndə breaker açılır və open_seconds ərzində
+    bütün çağırışlar dərhal CircuitOpen alır. Sonra bir sınaq çağırışı
+    buraxılır: uğurludursa bağlanır, deyilsə yenidən açılır.
+    '''
+
+    def __init__(self, name, window=20, min_calls=5, error_ratio=0.5, slow_seconds=3.0,
+                 open_seconds=30.0, hedge_delay=None):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_ratio = error_ratio
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.default_hedge_delay = hedge_delay
+        self._outcomes = deque(maxlen=window)  # True = xəta və ya yavaş
+        self._latencies = deque(maxlen=200)  # uğurlu çağırışların müddəti
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self._probing = False
+        self.calls = 0
+        self.failures = 0
+        self.slow = 0
+        self.rejected = 0
+        self.trips = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def allow(self):
+        '''Çağırışa icazə varmı (half_open-da yalnız bir sınaq)'''
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    UPSTREAM_REJECTED.inc(upstream=self.name)
+                    return False
+                self.state = 'half_open'
+                self._probing = False
+            if self._probing:
+                self.rejected += 1
+                UPSTREAM_REJECTED.inc(upstream=self.name)
+                return False
+            self._probing = True
+            return True
+
+    def retry_after(self):
+        with self._lock:
+            if self.state != 'open':
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+    def record(self, latency, error=False):
+        '''Çağırışın nəticəsini qeyd et; lazım olsa breaker-i aç/bağla'''
+        slow = not error and latency >= self.slow_seconds
+        failure = error or slow
+        UPSTREAM_LATENCY.observe(latency, upstream=self.name,
+                                 outcome='error' if error else 'slow' if slow else 'ok')
+        with self._lock:
+            self.calls += 1
+            self.failures += error
+            self.slow += slow
+            if not error:
+                self._latencies.append(latency)
+            if self.state == 'half_open':
+                self._probing = False
+                if failure:
+                    self._trip()
+                else:
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                    log.info('Breaker baglandi', upstream=self.name)
+                return
+            self._outcomes.append(failure)
+            if (self.state == 'closed' and len(self._outcomes) >= self.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.error_ratio):
+                self._trip()
+
+    def release(self):
+        '''Çağırış upstream-ə çatmadı (məs. kvota) - sınaq yeri boşaldılır'''
+        with self._lock:
+            self._probing = False
+
+    def _trip(self):
+        # lock çağıranda
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        self._outcomes.clear()
+        log.warning('Breaker acildi', upstream=self.name, open_seconds=self.open_seconds)
+
+    def hedge_delay(self):
+        '''İkinci sorğudan əvvəl gözləmə: uğurlu çağırışların p90-ı, az nümunədə default'''
+        if self.default_hedge_delay is None:
+            return None
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < 20:
+            return self.default_hedge_delay
+        p90 = latencies[int(len(latencies) * 0.9)]
+        return min(max(p90, 0.05), self.slow_seconds)
+
+    def call(self, fn):
+        '''fn()-i breaker arxasında çağır; açıqdırsa CircuitOpen'''
+        if not self.allow():
+            raise CircuitOpen(self.name, self.retry_after())
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except QuotaExceeded:
+            self.release()
+            raise
+        except Exception:
+            self.record(time.perf_counter() - start, error=True)
+            raise
+        except BaseException:
+            # Greenlet/thread dayandırıldı - nəticə məlum deyil
+            self.release()
+            raise
+        self.record(time.perf_counter() - start)
+        return result
+
+    def call_hedged(self, fn, executor, may_hedge=None, acquire=None):
+        '''call() kimi, amma fn() hedge_delay-də bitməsə ikinci nüsxəsi başladılır.
+
+        İlk uğurlu nəticə qaytarılır, gecikən sorğu arxa planda bitir.
+        Yalnız idempotent çağırışlar üçün; may_hedge() False qaytararsa
+        (məs. kvota yoxdur) ikinci sorğu göndərilmir. acquire() (məs. kvota
+        tokeni) breaker icazəsindən sonra çağırılır - açıq breaker və ya
+        tutulmuş sınaq yeri token xərcləmir; QuotaExceeded sınaq yerini boşaldır.
+        '''
+        delay = self.hedge_delay()
+
+        def attempt():
+            if acquire is not None:
+                acquire()
+            if delay is None:
+                return fn()
+            first = executor.submit(fn)
+            try:
+                return first.result(timeout=delay)
+            except FutureTimeout:
+                pass
+            if self.state != 'closed' or (may_hedge is not None and not may_hedge()):
+                return first.result()
+
+            with self._lock:
+                self.hedges += 1
+            second = executor.submit(fn)
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is second:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return future.result()
+                    error = future.exception()
+            raise error
+
+        return self.call(attempt)
+
+    def stats(self):
+        retry_after = self.retry_after()
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'state': self.state,
+                'retry_after': round(retry_after, 1),
+                'calls': self.calls,
+                'failures': self.failures,
+                'slow': self.slow,
+                'rejected': self.rejected,
+                'trips': self.trips,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                'p90_ms': round(latencies[int(len(latencies) * 0.9)] * 1000, 1) if latencies else None,
+            }
+
+
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get_breaker(name):
+    '''Upstream üçün proses üzrə yeganə breaker.
+
+    Hədlər {NAME}_BREAKER_SLOW / {NAME}_BREAKER_OPEN / {NAME}_HEDGE_DELAY
+    ilə dəyişdirilir (HEDGE_DELAY=0 hedging-i söndürür).
+    '''
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                defaults = BREAKER_DEFAULTS.get(name, {'slow_seconds': 5.0, 'open_seconds': 30.0,
+                                                       'hedge_delay': None})
+                prefix = name.upper()
+                hedge_delay = os.getenv(f'{prefix}_HEDGE_DELAY')
+                hedge_delay = defaults['hedge_delay'] if hedge_delay is None else float(hedge_delay)
+                breaker = CircuitBreaker(
+                    name,
+                    slow_seconds=float(os.getenv(f'{prefix}_BREAKER_SLOW', defaults['slow_seconds'])),
+                    open_seconds=float(os.getenv(f'{prefix}_BREAKER_OPEN', defaults['open_seconds'])),
+                    hedge_delay=hedge_delay or None,
+                )
+                _breakers[name] = breaker
+    return breaker
+
+
+def all_stats():
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
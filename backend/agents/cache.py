@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    '''TTL + LRU keş, stale-while-revalidate dəstəyi ilə.
+
+    Vaxtı keçmiş element dərhal qaytarılır, arxa planda isə açar başına
+    yalnız bir yeniləmə işləyir. Ölçü maxsize ilə məhduddur (LRU atılır).
+    ttl_for(value) verilərsə hər dəyərin öz TTL-i olur.
+    '''
+
+    def __init__(self, ttl=600, maxsize=256, executor=None, ttl_for=None):
+        self.ttl = ttl
+        self.ttl_for = ttl_for
+        self.maxsize = maxsize
+        self.executor = executor
+        self._data = OrderedDict()  # key -> (value, stored_at, ttl)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key):
+        '''(value, age) qaytarır, yoxdursa (None, None)'''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None, None
+            self._data.move_to_end(key)
+            return entry[0], time.time() - entry[1]
+
+    def peek(self, key):
+        '''Yalnız təzə dəyəri qaytar (yeniləmə başlatmır)'''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, stored_at, ttl = entry
+            if time.time() - stored_at < (self.ttl if ttl is None else ttl):
+                self.hits += 1
+                self._data.move_to_end(key)
+                return value
+            return None
+
+    def set(self, key, value):
+        ttl = self.ttl_for(value) if self.ttl_for else None
+        with self._lock:
+            self._data[key] = (value, time.time(), ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        '''Keşdən qaytar, yoxdursa loader() çağır.
+
+        loader None qaytararsa keşə yazılmır (xəta nəticələri keşlənmir).
+        '''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                value, stored_at, ttl = entry
+                if time.time() - stored_at < (self.ttl if ttl is None else ttl):
+                    self.hits += 1
+                    return value
+                self.stale += 1
+                start_refresh = key not in self._refreshing
+                if start_refresh:
+                    self._refreshing.add(key)
+            else:
+                self.misses += 1
+
+        if entry is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+            return value
+
+        if start_refresh:
+            if self.executor is not None:
+                self.executor.submit(self._refresh, key, loader)
+            else:
+                threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses + self.stale
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'refreshing': len(self._refreshing),
+                'hit_ratio': round((self.hits + self.stale) / total, 3) if total else 0.0,
+            }
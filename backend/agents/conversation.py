@@ -0,0 +1,251 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    touched REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+'''
+
+
+def estimate_tokens(text):
+    '''Təxmini token sayı (~4 simvol = 1 token), tokenizer yüklənmir'''
+    return len(text) // 4 + 1
+
+
+class _Session:
+    __slots__ = ('turns', 'bytes', 'touched')
+
+    def __init__(self):
+        self.turns = []  # [(role, text)]
+        self.bytes = 0
+        self.touched = time.time()
+
+
+class ConversationStore:
+    '''Sessiya açarı ilə söhbət tarixçəsi.
+
+    Default olaraq proses daxilində LRU saxlanılır: boş qalan sessiyalar
+    idle_ttl-dən sonra, sessiya sayı və ya ümumi həcm limiti aşılanda ən
+    köhnələri silinir. CONVERSATION_DB verilibsə tarixçə SQLite-da
+    saxlanılır və bütün gunicorn worker-ləri eyni sessiyaları görür.
+    '''
+
+    def __init__(self, max_sessions=None, idle_ttl=None, max_bytes=None, max_turns=None,
+                 max_turn_chars=None, token_budget=None, path=None):
+        self.max_sessions = max_sessions or int(os.getenv('CONVERSATION_MAX_SESSIONS', 5000))
+        self.idle_ttl = idle_ttl or float(os.getenv('CONVERSATION_IDLE_TTL', 1800))
+        self.max_bytes = max_bytes or int(os.getenv('CONVERSATION_MAX_BYTES', 32 * 1024 * 1024))
+        self.max_turns = max_turns or int(os.getenv('CONVERSATION_MAX_TURNS', 20))
+        self.max_turn_chars = max_turn_chars or int(os.getenv('CONVERSATION_TURN_CHARS', 2000))
+        self.token_budget = token_budget or int(os.getenv('CONVERSATION_TOKEN_BUDGET', 1200))
+        self.path = path if path is not None else os.getenv('CONVERSATION_DB')
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_prune = 0.0
+        self.evictions = 0
+        self.expired = 0
+        self.trimmed_turns = 0
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn().executescript(SCHEMA)
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def history(self, session_id):
+        '''Sessiyanın bütün saxlanılan turları: [(role, text)]'''
+        if not session_id:
+            return []
+        if self.path:
+            rows = self._conn().execute(
+                'SELECT t.role, t.text FROM turns t JOIN sessions s USING (session_id) '
+                'WHERE t.session_id = ? AND s.touched >= ? ORDER BY t.seq',
+                (session_id, time.time() - self.idle_ttl)).fetchall()
+            return [(role, text) for role, text in rows]
+        with self._lock:
+            self._expire(time.time())
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            return list(session.turns)
+
+    def prompt_history(self, session_id, budget=None):
+        '''Token büdcəsinə sığan ən son turlar: ([(role, text)], atılan tur sayı)'''
+        budget = budget or self.token_budget
+        turns = self.history(session_id)
+        kept = []
+        used = 0
+        for role, text in reversed(turns):
+            cost = estimate_tokens(text)
+            if used + cost > budget:
+                break
+            kept.append((role, text))
+            used += cost
+        kept.reverse()
+        # Tarixçə sual ilə başlasın - yarımçıq cütün cavabı atılır
+        if kept and kept[0][0] == 'assistant':
+            kept.pop(0)
+        return kept, len(turns) - len(kept)
+
+    def append(self, session_id, user_text, assistant_text):
+        '''Bir sual-cavab cütünü əlavə et (uzun cavablar kəsilir)'''
+        if not session_id or not assistant_text:
+            return
+        turns = [('user', user_text[:self.max_turn_chars]),
+                 ('assistant', assistant_text[:self.max_turn_chars])]
+        if self.path:
+            self._disk_append(session_id, turns)
+            return
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session()
+            else:
+                self._sessions.move_to_end(session_id)
+            session.touched = now
+            for role, text in turns:
+                size = len(text.encode('utf-8'))
+                session.turns.append((role, text))
+                session.bytes += size
+                self._bytes += size
+            while len(session.turns) > self.max_turns:
+                _, text = session.turns.pop(0)
+                size = len(text.encode('utf-8'))
+                session.bytes -= size
+                self._bytes -= size
+                self.trimmed_turns += 1
+            # Sərt limitlər: ən az istifadə olunan sessiyalar çıxarılır
+            while self._sessions and (len(self._sessions) > self.max_sessions
+                                      or self._bytes > self.max_bytes):
+                _, evicted = self._sessions.popitem(last=False)
+                self._bytes -= evicted.bytes
+                self.evictions += 1
+
+    def _expire(self, now):
+        # OrderedDict toxunma sırası ilə düzülüb - köhnələr başdadır
+        cutoff = now - self.idle_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.touched >= cutoff:
+                break
+            del self._sessions[session_id]
+            self._bytes -= session.bytes
+            self.expired += 1
+
+    def _disk_append(self, session_id, turns):
+        conn = self._conn()
+        now = time.time()
+        size = sum(len(text.encode('utf-8')) for _, text in turns)
+        with conn:
+            row = conn.execute('SELECT touched FROM sessions WHERE session_id = ?',
+                               (session_id,)).fetchone()
+            if row is not None and row[0] < now - self.idle_ttl:
+                conn.execute('DELETE FROM turns WHERE session_id = ?', (session_id,))
+                conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+            conn.execute(
+                'INSERT INTO sessions (session_id, touched, bytes) VALUES (?, ?, ?) '
+                'ON CONFLICT(session_id) DO UPDATE SET touched = excluded.touched, '
+                'bytes = bytes + excluded.bytes', (session_id, now, size))
+            seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM turns WHERE session_id = ?',
+                               (session_id,)).fetchone()[0]
+            conn.executemany('INSERT INTO turns (session_id, seq, role, text) VALUES (?, ?, ?, ?)',
+                             [(session_id, seq + i + 1, role, text) for i, (role, text) in enumerate(turns)])
+            drop_upto = seq + len(turns) - self.max_turns
+            dropped, dropped_bytes = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(length(CAST(text AS BLOB))), 0) FROM turns '
+                'WHERE session_id = ? AND seq <= ?', (session_id, drop_upto)).fetchone()
+            if dropped:
+                conn.execute('DELETE FROM turns WHERE session_id = ? AND seq <= ?',
+                             (session_id, drop_upto))
+                conn.execute('UPDATE sessions SET bytes = bytes - ? WHERE session_id = ?',
+                             (dropped_bytes, session_id))
+                self.trimmed_turns += dropped
+        if now - self._last_prune > 60:
+            self._last_prune = now
+            self._disk_prune(now)
+
+    def _disk_prune(self, now):
+        '''Vaxtı keçmiş sessiyaları və limitdən artıq köhnə sessiyaları sil'''
+        conn = self._conn()
+        with conn:
+            stale = conn.execute('SELECT session_id FROM sessions WHERE touched < ?',
+                                 (now - self.idle_ttl,)).fetchall()
+            self.expired += len(stale)
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions '
+                                        'WHERE touched >= ?', (now - self.idle_ttl,)).fetchone()
+            for session_id, size in conn.execute(
+                    'SELECT session_id, bytes FROM sessions WHERE touched >= ? ORDER BY touched',
+                    (now - self.idle_ttl,)).fetchall():
+                if count <= self.max_sessions and total <= self.max_bytes:
+                    break
+                stale.append((session_id,))
+                count -= 1
+                total -= size
+                self.evictions += 1
+            conn.executemany('DELETE FROM turns WHERE session_id = ?', stale)
+            conn.executemany('DELETE FROM sessions WHERE session_id = ?', stale)
+
+    def reset(self, session_id):
+        if not session_id:
+            return
+        if self.path:
+            conn = self._conn()
+            with conn:
+                conn.execute('DELETE FROM turns WHERE session_id = ?', (session_id,))
+                conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+            return
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.bytes
+
+    def stats(self):
+        if self.path:
+            sessions, size = self._conn().execute(
+                'SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions WHERE touched >= ?',
+                (time.time() - self.idle_ttl,)).fetchone()
+        else:
+            with self._lock:
+                sessions, size = len(self._sessions), self._bytes
+        return {
+            'sessions': sessions,
+            'bytes': size,
+            'max_sessions': self.max_sessions,
+            'max_bytes': self.max_bytes,
+            'token_budget': self.token_budget,
+            'persistent': bool(self.path),
+            'evictions': self.evictions,
+            'expired': self.expired,
+            'trimmed_turns': self.trimmed_turns,
+        }
@@ -1,44 +1,236 @@
-﻿import requests
-import os
-from dotenv import load_dotenv
+﻿import os
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+from agents import aqi_engine
+from agents.breaker import CircuitOpen, get_breaker
+from agents.cache import TTLCache
+from agents.forecast import Forecast
+from agents.log import configure_logging, get_logger
+from agents.http_client import DEFAULT_TIMEOUT, get_shared_session
+from agents.scheduler import QuotaExceeded, get_scheduler
+from agents.singleflight import SingleFlight
 
-load_dotenv()
+# OpenWeather 1-5 indeksi -> AQI (komponentlər gəlməyəndə ehtiyat)
+AQI_MAPPING = {1: 25, 2: 75, 3: 125, 4: 175, 5: 250}
+
+log = get_logger(__name__)
+
+# Bütün DataCollector instance-ları eyni AQI keşini paylaşır
+_aqi_cache = TTLCache(
+    ttl=float(os.getenv('AQI_CACHE_TTL', 900)),
+    maxsize=int(os.getenv('AQI_CACHE_SIZE', 512)),
+)
+
+# Proqnoz öz etibarlılıq müddəti bitənə qədər keşdə qalır
+_forecast_cache = TTLCache(
+    ttl=3600,
+    maxsize=int(os.getenv('FORECAST_CACHE_SIZE', 128)),
+    ttl_for=lambda forecast: forecast.valid_for(),
+)
+
+# Eyni koordinat üçün eyni anda gələn upstream sorğuları birləşdirilir
+_inflight = SingleFlight()
+
+# Paralel (fan-out) sorğular üçün məhdud thread pool - bütün
+# DataCollector instance-ları paylaşır
+_fetch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('AQI_FETCH_WORKERS', 20)), thread_name_prefix='aqi-fetch')
+
+# Hedged sorğular (əsas + gecikən halda ikinci nüsxə) bu pool-da işləyir;
+# fan-out pool-undan ayrıdır ki, fan-out thread-ləri öz işini gözləyib kilidlənməsin
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('HEDGE_WORKERS', 2 * int(os.getenv('AQI_FETCH_WORKERS', 20)))),
+    thread_name_prefix='aqi-hedge')
 
 class DataCollector:
-    def __init__(self):
+    def __init__(self, max_workers=None, fetch_deadline=None, cache=None, session=None):
         self.api_key = os.getenv('OPENWEATHER_API_KEY')
         if not self.api_key:
-            print('XETA: OPENWEATHER_API_KEY tapilmadi!')
+            log.error('OPENWEATHER_API_KEY tapilmadi')
+        else:
+            log.info('API key yuklendi')
+        self.base_url = os.getenv('OPENWEATHER_BASE_URL',
+                                  'https://api.openweathermap.org/data/2.5/air_pollution')
+        # Keep-alive bağlantılar bütün thread-lər arasında paylaşılır
+        self.session = session or get_shared_session()
+
+        # Modul səviyyəli ortaq pool; max_workers verilərsə bu instance-ın öz pool-u olur
+        self.fetch_deadline = fetch_deadline or float(os.getenv('AQI_FETCH_DEADLINE', 12))
+        self.max_workers = max_workers or int(os.getenv('AQI_FETCH_WORKERS', 20))
+        if max_workers:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='aqi-fetch')
         else:
-            print('API key yuklendi')
-        self.base_url = 'http://api.openweathermap.org/data/2.5/air_pollution'
+            self._executor = _fetch_executor
+
+        # (lat, lon) yuvarlaqlaşdırılıb keş açarı olur
+        self.cache = cache if cache is not None else _aqi_cache
+        self.cache_precision = int(os.getenv('AQI_CACHE_PRECISION', 2))
+        self.forecast_cache = _forecast_cache
+        self.inflight = _inflight
+        # Bütün OpenWeather sorğuları bir kvota/prioritet növbəsindən keçir
+        self.scheduler = get_scheduler('openweather')
+        # Upstream yavaşlayanda/düşəndə sorğular dərhal imtina alır, keş/snapshot qaytarılır
+        self.breaker = get_breaker('openweather')
     
-    def get_aqi_for_location(self, lat, lon):
+    def get_aqi_for_location(self, lat, lon, fresh=False, lane='interactive'):
+        '''Keşdən qaytar; vaxtı keçibsə köhnə dəyər + arxa planda yeniləmə.
+
+        fresh=True keşi keçib birbaşa sorğu edir və nəticəni keşə yazır.
+        lane scheduler prioritetidir ('snapshot' fon yenilənməsi üçündür).
+        '''
+        key = self._cache_key(lat, lon)
+        if fresh:
+            result = self.inflight.do(('aqi', key), lambda: self._fetch_aqi(lat, lon, lane))
+            if result is not None:
+                self.cache.set(key, result)
+            return result
+        return self.cache.get_or_load(
+            key, lambda: self.inflight.do(('aqi', key), lambda: self._fetch_aqi(lat, lon, lane)))
+
+    def _cache_key(self, lat, lon):
+        return (round(lat, self.cache_precision), round(lon, self.cache_precision))
+
+    def _fetch_aqi(self, lat, lon, lane='interactive'):
         try:
-            url = f'{self.base_url}?lat={lat}&lon={lon}&appid={self.api_key}'
-            print(f'AQI data alinir: {lat}, {lon}')
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            aqi_index = data['list'][0]['main']['aqi']
-            aqi_mapping = {1: 25, 2: 75, 3: 125, 4: 175, 5: 250}
-            aqi = aqi_mapping.get(aqi_index, 100)
-            components = data['list'][0]['components']
+            log.debug('AQI data alinir', lat=lat, lon=lon, lane=lane)
+            data = self._get_json(self.base_url, {'lat': lat, 'lon': lon, 'appid': self.api_key}, lane)
+            components = data['list'][0].get('components') or {}
+            if components:
+                # Real EPA sub-indeksləri, AQI = ən böyüyü
+                aqi, dominant = aqi_engine.compute_from_components(components)
+            else:
+                aqi = AQI_MAPPING.get(data['list'][0]['main']['aqi'], 100)
+                dominant = None
             result = {
                 'aqi': aqi,
+                'dominant': dominant,
                 'pm2_5': round(components.get('pm2_5', 0), 2),
                 'pm10': round(components.get('pm10', 0), 2),
                 'co': round(components.get('co', 0), 2),
                 'no2': round(components.get('no2', 0), 2),
                 'o3': round(components.get('o3', 0), 2)
             }
-            print(f'AQI alindi: {aqi}')
+            log.debug('AQI alindi', lat=lat, lon=lon, aqi=aqi)
             return result
+        except (QuotaExceeded, CircuitOpen) as e:
+            log.info('Sorgu gonderilmedi', lat=lat, lon=lon, reason=str(e))
+            return None
         except Exception as e:
-            print(f'Xeta: {e}')
+            log.warning('AQI alinmadi', lat=lat, lon=lon, error=str(e))
             return None
 
+    def _get_json(self, url, params, lane):
+        '''Breaker -> kvota -> hedged GET; JSON cavabı qaytarır.
+
+        Token breaker icazə verəndən (half_open-da sınaq yeri alınandan)
+        sonra götürülür - rədd edilən sorğu kvota xərcləmir. İkinci (hedge)
+        sorğu yalnız gözləmədən token varsa göndərilir.
+        '''
+
+        def attempt():
+            response = self.session.get(url, params=params, timeout=DEFAULT_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
+
+        def may_hedge():
+            try:
+                self.scheduler.acquire(lane, max_wait=0)
+                return True
+            except QuotaExceeded:
+                return False
+
+        return self.breaker.call_hedged(attempt, _hedge_executor, may_hedge,
+                                        acquire=lambda: self.scheduler.acquire(lane))
+
+    def peek_aqi(self, lat, lon):
+        '''Keşdə təzə AQI varsa qaytar, yoxdursa None (sorğu etmir)'''
+        return self.cache.peek(self._cache_key(lat, lon))
+
+    def cache_age(self, lat, lon):
+        '''Koordinatın keşdəki dəyərinin yaşı (saniyə) və ya None'''
+        _, age = self.cache.get(self._cache_key(lat, lon))
+        return age
+
+    def get_aqi_for_locations(self, coords, deadline=None, fresh=False, lane='interactive'):
+        '''Bir neçə lokasiyanı paralel al.
+
+        coords: {ad: {'lat': ..., 'lon': ...}}. Bütün sorğular üçün bir ümumi
+        deadline var. (results, status) qaytarır: results yalnız uğurlu
+        rayonları saxlayır, status isə hər rayon üçün 'ok' / 'error' / 'timeout'.
+        '''
+        results, status = self._fan_out(
+            lambda c: self.get_aqi_for_location(c['lat'], c['lon'], fresh, lane), coords, deadline)
+        log.debug('AQI paralel alindi', ok=len(results), total=len(coords))
+        return results, status
+
+    def get_forecast(self, lat, lon, lane='interactive'):
+        '''Saatlıq hava çirklənməsi proqnozu (Forecast), keşlənmiş'''
+        key = self._cache_key(lat, lon)
+        return self.forecast_cache.get_or_load(
+            key, lambda: self.inflight.do(('forecast', key), lambda: self._fetch_forecast(lat, lon, lane)))
+
+    def peek_forecast(self, lat, lon):
+        '''Keşdə təzə proqnoz varsa qaytar, yoxdursa None (sorğu etmir)'''
+        return self.forecast_cache.peek(self._cache_key(lat, lon))
+
+    def prefetch_forecasts(self, coords, lane='batch'):
+        '''Keşdə olmayan proqnozları arxa planda al (nəticəni gözləmir).
+
+        Aşağı prioritetli lane istifadəçinin interaktiv sorğularını
+        kvotadan sıxışdırmır; token çatmayanlar sonrakı sorğuda alınır.
+        '''
+        missing = [c for c in coords.values() if self.peek_forecast(c['lat'], c['lon']) is None]
+        for c in missing:
+            self._executor.submit(self.get_forecast, c['lat'], c['lon'], lane)
+        return len(missing)
+
+    def _fetch_forecast(self, lat, lon, lane='interactive'):
+        try:
+            log.debug('Proqnoz alinir', lat=lat, lon=lon, lane=lane)
+            items = self._get_json(f'{self.base_url}/forecast',
+                                   {'lat': lat, 'lon': lon, 'appid': self.api_key}, lane)['list']
+            ts = [item['dt'] for item in items]
+            series = {
+                metric: np.array([item['components'].get(metric, np.nan) for item in items])
+                for metric in aqi_engine.POLLUTANTS
+            }
+            # Bütün saatlar üçün AQI bir vektor əməliyyatında
+            series['aqi'], _ = aqi_engine.compute(**series)
+            return Forecast(ts, series)
+        except (QuotaExceeded, CircuitOpen) as e:
+            log.info('Sorgu gonderilmedi', lat=lat, lon=lon, reason=str(e))
+            return None
+        except Exception as e:
+            log.warning('Proqnoz xetasi', lat=lat, lon=lon, error=str(e))
+            return None
+
+    def _fan_out(self, fetch, coords, deadline=None):
+        '''fetch(coords) hər lokasiya üçün thread pool-da, bir ümumi deadline ilə'''
+        deadline = self.fetch_deadline if deadline is None else deadline
+        futures = {
+            name: self._executor.submit(fetch, c)
+            for name, c in coords.items()
+        }
+        done, _ = wait(futures.values(), timeout=deadline)
+
+        results = {}
+        status = {}
+        for name, future in futures.items():
+            if future not in done:
+                # Hələ başlamayıbsa ləğv et, işləyirsə nəticəsi atılacaq
+                future.cancel()
+                status[name] = 'timeout'
+                continue
+            data = future.result()
+            if data:
+                results[name] = data
+                status[name] = 'ok'
+            else:
+                status[name] = 'error'
+        return results, status
+
 if __name__ == '__main__':
+    configure_logging()
     print('Test basladi\n')
     collector = DataCollector()
     print('Test: Baki merkez')
@@ -49,4 +241,4 @@ if __name__ == '__main__':
         print(f'   PM2.5: {result["pm2_5"]}')
         print(f'   PM10: {result["pm10"]}')
     else:
-        print('\nXeta!')
+        print('\nXeta!')
@@ -0,0 +1,60 @@
+import json
+import time
+from array import array
+
+import numpy as np
+
+FORECAST_METRICS = ('aqi', 'pm2_5', 'pm10', 'co', 'no2', 'o3')
+
+
+class Forecast:
+    '''Bir lokasiyanın saatlıq proqnozu - sütun massivləri şəklində.
+
+    Hər metrik üçün float32 array saxlanılır (96 saat x 6 metrik ~ 2.3 KB),
+    JSON isə bir dəfə encode olunub bayt şəklində yadda qalır.
+    '''
+    __slots__ = ('ts', 'series', 'fetched_at', '_payload')
+
+    def __init__(self, ts, series, fetched_at=None):
+        self.ts = array('q', ts)
+        self.series = {
+            m: array('f', np.asarray(series[m], dtype=np.float32).tobytes())
+            for m in FORECAST_METRICS
+        }
+        self.fetched_at = fetched_at or time.time()
+        self._payload = None
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def step(self):
+        return self.ts[1] - self.ts[0] if len(self.ts) > 1 else 3600
+
+    @property
+    def expires_at(self):
+        '''Birinci proqnoz saatı keçəndə seriya yenilənməlidir'''
+        if not self.ts:
+            return self.fetched_at
+        return self.ts[0] + self.step
+
+    def valid_for(self, min_ttl=60):
+        '''Keş üçün qalan etibarlılıq müddəti (saniyə)'''
+        return max(min_ttl, self.expires_at - time.time())
+
+    def to_dict(self):
+        payload = {
+            'start': self.ts[0] if self.ts else None,
+            'step': self.step,
+            'ts': self.ts.tolist(),
+            'expires_at': self.expires_at,
+        }
+        for metric, values in self.series.items():
+            payload[metric] = [None if v != v else round(v, 2) for v in values]
+        return payload
+
+    def to_json(self):
+        '''Hazır JSON baytları (hər Forecast üçün bir dəfə encode olunur)'''
+        if self._payload is None:
+            self._payload = json.dumps(self.to_dict(), separators=(',', ':')).encode('utf-8')
+        return self._payload
@@ -0,0 +1,44 @@
+import os
+import threading
+
+# Bir Gemini çağırışı üçün yuxarı hədd; asılı qalan sorğu breaker-də xəta sayılır.
+# SDK-nın öz retry-ı (503-də dəqiqələrlə backoff) söndürülür - xətanı breaker
+# qeyd edir və çağıran dərhal keş/fallback verir
+GEMINI_REQUEST_OPTIONS = {'timeout': float(os.getenv('GEMINI_TIMEOUT', 30)), 'retry': None}
+
+_configured = False
+_lock = threading.Lock()
+
+
+def green_threads_active():
+    '''gunicorn gevent worker-i socket-ləri patch edibmi'''
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+def configure_gemini():
+    '''google.generativeai-ni proses üzrə bir dəfə konfiqurasiya et və modulu qaytar.
+
+    gevent rejimində gRPC əvəzinə REST transport seçilir ki, Gemini
+    sorğuları da kooperativ (bloklamayan) olsun. GEMINI_TRANSPORT və
+    GEMINI_API_ENDPOINT ilə dəyişdirilə bilər.
+    '''
+    import google.generativeai as genai
+    global _configured
+    if _configured:
+        return genai
+    with _lock:
+        if not _configured:
+            options = {'api_key': os.getenv('GEMINI_API_KEY')}
+            transport = os.getenv('GEMINI_TRANSPORT') or ('rest' if green_threads_active() else None)
+            if transport:
+                options['transport'] = transport
+            endpoint = os.getenv('GEMINI_API_ENDPOINT')
+            if endpoint:
+                options['client_options'] = {'api_endpoint': endpoint}
+            genai.configure(**options)
+            _configured = True
+    return genai
@@ -0,0 +1,106 @@
+'''Göy üzü fotosundan lokal duman (haze) qiymətləndirməsi - NumPy, CPU-da millisaniyələr.
+
+Üç statistika birləşdirilir:
+- dark channel prior: dumanlı səhnədə hər pikselin ən tünd rəng kanalı
+  belə parlaq olur (He et al.), atmosfer işığına nisbəti ~ 1 - ötürmə
+- kontrast: luminansın standart sapması (duman kontrastı azaldır)
+- doyma (saturation): duman rəngləri boz/ağa çəkir
+
+Nəticə təxmini AQI zolağıdır, ölçmə deyil: boz buludlu səma da dumanlı
+kimi görünə bilər, ona görə rəngsiz səhnələrdə confidence 'low' olur.
+'''
+import numpy as np
+from PIL import Image
+
+from agents.aqi_engine import category
+
+# Bütün şəkillər bu ölçüyə salınır ki, batch bir massivdə hesablansın
+FEATURE_SIZE = (128, 96)
+DARK_CHANNEL_PATCH = 7
+# haze_index -> AQI dayaq nöqtələri (xətti interpolyasiya)
+HAZE_ANCHORS = np.array([0.0, 0.4, 0.6, 0.75, 0.9, 1.0], dtype=np.float32)
+AQI_ANCHORS = np.array([15, 50, 100, 150, 200, 250], dtype=np.float32)
+WEIGHTS = {'dark_channel': 0.55, 'contrast': 0.15, 'saturation': 0.30}
+
+
+def _min_filter(values, size):
+    '''Son iki ox üzrə kvadrat pəncərədə minimum (ayrıla bilən, kənarlar təkrarlanır)'''
+    pad = size // 2
+    padded = np.pad(values, [(0, 0)] * (values.ndim - 2) + [(pad, pad), (pad, pad)], mode='edge')
+    height, width = values.shape[-2:]
+    # Sürüşdürülmüş dilimlərin elementwise minimumu - strided reduce-dan xeyli sürətlidir
+    rows = padded[..., 0:height, :].copy()
+    for offset in range(1, size):
+        np.minimum(rows, padded[..., offset:offset + height, :], out=rows)
+    result = rows[..., 0:width].copy()
+    for offset in range(1, size):
+        np.minimum(result, rows[..., offset:offset + width], out=result)
+    return result
+
+
+def to_array(images):
+    '''PIL şəkilləri -> (N, H, W, 3) float32 [0, 1]'''
+    arrays = [np.asarray(img.resize(FEATURE_SIZE, Image.BILINEAR, reducing_gap=2.0).convert('RGB'))
+              for img in images]
+    return np.stack(arrays).astype(np.float32) / 255.0
+
+
+def haze_features(rgb):
+    '''rgb: (N, H, W, 3) float32 -> hər statistika üçün (N,) massiv'''
+    n = rgb.shape[0]
+    red, green, blue = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    # Kanal oxu üzrə reduce (axis=-1, uzunluq 3) çox yavaşdır - elementwise edilir
+    min_channel = np.minimum(np.minimum(red, green), blue)
+    max_channel = np.maximum(np.maximum(red, green), blue)
+    dark = _min_filter(min_channel, DARK_CHANNEL_PATCH)
+
+    # Atmosfer işığı: ən parlaq 1% pikselin səviyyəsi (tam sort əvəzinə partition)
+    flat = max_channel.reshape(n, -1)
+    k = int(flat.shape[1] * 0.99)
+    airlight = np.partition(flat, k, axis=1)[:, k]
+    dark_ratio = np.clip(dark.reshape(n, -1).mean(axis=1) / np.maximum(airlight, 1e-3), 0, 1)
+
+    luminance = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    contrast = luminance.reshape(n, -1).std(axis=1)
+    saturation = ((max_channel - min_channel) / np.maximum(max_channel, 1e-3)).reshape(n, -1).mean(axis=1)
+
+    return {
+        'dark_channel': dark_ratio,
+        'contrast': contrast,
+        'saturation': saturation,
+        'brightness': luminance.reshape(n, -1).mean(axis=1),
+    }
+
+
+def haze_index(features):
+    '''0 (tam şəffaf) .. 1 (sıx duman)'''
+    index = (WEIGHTS['dark_channel'] * features['dark_channel']
+             + WEIGHTS['contrast'] * (1 - np.clip(features['contrast'] / 0.25, 0, 1))
+             + WEIGHTS['saturation'] * (1 - np.clip(features['saturation'] / 0.5, 0, 1)))
+    return np.clip(index, 0, 1)
+
+
+def estimate_batch(images):
+    '''Bir neçə şəkil üçün təxmini AQI: [{'estimated_aqi', 'category', 'haze_index', ...}]'''
+    if not images:
+        return []
+    features = haze_features(to_array(images))
+    index = haze_index(features)
+    aqi = np.interp(index, HAZE_ANCHORS, AQI_ANCHORS).round().astype(int)
+
+    results = []
+    for i in range(len(images)):
+        results.append({
+            'estimated_aqi': int(aqi[i]),
+            'category': category(int(aqi[i])),
+            'haze_index': round(float(index[i]), 3),
+            # Rəngsiz səhnədə duman ilə buludu ayırmaq olmur
+            'confidence': 'low' if features['saturation'][i] < 0.1 else 'medium',
+            'features': {name: round(float(values[i]), 3) for name, values in features.items()},
+        })
+    return results
+
+
+def estimate(img):
+    '''Tək şəkil üçün estimate_batch'''
+    return estimate_batch([img])[0]
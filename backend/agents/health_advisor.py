@@ -1,53 +1,202 @@
-﻿import google.generativeai as genai
-import os
-from dotenv import load_dotenv
+﻿import os
+import time
+from agents.breaker import CircuitOpen, get_breaker
+from agents.gemini import GEMINI_REQUEST_OPTIONS, configure_gemini
+from agents.aqi_engine import category, category_range
+from agents.conversation import ConversationStore
 from agents.data_collector import DataCollector
+from agents.locations import ADVISOR_DISTRICTS, AZERBAIJAN_LOCATIONS
+from agents.log import get_logger
+from agents.scheduler import QuotaExceeded, get_scheduler
 
-load_dotenv()
+log = get_logger(__name__)
 
 class HealthAdvisor:
-    def __init__(self):
+    def __init__(self, poller=None, llm_cache=None, conversations=None, collector=None):
         api_key = os.getenv('GEMINI_API_KEY')
         if not api_key:
-            print('XETA: GEMINI_API_KEY tapilmadi!')
+            log.error('GEMINI_API_KEY tapilmadi')
         else:
-            print('✅ Gemini 3 Flash yuklendi')
+            log.info('Gemini 3 Flash yuklendi')
 
-        genai.configure(api_key=api_key)
+        genai = configure_gemini()
         self.model = genai.GenerativeModel('gemini-3-flash-preview')
-        self.collector = DataCollector()
-        self.conversation_history = []
+        # Gemini kvotası bütün agentlər arasında paylaşılır (chat > compare/image)
+        self.scheduler = get_scheduler('gemini')
+        # Gemini düşəndə/yavaşlayanda çağırışlar dərhal fallback-ə keçir
+        self.breaker = get_breaker('gemini')
+        self.collector = collector if collector is not None else DataCollector()
+        # Snapshot poller verilibsə AQI şəbəkəsiz oxunur
+        self.poller = poller
+        # Profilsiz ümumi suallar üçün cavab keşi (LLMResponseCache)
+        self.llm_cache = llm_cache
+        # Sessiya üzrə söhbət tarixçəsi (LRU + token büdcəsi)
+        self.conversations = conversations if conversations is not None else ConversationStore()
 
-    def get_health_advice(self, user_message, user_profile=None, language='az'):
+    def get_health_advice(self, user_message, user_profile=None, language='az', session_id=None):
+        aqi_data, avg_aqi, user_condition, cache_key = {}, 75, '', None
         try:
-            print(f'Sual: {user_message} | Dil: {language}')
-
-            # AQI data al
-            locations = {
-                'Nesimi': {'lat': 40.3947, 'lon': 49.8822},
-                'Nerimanov': {'lat': 40.4015, 'lon': 49.8539},
-                'Sebail': {'lat': 40.3656, 'lon': 49.8354},
-                'Yasamal': {'lat': 40.3917, 'lon': 49.8064},
-                'Binegedi': {'lat': 40.4550, 'lon': 49.8203},
-            }
+            log.debug('Sual', message=user_message[:200], language=language)
 
-            aqi_data = {}
-            for loc, coords in locations.items():
-                data = self.collector.get_aqi_for_location(coords['lat'], coords['lon'])
-                if data:
-                    aqi_data[loc] = data['aqi']
+            aqi_data = self.get_current_aqi()
 
             avg_aqi = sum(aqi_data.values()) / len(aqi_data) if aqi_data else 75
             user_condition = user_profile.get('condition', '') if user_profile else ''
             user_location = user_profile.get('location', '') if user_profile else ''
 
-            # İngilis dilində cavab
-            if language == 'en':
-                system_prompt = f'''You are a MEDICAL AIR QUALITY ADVISOR AI in Azerbaijan (Google Gemini 3).
+            history, _ = self.conversations.prompt_history(session_id)
+            # Gemini 3 çağır (profilsiz ilk suallar keşdən gələ bilər)
+            cache_key = self._cache_key(
+                user_message, aqi_data, language, user_condition, user_location, history)
+            # Keşlənən cavab eyni kateqoriyadakı başqa AQI-lər üçün də verilir,
+            # ona görə prompt dəqiq rəqəmləri deyil, kateqoriya aralıqlarını görür
+            system_prompt = self._build_prompt(
+                user_message, aqi_data, avg_aqi, user_condition, user_location, language, history,
+                ranges=bool(cache_key))
+
+            if cache_key:
+                ai_response, cached = self.llm_cache.get_or_generate(
+                    cache_key, lambda: self._generate(system_prompt))
+            else:
+                ai_response = self._generate(system_prompt)
+                cached = False
+
+            log.debug('Gemini cavab verdi', cached=cached)
+            self.conversations.append(session_id, user_message, ai_response)
+
+            return {
+                'response': ai_response,
+                'current_aqi': aqi_data,
+                'cached': cached
+            }
+
+        except Exception as e:
+            log.warning('Chat cavabi alinmadi', error=str(e))
+            stale, age = self._stale_answer(cache_key)
+            if stale is not None:
+                # Son uğurlu cavab - yaşı ilə
+                return {
+                    'response': stale,
+                    'current_aqi': aqi_data,
+                    'cached': True,
+                    'stale': True,
+                    'age': int(age)
+                }
+            fallback = self._fallback_response(avg_aqi, user_condition, language)
+            return {
+                'response': fallback,
+                'current_aqi': aqi_data,
+                'fallback': True
+            }
+
+    def _generate(self, prompt):
+        '''Gemini çağırışı breaker və scheduler-in 'chat' lane-i ilə (CircuitOpen / QuotaExceeded)'''
+        return self.breaker.call(lambda: self.scheduler.call(
+            'chat', lambda: self.model.generate_content(
+                prompt, request_options=GEMINI_REQUEST_OPTIONS))).text
+
+    def _stale_answer(self, cache_key):
+        '''Keşdəki son cavab vaxtı keçmiş olsa da: (cavab, yaş) və ya (None, None)'''
+        if not cache_key:
+            return None, None
+        return self.llm_cache.get_stale(cache_key)
+
+    def stream_health_advice(self, user_message, user_profile=None, language='az', session_id=None):
+        '''Cavabı Gemini-nin stream rejimi ilə hissə-hissə qaytaran generator.
+
+        ('meta', {...}), sonra bir neçə ('chunk', mətn) və sonda ('done', {...})
+        yield edir. Heç bir hissə gəlməmiş xəta olarsa fallback cavab göndərilir.
+        '''
+        log.debug('Sual (stream)', message=user_message[:200], language=language)
+        aqi_data = self.get_current_aqi()
+        avg_aqi = sum(aqi_data.values()) / len(aqi_data) if aqi_data else 75
+        user_condition = user_profile.get('condition', '') if user_profile else ''
+        user_location = user_profile.get('location', '') if user_profile else ''
+        yield 'meta', {'current_aqi': aqi_data}
+
+        history, _ = self.conversations.prompt_history(session_id)
+        cache_key = self._cache_key(
+            user_message, aqi_data, language, user_condition, user_location, history)
+        if cache_key:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                self.conversations.append(session_id, user_message, cached)
+                yield 'chunk', cached
+                yield 'done', {'cached': True}
+                return
+
+        system_prompt = self._build_prompt(
+            user_message, aqi_data, avg_aqi, user_condition, user_location, language, history,
+            ranges=bool(cache_key))
+        # Cavab tarixçə və keş üçün yığılır
+        parts = []
+        sent = False
+        probing = False
+        try:
+            if not self.breaker.allow():
+                raise CircuitOpen(self.breaker.name, self.breaker.retry_after())
+            probing = True
+            self.scheduler.acquire('chat')
+            start = time.perf_counter()
+            for chunk in self.model.generate_content(system_prompt, stream=True,
+                                                     request_options=GEMINI_REQUEST_OPTIONS):
+                text = chunk.text
+                if not text:
+                    continue
+                if not sent:
+                    # Breaker üçün gecikmə ilk hissəyə qədər ölçülür
+                    self.breaker.record(time.perf_counter() - start)
+                    probing = False
+                sent = True
+                parts.append(text)
+                yield 'chunk', text
+            if not sent:
+                # Boş cavab da xətadır - breaker qeyd edir, klient fallback alır
+                raise ValueError('Gemini bos cavab qaytardi')
+        except Exception as e:
+            log.warning('Chat stream xetasi', error=str(e), sent=sent)
+            if probing and not isinstance(e, QuotaExceeded):
+                self.breaker.record(time.perf_counter() - start, error=True)
+                probing = False
+            if not sent:
+                stale, age = self._stale_answer(cache_key)
+                if stale is not None:
+                    yield 'chunk', stale
+                    yield 'done', {'cached': True, 'stale': True, 'age': int(age)}
+                else:
+                    yield 'chunk', self._fallback_response(avg_aqi, user_condition, language)
+                    yield 'done', {'cached': False, 'fallback': True}
+            else:
+                yield 'done', {'cached': False, 'complete': False}
+            return
+        finally:
+            if probing:
+                # Kvota yox idi və ya klient bağlantını kəsdi - sınaq yeri boşaldılır
+                self.breaker.release()
+
+        answer = ''.join(parts)
+        if cache_key and answer:
+            self.llm_cache.set(cache_key, answer)
+        self.conversations.append(session_id, user_message, answer)
+        log.debug('Gemini stream cavabi bitdi', chars=len(answer))
+        yield 'done', {'cached': False}
+
+    def _build_prompt(self, user_message, aqi_data, avg_aqi, user_condition, user_location, language,
+                      history=None, ranges=False):
+        '''Gemini üçün sistem promptu (history: token büdcəsinə sığan əvvəlki turlar).
+
+        ranges=True - AQI kateqoriya aralığı kimi yazılır (/api/compare kimi), keşlənən
+        cavab köhnə dəqiq rəqəmləri göstərməsin.
+        '''
+        aqi_lines = chr(10).join(f'• {loc}: AQI {self._format_aqi(aqi, ranges)}' for loc, aqi in aqi_data.items())
+        average = self._format_aqi(avg_aqi, ranges)
+        # İngilis dilində cavab
+        if language == 'en':
+            return f'''You are a MEDICAL AIR QUALITY ADVISOR AI in Azerbaijan (Google Gemini 3).
 
 CURRENT REAL-TIME AQI DATA (Baku, today):
-{chr(10).join([f"• {loc}: AQI {aqi}" for loc, aqi in aqi_data.items()])}
-- Average AQI: {int(avg_aqi)}
+{aqi_lines}
+- Average AQI: {average}
 
 AQI CATEGORIES:
 - 0-50: Good ✅
@@ -71,18 +220,18 @@ TASK:
 5. Use emojis (✅❌⚠️🏥💊🌤️)
 6. If AQI is high, give CLEAR warning
 7. Give concrete steps (what to do, what to avoid)
-
+{self._format_history(history, 'en')}
 User question: {user_message}
 
 Answer in ENGLISH:'''
-            
-            # Azərbaycan dilində cavab
-            else:
-                system_prompt = f'''Sən Azərbaycanda hava keyfiyyəti üzrə TİBBİ MƏSLƏHƏTÇİ AI-san (Google Gemini 3).
+        
+        # Azərbaycan dilində cavab
+        else:
+            return f'''Sən Azərbaycanda hava keyfiyyəti üzrə TİBBİ MƏSLƏHƏTÇİ AI-san (Google Gemini 3).
 
 HAZıRKı REAL-TIME AQI DATA (Bakı, bu gün):
-{chr(10).join([f"• {loc}: AQI {aqi}" for loc, aqi in aqi_data.items()])}
-- Ortalama AQI: {int(avg_aqi)}
+{aqi_lines}
+- Ortalama AQI: {average}
 
 AQI KATEQORİYALARI:
 - 0-50: Yaxşı ✅ (hamı üçün təhlükəsiz)
@@ -106,55 +255,89 @@ TAPŞıRIQ:
 5. Emoji istifadə et (✅❌⚠️🏥💊🌤️)
 6. AQI yüksəkdirsə AÇIQ xəbərdarlıq ver
 7. Konkret addımlar ver (nə etməli, nədən qaçmalı)
-
+{self._format_history(history, 'az')}
 İstifadəçi sualı: {user_message}
 
 Cavab ver (Azərbaycan dilində):'''
 
-            # Gemini 3 çağır
-            response = self.model.generate_content(system_prompt)
-            ai_response = response.text
+    def _fallback_response(self, avg_aqi, user_condition, language):
+        '''Gemini cavab vermədikdə qısa qayda əsaslı məsləhət'''
+        if language == 'en':
+            if avg_aqi <= 50:
+                fallback = f'✅ Air is clean (AQI {int(avg_aqi)}). You can go outside safely.'
+            elif avg_aqi <= 100:
+                fallback = f'⚠️ Moderate air quality (AQI {int(avg_aqi)}). Generally safe, but sensitive individuals should be cautious.'
+            elif avg_aqi <= 150:
+                fallback = f'🟠 Unhealthy for sensitive groups (AQI {int(avg_aqi)}). People with asthma, children, and elderly should limit outdoor activities.'
+            else:
+                fallback = f'❌ BAD AIR! (AQI {int(avg_aqi)}). Stay indoors!'
+            
+            if user_condition and 'asthma' in user_condition.lower():
+                fallback += ' Be extra careful with asthma. Keep your inhaler accessible.'
+        else:
+            if avg_aqi <= 50:
+                fallback = f'✅ Hava təmizdir (AQI {int(avg_aqi)}). Çölə rahat çıxa bilərsiniz.'
+            elif avg_aqi <= 100:
+                fallback = f'⚠️ Orta səviyyə (AQI {int(avg_aqi)}). Ümumiyyətlə təhlükəsizdir, amma həssas insanlar ehtiyatlı olsun.'
+            elif avg_aqi <= 150:
+                fallback = f'🟠 Həssaslar üçün pis (AQI {int(avg_aqi)}). Astmalılar, uşaqlar və yaşlılar uzun müddət çöldə qalmasın.'
+            else:
+                fallback = f'❌ PİS HAVA! (AQI {int(avg_aqi)}). Evdə qalın!'
+            
+            if user_condition and 'astma' in user_condition.lower():
+                fallback += ' Astmanız olduğu üçün xüsusilə diqqətli olun. İnhalərinizi yanınızda saxlayın.'
+        return fallback
 
-            print('✅ Gemini 3 cavab verdi')
+    @staticmethod
+    def _format_aqi(aqi, ranges=False):
+        return '{}-{}'.format(*category_range(aqi)) if ranges else str(int(aqi))
 
-            return {
-                'response': ai_response,
-                'current_aqi': aqi_data
-            }
+    @staticmethod
+    def _format_history(history, language):
+        '''Əvvəlki turlar prompt bloku kimi; tarixçə yoxdursa boş sətir'''
+        if not history:
+            return ''
+        if language == 'en':
+            title, names = 'PREVIOUS CONVERSATION:', {'user': 'User', 'assistant': 'You'}
+        else:
+            title, names = 'ƏVVƏLKİ SÖHBƏT:', {'user': 'İstifadəçi', 'assistant': 'Sən'}
+        lines = [f'{names[role]}: {text}' for role, text in history]
+        return f'\n{title}\n' + '\n'.join(lines) + '\n'
 
-        except Exception as e:
-            print(f'Xeta: {e}')
-            # Fallback cavab
-            if language == 'en':
-                if avg_aqi <= 50:
-                    fallback = f'✅ Air is clean (AQI {int(avg_aqi)}). You can go outside safely.'
-                elif avg_aqi <= 100:
-                    fallback = f'⚠️ Moderate air quality (AQI {int(avg_aqi)}). Generally safe, but sensitive individuals should be cautious.'
-                elif avg_aqi <= 150:
-                    fallback = f'🟠 Unhealthy for sensitive groups (AQI {int(avg_aqi)}). People with asthma, children, and elderly should limit outdoor activities.'
-                else:
-                    fallback = f'❌ BAD AIR! (AQI {int(avg_aqi)}). Stay indoors!'
-                
-                if user_condition and 'asthma' in user_condition.lower():
-                    fallback += ' Be extra careful with asthma. Keep your inhaler accessible.'
-            else:
-                if avg_aqi <= 50:
-                    fallback = f'✅ Hava təmizdir (AQI {int(avg_aqi)}). Çölə rahat çıxa bilərsiniz.'
-                elif avg_aqi <= 100:
-                    fallback = f'⚠️ Orta səviyyə (AQI {int(avg_aqi)}). Ümumiyyətlə təhlükəsizdir, amma həssas insanlar ehtiyatlı olsun.'
-                elif avg_aqi <= 150:
-                    fallback = f'🟠 Həssaslar üçün pis (AQI {int(avg_aqi)}). Astmalılar, uşaqlar və yaşlılar uzun müddət çöldə qalmasın.'
-                else:
-                    fallback = f'❌ PİS HAVA! (AQI {int(avg_aqi)}). Evdə qalın!'
-                
-                if user_condition and 'astma' in user_condition.lower():
-                    fallback += ' Astmanız olduğu üçün xüsusilə diqqətli olun. İnhalərinizi yanınızda saxlayın.'
-            
-            return {
-                'response': fallback,
-                'current_aqi': aqi_data
-            }
+    def _cache_key(self, user_message, aqi_data, language, user_condition, user_location, history=None):
+        '''Yalnız profilsiz və tarixçəsiz suallar keşlənir; AQI kateqoriyaya yuvarlaqlaşdırılır.
+
+        Orta AQI-nin kateqoriyası da açara daxildir - prompt onu aralıq kimi göstərir.
+        '''
+        if self.llm_cache is None or user_condition or user_location or history:
+            return None
+        return self.llm_cache.signature(
+            'chat',
+            language=language,
+            message=self.llm_cache.normalize_text(user_message),
+            aqi={loc: category(aqi) for loc, aqi in aqi_data.items()},
+            average=category(sum(aqi_data.values()) / len(aqi_data)) if aqi_data else None,
+        )
+
+    def get_current_aqi(self):
+        '''Bakı rayonlarının AQI-si: snapshot-dan, yoxdursa collector-dan'''
+        aqi_data = {}
+        if self.poller is not None:
+            snapshot = self.poller.current()
+            for loc, district in ADVISOR_DISTRICTS.items():
+                data = snapshot.get(district)
+                if data:
+                    aqi_data[loc] = data['aqi']
+            if aqi_data:
+                return aqi_data
+
+        coords = {loc: AZERBAIJAN_LOCATIONS[district] for loc, district in ADVISOR_DISTRICTS.items()}
+        results, _ = self.collector.get_aqi_for_locations(coords)
+        for loc in ADVISOR_DISTRICTS:
+            if loc in results:
+                aqi_data[loc] = results[loc]['aqi']
+        return aqi_data
 
-    def reset_conversation(self):
-        self.conversation_history = []
-        print('Sohbet tarixcesi silindi')
\ No newline at end of file
+    def reset_conversation(self, session_id=None):
+        self.conversations.reset(session_id)
+        log.debug('Sohbet tarixcesi silindi')
\ No newline at end of file
@@ -0,0 +1,205 @@
+'''AQI istilik xəritəsi: stansiyalardan IDW interpolyasiyası, raster və tile-lar.
+
+Hər yeni snapshot-da stansiyalar yenilənir və versiya artır. Regional
+gridlər dərhal hazırlanıb bayt şəklində saxlanılır, XYZ tile-lar isə ilk
+sorğuda render olunub həmin versiya üçün keşlənir - eyni viewport-u
+təkrar göstərmək sadəcə keş oxumasıdır.
+'''
+import hashlib
+import io
+import math
+import os
+import threading
+
+import numpy as np
+
+from agents.cache import TTLCache
+from agents.log import get_logger
+
+log = get_logger(__name__)
+
+# (south, west, north, east)
+REGIONS = {
+    'baku': (40.28, 49.65, 40.55, 50.10),
+    'azerbaijan': (38.35, 44.75, 41.95, 50.65),
+}
+
+TILE_SIZE = 256
+# Bundan böyük zoom-da IDW-nin dəqiqliyi artmır, yalnız tile sayı artır
+MAX_ZOOM = int(os.getenv('HEATMAP_MAX_ZOOM', 14))
+
+# AQI kateqoriya rəngləri (yuxarı sərhəd, RGB)
+AQI_COLORS = [
+    (50, (0, 228, 0)),
+    (100, (255, 255, 0)),
+    (150, (255, 126, 0)),
+    (200, (255, 0, 0)),
+    (300, (143, 63, 151)),
+    (500, (126, 0, 35)),
+]
+
+
+def _build_palette(alpha=150):
+    '''0..500 AQI -> RGBA lookup cədvəli'''
+    palette = np.zeros((501, 4), dtype=np.uint8)
+    lower = 0
+    for upper, rgb in AQI_COLORS:
+        palette[lower:upper + 1, :3] = rgb
+        lower = upper + 1
+    palette[:, 3] = alpha
+    return palette
+
+
+PALETTE = _build_palette()
+
+
+def idw(lats, lons, st_lats, st_lons, st_values, power=2.0):
+    '''Inverse distance weighting, bütün piksellər üçün bir dəfəyə.
+
+    (interpolated, nearest_distance_deg) qaytarır. Məsafə ekvirektangulyar
+    yaxınlaşma ilə hesablanır (kiçik regionlar üçün kifayətdir).
+    '''
+    lats = np.asarray(lats, dtype=np.float64)[..., np.newaxis]
+    lons = np.asarray(lons, dtype=np.float64)[..., np.newaxis]
+    scale = np.cos(np.radians(lats))
+    d2 = (lats - st_lats) ** 2 + ((lons - st_lons) * scale) ** 2
+    nearest = np.sqrt(d2.min(axis=-1))
+    weights = 1.0 / np.maximum(d2, 1e-12) ** (power / 2)
+    values = (weights * st_values).sum(axis=-1) / weights.sum(axis=-1)
+    return values, nearest
+
+
+def tile_bounds(z, x, y):
+    '''XYZ tile-ın piksel mərkəzlərinin lat/lon massivləri'''
+    n = 2 ** z
+    px = (x + (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE) / n
+    py = (y + (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE) / n
+    lons = px * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * py))))
+    return np.meshgrid(lats, lons, indexing='ij')
+
+
+def tile_extent(z, x, y):
+    '''XYZ tile-ın (south, west, north, east) sərhədləri'''
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+_empty_tile = None
+
+
+def empty_tile():
+    '''Tam şəffaf PNG tile (bir dəfə kodlanır, bütün boş tile-lar paylaşır)'''
+    global _empty_tile
+    if _empty_tile is None:
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGBA', (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0)).save(buffer, format='PNG')
+        _empty_tile = buffer.getvalue()
+    return _empty_tile
+
+
+class HeatmapRenderer:
+    '''Snapshot abunəçisi: grid və tile-ları versiyaya bağlı keşləyir'''
+
+    def __init__(self, locations, grid_size=128, max_distance=1.0, tile_cache_size=2048):
+        self.locations = locations
+        self.grid_size = grid_size
+        # Ən yaxın stansiyadan bu qədər (dərəcə) uzaq piksellər şəffafdır
+        self.max_distance = max_distance
+        self.version = 0
+        # Stansiya datasının hash-i: worker-lərdən asılı olmayan tile ETag-i
+        self.tag = None
+        self._stations = None
+        self._grids = {}
+        self._tiles = TTLCache(ttl=float('inf'), maxsize=tile_cache_size)
+        self._lock = threading.Lock()
+        # Rəngli piksel ola biləcək sahə: regionlar + max_distance (uzunluq cos ilə genişlənir)
+        south = min(r[0] for r in REGIONS.values()) - max_distance
+        north = max(r[2] for r in REGIONS.values()) + max_distance
+        pad = max_distance / math.cos(math.radians(max(abs(south), abs(north))))
+        self.coverage = (south, min(r[1] for r in REGIONS.values()) - pad,
+                         north, max(r[3] for r in REGIONS.values()) + pad)
+
+    @property
+    def ready(self):
+        return self._stations is not None
+
+    def update(self, snapshot):
+        '''Yeni snapshot: stansiyaları yenilə, gridləri yenidən qur, tile keşini sıfırla'''
+        names = [n for n in snapshot.data if n in self.locations]
+        if not names:
+            return
+        stations = (
+            np.array([self.locations[n]['lat'] for n in names]),
+            np.array([self.locations[n]['lon'] for n in names]),
+            np.array([snapshot.data[n]['aqi'] for n in names], dtype=np.float64),
+        )
+        if self._stations is not None and all(
+                np.array_equal(a, b) for a, b in zip(stations, self._stations)):
+            return  # Dəyişiklik yoxdur - keş qalır
+
+        grids = {region: self._encode_grid(region, stations) for region in REGIONS}
+        digest = hashlib.blake2b(digest_size=8)
+        for array in stations:
+            digest.update(array.tobytes())
+        with self._lock:
+            self._stations = stations
+            self._grids = grids
+            self.version = snapshot.version
+            self.tag = digest.hexdigest()
+            self._tiles.clear()
+        log.debug('Heatmap yenilendi', version=self.version)
+
+    def _encode_grid(self, region, stations):
+        south, west, north, east = REGIONS[region]
+        rows = self.grid_size
+        cols = max(1, int(round(rows * (east - west) * math.cos(math.radians((south + north) / 2))
+                                / (north - south))))
+        lats = np.linspace(north, south, rows)
+        lons = np.linspace(west, east, cols)
+        lat_grid, lon_grid = np.meshgrid(lats, lons, indexing='ij')
+        values, _ = idw(lat_grid, lon_grid, *stations)
+        # Sətirlər şimaldan cənuba, uint16 little-endian
+        return {
+            'bbox': REGIONS[region],
+            'shape': (rows, cols),
+            'body': np.rint(values).astype('<u2').tobytes(),
+        }
+
+    def grid(self, region):
+        '''Regionun hazır binary grid-i: {'bbox', 'shape', 'body'} və ya None'''
+        return self._grids.get(region)
+
+    def covers(self, z, x, y):
+        '''Tile rəngli piksel ola biləcək sahə ilə kəsişirmi'''
+        south, west, north, east = tile_extent(z, x, y)
+        c_south, c_west, c_north, c_east = self.coverage
+        return south < c_north and north > c_south and west < c_east and east > c_west
+
+    def tile(self, z, x, y):
+        '''(PNG tile baytları, data tag-i) - bu data üçün keşlənmiş'''
+        with self._lock:
+            tag = self.tag
+            stations = self._stations
+        if stations is None:
+            return None, tag
+        body = self._tiles.get_or_load((tag, z, x, y), lambda: self._render_tile(z, x, y, stations))
+        return body, tag
+
+    def _render_tile(self, z, x, y, stations):
+        lats, lons = tile_bounds(z, x, y)
+        values, nearest = idw(lats, lons, *stations)
+        rgba = PALETTE[np.clip(np.rint(values), 0, 500).astype(np.intp)]
+        rgba[..., 3] = np.where(nearest > self.max_distance, 0, rgba[..., 3])
+        buffer = io.BytesIO()
+        from PIL import Image  # yalnız tile istəniləndə yüklənir
+        Image.fromarray(rgba, 'RGBA').save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def stats(self):
+        return {'version': self.version, 'tag': self.tag, 'tiles': self._tiles.stats()}
@@ -0,0 +1,233 @@
+import os
+import sqlite3
+import threading
+import time
+
+METRICS = ('aqi', 'pm2_5', 'pm10', 'co', 'no2', 'o3')
+RESOLUTIONS = {'raw': None, 'hour': 3600, 'day': 86400}
+# 'auto' seriyada təxminən bu qədər nöqtədən çox olmayan resolution seçir
+AUTO_MAX_POINTS = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS districts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+-- (district_id, ts) üzrə clustered cədvəl: aralıq sorğuları indeks scan-dır
+CREATE TABLE IF NOT EXISTS readings (
+    district_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    aqi REAL, pm2_5 REAL, pm10 REAL, co REAL, no2 REAL, o3 REAL,
+    PRIMARY KEY (district_id, ts)
+) WITHOUT ROWID;
+'''
+
+# Saatlıq/günlük min/sum/max yazılış zamanı yığılır - aralıq sorğusu xam
+# nöqtələri deyil, hazır bucket-ları oxuyur. {m}_n metrikin NULL olmayan
+# nöqtələrinin sayıdır (orta = {m}_sum / {m}_n)
+ROLLUP_AGGREGATES = ('min', 'sum', 'max', 'n')
+ROLLUP_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rollup_{name} (
+    district_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    {columns},
+    PRIMARY KEY (district_id, bucket)
+) WITHOUT ROWID;
+'''
+
+
+class HistoryStore:
+    '''AQI tarixçəsi üçün append-only SQLite (WAL) saxlama.
+
+    Hər thread öz bağlantısını istifadə edir; WAL sayəsində oxuyanlar
+    yazanı bloklamır. Downsampling SQL-də aparılır, bütün store RAM-a
+    yüklənmir.
+    '''
+
+    def __init__(self, path=None, min_gap=None):
+        self.path = path or os.getenv('AQI_HISTORY_DB', os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'aqi_history.db'))
+        # Hər worker-in poller-i eyni sorğunu bir az fərqli ts ilə yazır -
+        # bu qədər saniyə yaxınlığındakı ikinci nöqtə təkrar sayılır
+        self.min_gap = int(min_gap if min_gap is not None else os.getenv(
+            'AQI_HISTORY_MIN_GAP', float(os.getenv('AQI_POLL_INTERVAL', 600)) / 2))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._district_ids = {}
+        self._lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        for name, bucket in RESOLUTIONS.items():
+            if bucket:
+                columns = ', '.join(f'{m}_{agg} REAL' for m in METRICS for agg in ('min', 'sum', 'max'))
+                columns += ', ' + ', '.join(f'{m}_n INTEGER NOT NULL DEFAULT 0' for m in METRICS)
+                conn.executescript(ROLLUP_SCHEMA.format(name=name, columns=columns))
+                self._migrate_rollup(conn, name)
+        self._load_district_ids(conn)
+
+    @staticmethod
+    def _migrate_rollup(conn, name):
+        '''Köhnə rollup cədvəlinə {m}_n sütunlarını əlavə et (əvvəlki davranış: n)'''
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info(rollup_{name})')}
+        missing = [m for m in METRICS if f'{m}_n' not in existing]
+        if not missing:
+            return
+        with conn:
+            for m in missing:
+                try:
+                    conn.execute(f'ALTER TABLE rollup_{name} ADD COLUMN {m}_n INTEGER NOT NULL DEFAULT 0')
+                except sqlite3.OperationalError:
+                    continue  # başqa worker artıq əlavə edib
+                conn.execute(f'UPDATE rollup_{name} SET {m}_n = n')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _load_district_ids(self, conn):
+        # Başqa worker-lərin əlavə etdiyi rayonlar da görünsün
+        for district_id, name in conn.execute('SELECT id, name FROM districts'):
+            self._district_ids[name] = district_id
+
+    def _district_id(self, conn, name):
+        district_id = self._district_ids.get(name)
+        if district_id is None:
+            with self._lock:
+                conn.execute('INSERT OR IGNORE INTO districts (name) VALUES (?)', (name,))
+                district_id = conn.execute('SELECT id FROM districts WHERE name = ?', (name,)).fetchone()[0]
+                self._district_ids[name] = district_id
+        return district_id
+
+    def append(self, readings, ts=None):
+        '''readings: {rayon: {'aqi': ..., 'pm2_5': ..., ...}}'''
+        ts = int(ts if ts is not None else time.time())
+        conn = self._conn()
+        inserted = 0
+        with conn:
+            # Yazma kilidi əvvəlcədən alınır: worker-lər yoxlama + yazmanı
+            # növbə ilə edir, ikisi eyni anda "təkrar yoxdur" görə bilmir
+            conn.execute('BEGIN IMMEDIATE')
+            for name, data in readings.items():
+                district_id = self._district_id(conn, name)
+                values = [data.get(m) for m in METRICS]
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO readings (district_id, ts, aqi, pm2_5, pm10, co, no2, o3) '
+                    'SELECT ?, ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS ('
+                    'SELECT 1 FROM readings WHERE district_id = ? AND ts > ? AND ts < ?)',
+                    (district_id, ts, *values, district_id, ts - self.min_gap, ts + self.min_gap))
+                if cursor.rowcount != 1:
+                    continue  # təkrar nöqtə - rollup-lara ikinci dəfə düşməsin
+                inserted += 1
+                aggregates = [x for v in values for x in (v, v, v, int(v is not None))]
+                for res_name, bucket in RESOLUTIONS.items():
+                    if bucket:
+                        conn.execute(_ROLLUP_UPSERT[res_name],
+                                     (district_id, ts // bucket * bucket, *aggregates))
+        return inserted
+
+    def append_snapshot(self, snapshot):
+        '''SnapshotPoller abunəçisi: yalnız yeni alınmış rayonları yaz'''
+        fresh = {name: data for name, data in snapshot.data.items()
+                 if snapshot.status.get(name) == 'ok'}
+        if fresh:
+            self.append(fresh, ts=snapshot.fetched_at)
+
+    def latest(self, max_age=None):
+        '''Hər rayonun son yazılmış nöqtəsi: {rayon: (ts, {'aqi': ..., ...})}
+
+        Server yenidən açılanda snapshot-u son uğurlu dəyərlərlə doldurmaq
+        üçündür; max_age-dən köhnə nöqtələr atılır.
+        '''
+        conn = self._conn()
+        self._load_district_ids(conn)
+        oldest = time.time() - max_age if max_age else 0
+        columns = ', '.join(METRICS)
+        result = {}
+        for name, district_id in self._district_ids.items():
+            row = conn.execute(
+                f'SELECT ts, {columns} FROM readings WHERE district_id = ? AND ts >= ? '
+                f'ORDER BY ts DESC LIMIT 1', (district_id, oldest)).fetchone()
+            if row is not None and row[1] is not None:
+                data = {m: (round(v, 2) if v is not None else None) for m, v in zip(METRICS, row[1:])}
+                data['dominant'] = None
+                result[name] = (row[0], data)
+        return result
+
+    @staticmethod
+    def auto_resolution(start, end):
+        '''Pəncərə uzunluğuna görə resolution seç'''
+        span = end - start
+        if span <= 6 * 3600:
+            return 'raw'
+        if span / RESOLUTIONS['hour'] <= AUTO_MAX_POINTS:
+            return 'hour'
+        return 'day'
+
+    def query(self, districts=None, start=None, end=None, resolution='hour', metrics=METRICS):
+        '''Sütun formatında tarixçə qaytarır.
+
+        resolution='raw' xam nöqtələri, 'hour'/'day' isə hər bucket üçün
+        {metric}_min / {metric}_mean / {metric}_max sütunlarını verir.
+        '''
+        metrics = [m for m in metrics if m in METRICS]
+        end = int(end if end is not None else time.time())
+        start = int(start if start is not None else end - 86400)
+        if resolution == 'auto':
+            resolution = self.auto_resolution(start, end)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f'Namelum resolution: {resolution}')
+        conn = self._conn()
+        if not districts or any(n not in self._district_ids for n in districts):
+            self._load_district_ids(conn)
+        names = districts or list(self._district_ids)
+        ids = {self._district_ids[n]: n for n in names if n in self._district_ids}
+        if not ids or not metrics:
+            return {}
+
+        bucket = RESOLUTIONS[resolution]
+        if bucket is None:
+            columns = list(metrics)
+            select = ', '.join(f'ROUND({m}, 2)' for m in metrics)
+            sql = (f'SELECT ts, {select} FROM readings '
+                   f'WHERE district_id = ? AND ts >= ? AND ts <= ? ORDER BY ts')
+        else:
+            columns = [f'{m}_{agg}' for m in metrics for agg in ('min', 'mean', 'max')]
+            select = ', '.join(f'ROUND({m}_min, 2), ROUND({m}_sum / NULLIF({m}_n, 0), 2), '
+                               f'ROUND({m}_max, 2)' for m in metrics)
+            sql = (f'SELECT bucket, {select} FROM rollup_{resolution} '
+                   f'WHERE district_id = ? AND bucket >= ? AND bucket <= ? ORDER BY bucket')
+            start = start // bucket * bucket
+
+        result = {}
+        for district_id, name in ids.items():
+            rows = conn.execute(sql, (district_id, start, end)).fetchall()
+            # Sətirləri sütunlara çevir
+            result[name] = dict(zip(['ts', *columns], map(list, zip(*rows)))) if rows else \
+                {c: [] for c in ['ts', *columns]}
+        return result
+
+
+def _rollup_upsert(name):
+    columns = [f'{m}_{agg}' for m in METRICS for agg in ROLLUP_AGGREGATES]
+    updates = []
+    for m in METRICS:
+        updates.append(f'{m}_min = MIN(COALESCE({m}_min, excluded.{m}_min), '
+                       f'COALESCE(excluded.{m}_min, {m}_min))')
+        updates.append(f'{m}_sum = COALESCE({m}_sum, 0) + COALESCE(excluded.{m}_sum, 0)')
+        updates.append(f'{m}_max = MAX(COALESCE({m}_max, excluded.{m}_max), '
+                       f'COALESCE(excluded.{m}_max, {m}_max))')
+        updates.append(f'{m}_n = {m}_n + excluded.{m}_n')
+    return (f'INSERT INTO rollup_{name} (district_id, bucket, n, {", ".join(columns)}) '
+            f'VALUES (?, ?, 1, {", ".join("?" for _ in columns)}) '
+            f'ON CONFLICT (district_id, bucket) DO UPDATE SET n = n + 1, {", ".join(updates)}')
+
+
+_ROLLUP_UPSERT = {name: _rollup_upsert(name) for name, bucket in RESOLUTIONS.items() if bucket}
@@ -0,0 +1,62 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeout - saniyə
+DEFAULT_TIMEOUT = (3.05, 10)
+
+_shared_session = None
+_shared_lock = threading.Lock()
+
+
+def build_session(pool_size=None, retries=None, backoff=None):
+    '''Keep-alive bağlantı pool-u olan requests.Session yarat.
+
+    Default olaraq təkrar yoxdur: paylaşılan session scheduler (kvota) və
+    breaker arxasında işləyir - gizli təkrar bir tokeni bir neçə upstream
+    sorğusuna çevirər və breaker-ə bir uzun çağırış kimi görünərdi.
+    retries > 0 yalnız idempotent metodları (GET/HEAD) 5xx və bağlantı
+    xətalarında exponential backoff ilə təkrarlayır; 429 heç vaxt təkrarlanmır.
+    gzip cavablar qəbul olunur.
+    '''
+    if not pool_size:
+        # Fetch pool-u + gunicorn request thread-ləri qədər bağlantı
+        default = int(os.getenv('AQI_FETCH_WORKERS', 20)) + int(os.getenv('GUNICORN_THREADS', 1))
+        pool_size = int(os.getenv('HTTP_POOL_SIZE', default))
+    retries = retries if retries is not None else int(os.getenv('HTTP_RETRIES', 0))
+    backoff = backoff if backoff is not None else float(os.getenv('HTTP_BACKOFF', 0.3))
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        backoff_factor=backoff,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    return session
+
+
+def get_shared_session():
+    '''Proses üzrə bir paylaşılan session (thread-lər arasında istifadə olunur)'''
+    global _shared_session
+    if _shared_session is None:
+        with _shared_lock:
+            if _shared_session is None:
+                _shared_session = build_session()
+    return _shared_session
@@ -1,29 +1,90 @@
-﻿import google.generativeai as genai
+﻿import base64
+import binascii
+import io
+import json
 import os
-from dotenv import load_dotenv
-from PIL import Image
-from flask import Flask, request, jsonify # Flask obyektlərinin mövcud olduğunu fərz edirik
+import re
+import threading
+from collections import OrderedDict
+from agents.breaker import get_breaker
+from agents.gemini import GEMINI_REQUEST_OPTIONS, configure_gemini
+from agents.cache import TTLCache
+from agents.singleflight import SingleFlight
+from agents.scheduler import get_scheduler
+from agents import haze
+from agents.log import get_logger
+from PIL import Image, ImageOps
 
-load_dotenv()
+log = get_logger(__name__)
 
-class ImageAnalyzer:
-    def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            print('XETA: GEMINI_API_KEY tapilmadi!')
-        else:
-            print('✅ Gemini 3 Flash Vision yuklendi')
+# Gemini-yə göndərilən şəklin ən uzun tərəfi (px) və JPEG keyfiyyəti
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', 768))
+IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', 85))
+# Bu qədər bit fərqli hash eyni foto sayılır
+IMAGE_HASH_DISTANCE = int(os.getenv('IMAGE_HASH_DISTANCE', 8))
 
-        genai.configure(api_key=api_key)
-        
-        # GEMINI 3 FLASH (vision dəstəkləyir)
-        self.model = genai.GenerativeModel('gemini-1.5-flash') # Qeyd: 3-flash hazırda 1.5-flash kimi tanınır
+CATEGORY_LABELS = {
+    'good': 'Yaxşı',
+    'moderate': 'Orta',
+    'unhealthy_sensitive': 'Həssaslar üçün pis',
+    'unhealthy': 'Pis',
+    'very_unhealthy': 'Çox pis',
+    'hazardous': 'Təhlükəli',
+}
 
-    def analyze_sky_image(self, image_path):
-        try:
-            print(f'Foto analiz edilir: {image_path}')
+# Lokal qiymətləndirmə üçün kateqoriya üzrə qısa məsləhətlər
+LOCAL_RECOMMENDATIONS = {
+    'good': {
+        'healthy': 'Normal aktivlik',
+        'sensitive': 'Çöldə vaxt keçirmək təhlükəsizdir',
+        'children': 'Çöldə rahat oynaya bilərlər',
+        'elderly': 'Gəzinti üçün uyğundur',
+    },
+    'moderate': {
+        'healthy': 'Normal aktivlik',
+        'sensitive': 'Uzun və ağır fiziki yükdən çəkinin',
+        'children': 'Nəzarət altında oyun',
+        'elderly': 'Qısa gəzintilər',
+    },
+    'unhealthy_sensitive': {
+        'healthy': 'Ağır idmanı azaldın',
+        'sensitive': 'Çöldə vaxtı məhdudlaşdırın, dərmanınızı yanınızda saxlayın',
+        'children': 'Çöldə oyunu qısaldın',
+        'elderly': 'Mümkünsə evdə qalın',
+    },
+    'unhealthy': {
+        'healthy': 'Çöldə fiziki yükdən çəkinin',
+        'sensitive': 'Evdə qalın, pəncərələri bağlayın',
+        'children': 'Çöldə oynamasınlar',
+        'elderly': 'Evdə qalın',
+    },
+}
+LOCAL_RECOMMENDATIONS['very_unhealthy'] = LOCAL_RECOMMENDATIONS['unhealthy']
+LOCAL_RECOMMENDATIONS['hazardous'] = LOCAL_RECOMMENDATIONS['unhealthy']
+
+
+def local_result(estimate):
+    '''haze.estimate() nəticəsini Gemini cavabı ilə eyni formata sal'''
+    index = estimate['haze_index']
+    if index < 0.4:
+        description = 'göy üzü təmizdir'
+    elif index < 0.6:
+        description = 'yüngül dumanlı'
+    elif index < 0.8:
+        description = 'dumanlı'
+    else:
+        description = 'sıx dumanlı və ya boz buludlu'
+    return {
+        'description': f'Lokal qiymətləndirmə: {description}',
+        'estimated_aqi': estimate['estimated_aqi'],
+        'aqi_category': CATEGORY_LABELS[estimate['category']],
+        'recommendations': LOCAL_RECOMMENDATIONS[estimate['category']],
+        'source': 'local',
+        'confidence': estimate['confidence'],
+        'haze_index': index,
+    }
 
-            prompt = '''Sən Azərbaycanda hava keyfiyyəti ekspertsən.
+ANALYSIS_PROMPT = '''Sən Azərbaycanda hava keyfiyyəti ekspertsən.
 Göy üzünün fotosuna bax və Azərbaycan dilində JSON formatında cavab ver:
 
 {
@@ -40,95 +101,209 @@ Göy üzünün fotosuna bax və Azərbaycan dilində JSON formatında cavab ver:
 
 Qısa və konkret yaz. Yalnız JSON cavab ver, başqa mətn yox.'''
 
-            img = Image.open(image_path)
-            
-            response = self.model.generate_content([prompt, img])
 
-            import json
-            import re
-            
+class ImageDecodeError(ValueError):
+    '''Yüklənən data şəkil kimi oxuna bilmədi'''
+
+
+def image_bytes(data):
+    '''base64 mətn (data URL ola bilər) və ya bytes -> şəklin baytları'''
+    if isinstance(data, str):
+        # "data:image/jpeg;base64," prefixini sil
+        if 'base64,' in data:
+            data = data.split('base64,', 1)[1]
+        try:
+            data = base64.b64decode(data)
+        except (binascii.Error, ValueError) as e:
+            raise ImageDecodeError('base64 decode olunmadı') from e
+    return data
+
+
+def decode_image(data):
+    '''base64 mətn (data URL ola bilər) və ya bytes -> PIL Image, diskə yazmadan'''
+    data = image_bytes(data)
+    try:
+        img = Image.open(io.BytesIO(data))
+        # JPEG DCT səviyyəsində kiçildilir - tam ölçüdə decode olunmur
+        img.draft('RGB', (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+        img.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ImageDecodeError('Şəkil formatı tanınmadı') from e
+    return img
+
+
+def prepare_image(img, max_side=IMAGE_MAX_SIDE, quality=IMAGE_JPEG_QUALITY):
+    '''EXIF istiqamətini düzəlt, max_side-a kiçilt: (image, jpeg bytes)'''
+    img = ImageOps.exif_transpose(img)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.thumbnail((max_side, max_side), Image.BILINEAR)
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return img, buffer.getvalue()
+
+
+def perceptual_hash(img):
+    '''(bits, colors): üfüqi+şaquli dHash (128 bit) və 4x4 blokların orta rəngi.
+
+    Göy üzü kimi hamar qradiyentlərdə dHash müxtəlif fotolar üçün eyni
+    çıxa bilər, ona görə rəng imzası (hər kanal 16 səviyyə) da müqayisə olunur.
+    '''
+    gray = img.convert('L')
+    horizontal = gray.resize((9, 8), Image.BILINEAR).tobytes()
+    vertical = gray.resize((8, 9), Image.BILINEAR).tobytes()
+    value = 0
+    for i in range(64):
+        row, col = divmod(i, 8)
+        value = value << 1 | (horizontal[row * 9 + col] > horizontal[row * 9 + col + 1])
+        value = value << 1 | (vertical[i] > vertical[i + 8])
+    colors = bytes(c >> 4 for c in img.convert('RGB').resize((4, 4), Image.BOX).tobytes())
+    return value, colors
+
+
+def is_near_duplicate(a, b, max_distance=IMAGE_HASH_DISTANCE):
+    '''Hamming məsafəsi kiçik və rənglər ən çox bir səviyyə fərqlidirsə True'''
+    bits_a, colors_a = a
+    bits_b, colors_b = b
+    if bin(bits_a ^ bits_b).count('1') > max_distance:
+        return False
+    return all(abs(x - y) <= 1 for x, y in zip(colors_a, colors_b))
+
+
+class ImageAnalyzer:
+    def __init__(self, cache=None):
+        api_key = os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            log.error('GEMINI_API_KEY tapilmadi')
+        else:
+            log.info('Gemini 3 Flash Vision yuklendi')
+
+        genai = configure_gemini()
+
+        # GEMINI 3 FLASH (vision dəstəkləyir)
+        self.model = genai.GenerativeModel('gemini-1.5-flash') # Qeyd: 3-flash hazırda 1.5-flash kimi tanınır
+
+        # Eyni foto (perceptual hash) üçün nəticə keşi; eyni anda gələn təkrarlar birləşdirilir
+        self.cache = cache or TTLCache(ttl=float(os.getenv('IMAGE_CACHE_TTL', 6 * 3600)),
+                                       maxsize=int(os.getenv('IMAGE_CACHE_SIZE', 512)))
+        self.inflight = SingleFlight()
+        self.scheduler = get_scheduler('gemini')
+        self.breaker = get_breaker('gemini')
+        # Keşdəki fotoların hash-ləri - təxmini (near-duplicate) axtarış üçün
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+        self.near_hits = 0
+        # Gemini yalnız dəqiqləşdirmə üçündür; söndürülübsə lokal qiymətləndirmə qaytarılır
+        self.refine = os.getenv('IMAGE_GEMINI_REFINE', '1') != '0'
+        self.bytes_received = 0
+        self.bytes_uploaded = 0
+
+    def analyze_image_data(self, data, refine=None):
+        '''Yüklənmiş şəkli (base64 və ya bytes) analiz et: (nəticə, keşdən_gəldi)
+
+        Əvvəl lokal duman qiymətləndirməsi aparılır; refine olarsa Gemini
+        cavabı onu dəqiqləşdirir, Gemini alınmasa lokal nəticə qaytarılır.
+        Şəkil oxuna bilmirsə ImageDecodeError atılır.
+        '''
+        data = image_bytes(data)
+        # base64 mətnin deyil, decode olunmuş şəklin ölçüsü
+        self.bytes_received += len(data)
+        img = decode_image(data)
+        img, jpeg = prepare_image(img)
+        local = local_result(haze.estimate(img))
+        if not (self.refine if refine is None else refine):
+            return local, False
+        phash = perceptual_hash(img)
+        key = f'{phash[0]:032x}-{phash[1].hex()}'
+
+        result = self.cache.peek(key)
+        if result is None:
+            result = self._near_duplicate(phash)
+        if result is not None:
+            log.debug('Foto keshden', key=key[:32])
+            return result, True
+        return self.inflight.do(key, lambda: self._analyze(key, phash, jpeg, local)), False
+
+    def analyze_batch(self, items):
+        '''Çox şəkil üçün yalnız lokal qiymətləndirmə (bir NumPy batch-da).
+
+        Oxunmayan elementlər üçün {'error': ...} qaytarılır.
+        '''
+        images, positions, results = [], [], [None] * len(items)
+        for i, data in enumerate(items):
+            try:
+                images.append(decode_image(data))
+                positions.append(i)
+            except ImageDecodeError as e:
+                results[i] = {'error': str(e)}
+        for i, estimate in zip(positions, haze.estimate_batch(images)):
+            results[i] = local_result(estimate)
+        return results
+
+    def _near_duplicate(self, phash):
+        '''Keşdə oxşar foto varsa onun nəticəsi (keş ölçüsü qədər xətti axtarış)'''
+        with self._lock:
+            candidates = [key for key, other in self._hashes.items() if is_near_duplicate(phash, other)]
+        for key in candidates:
+            result = self.cache.peek(key)
+            if result is not None:
+                self.near_hits += 1
+                return result
+            with self._lock:
+                self._hashes.pop(key, None)
+        return None
+
+    def analyze_sky_image(self, image_path):
+        '''Fayldakı şəkli analiz et'''
+        with open(image_path, 'rb') as f:
+            result, _ = self.analyze_image_data(f.read())
+        return result
+
+    def _analyze(self, key, phash, jpeg, local):
+        try:
+            log.debug('Foto analiz edilir', key=key[:32], bytes=len(jpeg))
+            self.bytes_uploaded += len(jpeg)
+
+            # Breaker açıqdırsa (CircuitOpen) və ya kvota bitibsə -> lokal nəticə qaytarılır
+            response = self.breaker.call(lambda: self.scheduler.call(
+                'image', lambda: self.model.generate_content(
+                    [ANALYSIS_PROMPT, {'mime_type': 'image/jpeg', 'data': jpeg}],
+                    request_options=GEMINI_REQUEST_OPTIONS)))
+
             text = response.text
-            
+
             # JSON-u tap
             json_match = re.search(r'\{.*\}', text, re.DOTALL)
             if json_match:
                 text = json_match.group(0)
-            
-            result = json.loads(text)
-            
-            print('Foto analiz edildi')
-            return result
 
-        except Exception as e:
-            print(f'Foto analiz xetasi: {e}')
-            return {
-                'description': 'Foto analiz edilə bilmədi',
-                'estimated_aqi': 75,
-                'aqi_category': 'Məlum deyil',
-                'recommendations': {
-                    'healthy': 'Normal aktivlik',
-                    'sensitive': 'Ehtiyatlı olun',
-                    'children': 'Nəzarət altında oyun',
-                    'elderly': 'Qısa gəzintilər'
-                }
+            result = json.loads(text)
+            result['source'] = 'gemini'
+            result['local_estimate'] = {
+                'estimated_aqi': local['estimated_aqi'],
+                'haze_index': local['haze_index'],
             }
+            # Yalnız uğurlu analiz keşlənir
+            self.cache.set(key, result)
+            with self._lock:
+                self._hashes[key] = phash
+                while len(self._hashes) > self.cache.maxsize:
+                    self._hashes.popitem(last=False)
 
-image_analyzer = ImageAnalyzer()
-app = Flask(__name__)
-
-# ... (digər endpointlər, məsələn /api/chat/reset) ...
+            log.debug('Foto analiz edildi', key=key[:32])
+            return result
 
-@app.route('/api/chat/reset', methods=['POST'])
-def reset_chat():
-    # Sizin mövcud reset kodunuz bura gəlir
-    return jsonify({"status": "reset"})
+        except Exception as e:
+            log.warning('Foto analiz xetasi', key=key[:32], error=str(e))
+            # Sabit AQI əvəzinə lokal qiymətləndirmə (keşlənmir)
+            return local
 
-# YENİ ƏLAVƏ EDİLƏN ENDPOINT:
-@app.route('/api/analyze-image', methods=['POST'])
-def analyze_image():
-    """Foto analiz endpoint"""
-    try:
-        data = request.get_json()
-        
-        if not data or 'image' not in data:
-            return jsonify({'error': 'Image data lazimdir'}), 400
-        
-        # Base64 image-i decode et
-        import base64
-        import io
-        from PIL import Image
-        import tempfile
-        import os
-        
-        image_data = data['image']
-        
-        # "data:image/jpeg;base64," prefixini sil
-        if 'base64,' in image_data:
-            image_data = image_data.split('base64,')[1]
-        
-        # Decode et
-        image_bytes = base64.b64decode(image_data)
-        
-        # Temporary file yarat
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-            temp_file.write(image_bytes)
-            temp_path = temp_file.name
-        
-        # Image analyzer çağır
-        result = image_analyzer.analyze_sky_image(temp_path)
-        
-        # Temp file sil
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
-            
-        return jsonify(result)
-        
-    except Exception as e:
-        print(f'Foto analiz xetasi: {e}')
-        return jsonify({
-            'error': 'Foto analiz edilə bilmədi',
-            'details': str(e)
-        }), 500
-
-if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    def stats(self):
+        stats = self.cache.stats()
+        stats.update({
+            'near_hits': self.near_hits,
+            'singleflight': self.inflight.stats(),
+            'bytes_received': self.bytes_received,
+            'bytes_uploaded': self.bytes_uploaded,
+        })
+        return stats
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from agents.cache import TTLCache
+
+
+class LLMResponseCache:
+    '''Gemini cavabları üçün TTL + LRU keş, istəyə görə diskdə (SQLite).
+
+    Açar normallaşdırılmış prompt imzasıdır (signature()). Cavab yalnız
+    uğurlu generasiyadan sonra yazılır. Hit zamanı qənaət olunan vaxt
+    həmin namespace üzrə orta generasiya müddəti ilə hesablanır.
+    '''
+
+    def __init__(self, ttl=None, maxsize=None, path=None):
+        self.ttl = ttl or float(os.getenv('LLM_CACHE_TTL', 6 * 3600))
+        self.memory = TTLCache(ttl=self.ttl, maxsize=maxsize or int(os.getenv('LLM_CACHE_SIZE', 1000)))
+        self.path = path if path is not None else os.getenv('LLM_CACHE_DB')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._latency = {}  # namespace -> [generasiya sayı, ümumi müddət]
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.saved_seconds = 0.0
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn().execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)')
+
+    @staticmethod
+    def signature(namespace, **parts):
+        '''Prompt hissələrindən sabit açar: "namespace:sha256"'''
+        normalized = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return f'{namespace}:' + hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def normalize_text(text):
+        '''Kiçik hərf, artıq boşluq və sondakı durğu işarələri atılır'''
+        return ' '.join(str(text).casefold().split()).strip(' .!?,;:')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key):
+        row = self._conn().execute(
+            'SELECT value, created FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        return row[0]
+
+    def _disk_set(self, key, value):
+        conn = self._conn()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO llm_cache (key, value, created) VALUES (?, ?, ?)',
+                         (key, value, time.time()))
+
+    def get(self, key):
+        '''Keşlənmiş cavab və ya None'''
+        value = self.memory.peek(key)
+        if value is None and self.path:
+            value = self._disk_get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        if value is not None:
+            self._record_hit(key)
+        else:
+            with self._lock:
+                self.misses += 1
+        return value
+
+    def get_stale(self, key):
+        '''Vaxtı keçmiş də olsa son cavab: (cavab, yaş) və ya (None, None).
+
+        Gemini əlçatmaz olanda son uğurlu cavabı yaşı ilə göstərmək üçün.
+        '''
+        value, age = self.memory.get(key)
+        if value is None and self.path:
+            row = self._conn().execute(
+                'SELECT value, created FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                value, age = row[0], time.time() - row[1]
+        return value, age
+
+    def get_or_generate(self, key, generate):
+        '''(cavab, hit) qaytarır; generate() xəta atarsa heç nə yazılmır'''
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        start = time.perf_counter()
+        value = generate()
+        elapsed = time.perf_counter() - start
+        namespace = key.split(':', 1)[0]
+        with self._lock:
+            count, total = self._latency.get(namespace, (0, 0.0))
+            self._latency[namespace] = (count + 1, total + elapsed)
+
+        self.set(key, value)
+        return value, False
+
+    def set(self, key, value):
+        '''Hazır cavabı keşə yaz (boş cavablar yazılmır)'''
+        if not value:
+            return
+        self.memory.set(key, value)
+        if self.path:
+            self._disk_set(key, value)
+
+    def _record_hit(self, key):
+        namespace = key.split(':', 1)[0]
+        with self._lock:
+            self.hits += 1
+            count, total = self._latency.get(namespace, (0, 0.0))
+            if count:
+                self.saved_seconds += total / count
+
+    def stats(self):
+        stats = self.memory.stats()
+        with self._lock:
+            total = self.hits + self.misses
+            stats.update({
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+                'persistent': bool(self.path),
+                'disk_hits': self.disk_hits,
+                'saved_seconds': round(self.saved_seconds, 2),
+                'avg_generation_seconds': {
+                    ns: round(seconds / n, 3) for ns, (n, seconds) in self._latency.items()
+                },
+            })
+        return stats
@@ -0,0 +1,32 @@
+# Azərbaycanın şəhər və rayonları
+AZERBAIJAN_LOCATIONS = {
+    # BAKI RAYONLARI
+    'Bakı - Nəsimi': {'lat': 40.3947, 'lon': 49.8822, 'city': 'Bakı'},
+    'Bakı - Nərimanov': {'lat': 40.4015, 'lon': 49.8539, 'city': 'Bakı'},
+    'Bakı - Səbail': {'lat': 40.3656, 'lon': 49.8354, 'city': 'Bakı'},
+    'Bakı - Yasamal': {'lat': 40.3917, 'lon': 49.8064, 'city': 'Bakı'},
+    'Bakı - Binəqədi': {'lat': 40.4550, 'lon': 49.8203, 'city': 'Bakı'},
+    'Bakı - Xətai': {'lat': 40.3800, 'lon': 49.8100, 'city': 'Bakı'},
+    'Bakı - Suraxanı': {'lat': 40.4200, 'lon': 50.0100, 'city': 'Bakı'},
+    'Bakı - Sabunçu': {'lat': 40.4400, 'lon': 49.9500, 'city': 'Bakı'},
+    'Bakı - Xəzər': {'lat': 40.4700, 'lon': 50.0300, 'city': 'Bakı'},
+    'Bakı - Qaradağ': {'lat': 40.3500, 'lon': 49.7000, 'city': 'Bakı'},
+
+    # DİGƏR ƏSAS ŞƏHƏRLƏR
+    'Gəncə': {'lat': 40.6828, 'lon': 46.3606, 'city': 'Gəncə'},
+    'Sumqayıt': {'lat': 40.5897, 'lon': 49.6686, 'city': 'Sumqayıt'},
+    'Mingəçevir': {'lat': 40.7703, 'lon': 47.0497, 'city': 'Mingəçevir'},
+    'Şirvan': {'lat': 39.9372, 'lon': 48.9208, 'city': 'Şirvan'},
+    'Lənkəran': {'lat': 38.7542, 'lon': 48.8508, 'city': 'Lənkəran'},
+    'Naxçıvan': {'lat': 39.2090, 'lon': 45.4120, 'city': 'Naxçıvan'},
+    'Şəki': {'lat': 41.1919, 'lon': 47.1706, 'city': 'Şəki'},
+}
+
+# HealthAdvisor-un istifadə etdiyi Bakı rayonları (qısa ad -> tam ad)
+ADVISOR_DISTRICTS = {
+    'Nesimi': 'Bakı - Nəsimi',
+    'Nerimanov': 'Bakı - Nərimanov',
+    'Sebail': 'Bakı - Səbail',
+    'Yasamal': 'Bakı - Yasamal',
+    'Binegedi': 'Bakı - Binəqədi',
+}
@@ -0,0 +1,130 @@
+'''Strukturlu, səviyyəli, buferli log.
+
+Request thread-i qeydi yalnız növbəyə qoyur (QueueHandler); formatlama və
+stderr-ə yazma ayrı thread-də (QueueListener) aparılır. Növbə doludursa
+qeyd atılır və sayılır - sorğu heç vaxt I/O gözləmir.
+
+LOG_LEVEL (INFO), LOG_FORMAT (json | text; terminalda default text),
+LOG_QUEUE_SIZE (10000).
+
+configure_logging() proses giriş nöqtəsində (api/server.py) bir dəfə
+çağırılır; get_logger() heç nəyi konfiqurasiya etmir - paketi import edən
+gunicorn/pytest kimi alətlərin root logger-i toxunulmaz qalır.
+
+    log = get_logger(__name__)
+    log.info('AQI alindi', aqi=57, lat=40.4, lon=49.8)
+'''
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+_configured = False
+_lock = threading.Lock()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    '''Növbə dolu olanda bloklamır, qeydi atıb sayır'''
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # Yalnız mesajı hazırla; JSON/text formatlama listener thread-indədir
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.msg,
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+def configure_logging():
+    '''Root logger-ə növbə handler-i qoş (proses üzrə bir dəfə)'''
+    global _configured
+    if _configured:
+        return
+    with _lock:
+        if _configured:
+            return
+        log_format = os.getenv('LOG_FORMAT') or ('text' if sys.stderr.isatty() else 'json')
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(TextFormatter() if log_format == 'text' else JsonFormatter())
+
+        records = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+        listener = logging.handlers.QueueListener(records, stream, respect_handler_level=False)
+        listener.start()
+        # Proses bitəndə növbədə qalanlar yazılsın
+        atexit.register(listener.stop)
+
+        root = logging.getLogger()
+        root.addHandler(DroppingQueueHandler(records))
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        _configured = True
+
+
+class Logger:
+    '''logging.Logger üzərində nazik qat: log.info('mesaj', açar=dəyər, ...)'''
+
+    def __init__(self, name):
+        self._logger = logging.getLogger(name)
+
+    def _log(self, level, msg, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, msg, extra={'fields': fields}, exc_info=exc_info)
+
+    def debug(self, msg, **fields):
+        self._log(logging.DEBUG, msg, fields)
+
+    def info(self, msg, **fields):
+        self._log(logging.INFO, msg, fields)
+
+    def warning(self, msg, **fields):
+        self._log(logging.WARNING, msg, fields)
+
+    def error(self, msg, **fields):
+        self._log(logging.ERROR, msg, fields)
+
+    def exception(self, msg, **fields):
+        '''error + traceback (except bloku daxilində)'''
+        self._log(logging.ERROR, msg, fields, exc_info=True)
+
+
+def get_logger(name):
+    return Logger(name)
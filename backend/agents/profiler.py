@@ -0,0 +1,119 @@
+'''İstəyə görə (opt-in) sampling profiler - seçilmiş handler-lar üçün.
+
+PROFILER_ENABLED=1 olanda @profiler.profile('aqi') ilə işarələnmiş
+handler-ların PROFILER_SAMPLE_RATE hissəsi profil olunur: ITIMER_PROF
+siqnalı hər PROFILER_INTERVAL_MS CPU millisaniyəsində gəlir və həmin
+anda profil olunan handler-ın içində işləyən stack yazılır. Nəticə
+"collapsed stack" formatındadır (flamegraph.pl, speedscope).
+
+Söndürülüb olanda dekorator yalnız bir bayraq yoxlayır. Siqnal yalnız
+Unix-də və əsas thread-də qurula bilər; başqa halda profiler sönük qalır.
+'''
+import os
+import random
+import signal
+import sys
+import threading
+from collections import Counter
+from functools import wraps
+
+from agents.log import get_logger
+
+log = get_logger(__name__)
+
+
+class SamplingProfiler:
+    def __init__(self, enabled=None, sample_rate=None, interval=None, max_stacks=5000):
+        self.enabled = enabled if enabled is not None else os.getenv('PROFILER_ENABLED') == '1'
+        self.sample_rate = sample_rate if sample_rate is not None else \
+            float(os.getenv('PROFILER_SAMPLE_RATE', 0.1))
+        self.interval = interval or float(os.getenv('PROFILER_INTERVAL_MS', 5)) / 1000
+        self.max_stacks = max_stacks
+        self.stacks = Counter()
+        # Siqnal handler-i yalnız siyahıya əlavə edir (dict-i iterasiya zamanı dəyişməsin);
+        # cəmləmə collapsed()-da aparılır
+        self._pending = []
+        self.samples = 0
+        self.profiled = Counter()  # route -> profil olunan sorğu sayı
+        self._active = {}  # id(handler frame) -> route
+        self._lock = threading.Lock()
+        if self.enabled:
+            self._install()
+
+    def _install(self):
+        if not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+            log.warning('Profiler qurulmadi: setitimer yoxdur ve ya esas thread deyil')
+            self.enabled = False
+            return
+        signal.signal(signal.SIGPROF, self._sample)
+        log.info('Profiler aktivdir', sample_rate=self.sample_rate, interval_ms=self.interval * 1000)
+
+    def _sample(self, signum, frame):
+        # Siqnal əsas thread-də gəlir; gthread worker-lərində handler başqa thread-də ola bilər
+        frames = [frame] + [f for ident, f in sys._current_frames().items()
+                            if ident != threading.main_thread().ident]
+        for top in frames:
+            stack = []
+            current = top
+            while current is not None:
+                route = self._active.get(id(current))
+                if route is not None:
+                    stack.append(route)
+                    if len(self._pending) < self.max_stacks * 20:
+                        self._pending.append(';'.join(reversed(stack)))
+                    break
+                code = current.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                current = current.f_back
+
+    def profile(self, route):
+        '''Handler dekoratoru; söndürülübsə heç nə etmir'''
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or random.random() >= self.sample_rate:
+                    return fn(*args, **kwargs)
+                frame = sys._getframe()
+                with self._lock:
+                    self._active[id(frame)] = route
+                    self.profiled[route] += 1
+                    if len(self._active) == 1:
+                        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    with self._lock:
+                        self._active.pop(id(frame), None)
+                        if not self._active:
+                            signal.setitimer(signal.ITIMER_PROF, 0)
+            return wrapper
+        return decorator
+
+    def collapsed(self, reset=False):
+        '''"route;fayl:funksiya;... say" sətirləri'''
+        with self._lock:
+            self._drain()
+            stacks = self.stacks.copy()
+            if reset:
+                self.stacks.clear()
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+    def _drain(self):
+        # lock çağıranda
+        pending, self._pending = self._pending, []
+        self.samples += len(pending)
+        for key in pending:
+            if key in self.stacks or len(self.stacks) < self.max_stacks:
+                self.stacks[key] += 1
+
+    def stats(self):
+        with self._lock:
+            self._drain()
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'stacks': len(self.stacks),
+            'profiled': dict(self.profiled),
+        }
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from agents.log import get_logger
+
+log = get_logger(__name__)
+
+
+class AgentRegistry:
+    '''Ağır agentləri (Gemini SDK, PIL) ilk istifadədə, proses üzrə bir dəfə yaradır.
+
+    register() yalnız factory yadda saxlayır; get() ilk çağırışda onu
+    icra edir. Eyni agenti eyni anda istəyən sorğular bir qurulmanı
+    gözləyir, fərqli agentlər bir-birini bloklamır.
+    '''
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.build_seconds = {}
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                instance = self._factories[name]()
+                self.build_seconds[name] = round(time.perf_counter() - start, 3)
+                log.info('Agent yaradildi', agent=name, seconds=self.build_seconds[name])
+                self._instances[name] = instance
+        return instance
+
+    def is_built(self, name):
+        return name in self._instances
+
+    def warm(self, names=None):
+        '''Agentləri arxa planda əvvəlcədən qur (ilk sorğu gözləməsin)'''
+        def build():
+            for name in names or list(self._factories):
+                try:
+                    self.get(name)
+                except Exception as e:
+                    log.exception('Agent yaradila bilmedi', agent=name, error=str(e))
+        thread = threading.Thread(target=build, name='agent-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {
+            name: {'built': name in self._instances, 'build_seconds': self.build_seconds.get(name)}
+            for name in self._factories
+        }
@@ -0,0 +1,186 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# Kiçik rəqəm = yüksək prioritet. Snapshot yenilənməsi chat-dan, chat
+# müqayisədən əvvəl token alır.
+LANES = {
+    'snapshot': 0,
+    'interactive': 1,
+    'chat': 1,
+    'compare': 2,
+    'image': 2,
+    'batch': 2,
+}
+# Lane üzrə token üçün ən uzun gözləmə; təxmini gözləmə bundan çoxdursa
+# sorğu dərhal imtina alır (load shedding) və çağıran keş/fallback verir
+LANE_MAX_WAIT = {
+    'snapshot': 10.0,
+    'interactive': 2.0,
+    'chat': 3.0,
+    'compare': 1.0,
+    'image': 2.0,
+    'batch': 1.0,
+}
+
+# Upstream-lərin dəqiqəlik kvotası (bütün worker-lər üçün cəmi) və burst
+UPSTREAM_DEFAULTS = {
+    'openweather': {'rate_per_minute': 60, 'burst': 30},
+    'gemini': {'rate_per_minute': 60, 'burst': 10},
+}
+
+
+class QuotaExceeded(Exception):
+    '''Upstream kvotası bitib - sorğu göndərilmədi'''
+
+    def __init__(self, upstream, lane, wait):
+        super().__init__(f'{upstream} kvotası doludur ({lane}, ~{wait:.1f}s gözləmə)')
+        self.upstream = upstream
+        self.lane = lane
+        self.wait = wait
+
+
+class TokenBucket:
+    '''rate token/saniyə ilə dolan, ən çox capacity token saxlayan vedrə (lock çağıranda)'''
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now, n=1):
+        '''n token yığılana qədər qalan saniyə'''
+        self._refill(now)
+        missing = n - self.tokens
+        return max(0.0, missing / self.rate) if self.rate > 0 else float('inf')
+
+
+class UpstreamScheduler:
+    '''Bir upstream üçün token bucket + prioritet növbəsi.
+
+    Token varsa və növbə boşdursa çağırış dərhal keçir. Əks halda çağıran
+    thread növbəyə (lane prioriteti, sonra gəliş sırası) düşür və yalnız
+    növbənin başında olanda token alır. Gözləmə lane limitini aşacaqsa
+    QuotaExceeded atılır.
+    '''
+
+    def __init__(self, name, rate_per_minute, burst=None):
+        self.name = name
+        self.rate_per_minute = rate_per_minute
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst or rate_per_minute)
+        self._cond = threading.Condition()
+        self._queue = []  # (prioritet, sıra)
+        self._seq = itertools.count()
+        self._lanes = {}  # sıra -> lane, növbədəkilərin lane-i
+        self.granted = dict.fromkeys(LANES, 0)
+        self.shed = dict.fromkeys(LANES, 0)
+        self.wait_seconds = 0.0
+
+    def acquire(self, lane, max_wait=None):
+        '''Token al (lazım olsa gözlə); gözlənilən saniyəni qaytarır'''
+        priority = LANES[lane]
+        max_wait = LANE_MAX_WAIT[lane] if max_wait is None else max_wait
+        with self._cond:
+            start = time.monotonic()
+            if not self._queue and self.bucket.try_take(start):
+                self.granted[lane] += 1
+                return 0.0
+
+            ahead = sum(1 for p, _ in self._queue if p <= priority)
+            estimate = self.bucket.wait_time(start, ahead + 1)
+            if estimate > max_wait:
+                self.shed[lane] += 1
+                raise QuotaExceeded(self.name, lane, estimate)
+
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            self._lanes[ticket[1]] = lane
+            deadline = start + max_wait
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._queue[0] == ticket and self.bucket.try_take(now):
+                        heapq.heappop(self._queue)
+                        waited = now - start
+                        self.granted[lane] += 1
+                        self.wait_seconds += waited
+                        return waited
+                    if now >= deadline:
+                        self.shed[lane] += 1
+                        raise QuotaExceeded(self.name, lane, self.bucket.wait_time(now))
+                    self._cond.wait(min(deadline - now, max(self.bucket.wait_time(now), 0.005)))
+            finally:
+                self._lanes.pop(ticket[1], None)
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                # Növbənin yeni başı yoxlasın
+                self._cond.notify_all()
+
+    def call(self, lane, fn, max_wait=None):
+        '''Token alıb fn()-i çağır; kvota yoxdursa QuotaExceeded'''
+        self.acquire(lane, max_wait)
+        return fn()
+
+    def queue_depth(self):
+        with self._cond:
+            depth = dict.fromkeys(LANES, 0)
+            for lane in self._lanes.values():
+                depth[lane] += 1
+            return depth
+
+    def stats(self):
+        depth = self.queue_depth()
+        with self._cond:
+            self.bucket._refill(time.monotonic())
+            return {
+                'rate_per_minute': self.rate_per_minute,
+                'tokens': round(self.bucket.tokens, 2),
+                'queued': sum(depth.values()),
+                'queue_depth': depth,
+                'granted': dict(self.granted),
+                'shed': dict(self.shed),
+                'wait_seconds': round(self.wait_seconds, 2),
+            }
+
+
+_schedulers = {}
+_lock = threading.Lock()
+
+
+def get_scheduler(name):
+    '''Upstream üçün proses üzrə yeganə scheduler.
+
+    Kvota {NAME}_RATE_PER_MIN / {NAME}_BURST ilə verilir və bütün
+    gunicorn worker-ləri arasında bölünür (WEB_CONCURRENCY).
+    '''
+    scheduler = _schedulers.get(name)
+    if scheduler is None:
+        with _lock:
+            scheduler = _schedulers.get(name)
+            if scheduler is None:
+                defaults = UPSTREAM_DEFAULTS.get(name, {'rate_per_minute': 60, 'burst': 10})
+                workers = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+                rate = float(os.getenv(f'{name.upper()}_RATE_PER_MIN', defaults['rate_per_minute']))
+                burst = float(os.getenv(f'{name.upper()}_BURST', defaults['burst']))
+                scheduler = UpstreamScheduler(name, rate / workers, max(1.0, burst / workers))
+                _schedulers[name] = scheduler
+    return scheduler
+
+
+def all_stats():
+    return {name: scheduler.stats() for name, scheduler in _schedulers.items()}
@@ -0,0 +1,157 @@
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+from agents.log import get_logger
+
+log = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class AQISnapshot:
+    '''Bütün rayonların dəyişməz AQI şəkli'''
+    data: MappingProxyType
+    status: MappingProxyType
+    fetched_at: float
+    version: int = 0
+    district_fetched_at: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def age(self):
+        '''Snapshot-un yaşı (saniyə)'''
+        return time.time() - self.fetched_at
+
+    def get(self, district):
+        return self.data.get(district)
+
+    def district_age(self, district):
+        '''Rayonun dəyərinin yaşı (saniyə) - köhnə saxlanılan dəyərlər üçün snapshot-dan böyükdür'''
+        return time.time() - self.district_fetched_at.get(district, self.fetched_at)
+
+    def stale_districts(self):
+        return [name for name, status in self.status.items() if status == 'stale']
+
+
+EMPTY_SNAPSHOT = AQISnapshot(
+    data=MappingProxyType({}),
+    status=MappingProxyType({}),
+    fetched_at=0.0,
+)
+
+
+class SnapshotPoller:
+    '''Bütün lokasiyaları periodik yeniləyib yeni snapshot dərc edir.
+
+    Oxuyan endpointlər yalnız current() çağırır - şəbəkə sorğusu yoxdur.
+    Alınmayan rayonlar üçün əvvəlki dəyər saxlanılır (status: 'stale').
+    '''
+
+    def __init__(self, collector, locations, interval=None, jitter=None):
+        self.collector = collector
+        self.locations = locations
+        self.interval = interval or float(os.getenv('AQI_POLL_INTERVAL', 600))
+        self.jitter = jitter if jitter is not None else float(os.getenv('AQI_POLL_JITTER', 30))
+        self._snapshot = EMPTY_SNAPSHOT
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def current(self):
+        '''Son snapshot - O(1), kilid yoxdur'''
+        return self._snapshot
+
+    def subscribe(self, callback):
+        '''Hər yeni snapshot-dan sonra callback(snapshot) çağırılır'''
+        self._subscribers.append(callback)
+
+    def wait_ready(self, timeout=None):
+        '''İlk snapshot hazır olana qədər gözlə'''
+        self._ready.wait(timeout)
+        return self._snapshot
+
+    def seed(self, readings):
+        '''Hələ snapshot yoxdursa son məlum dəyərlərdən (status 'stale') birini dərc et.
+
+        readings: {rayon: (fetched_at, data)}, məs. HistoryStore.latest().
+        Upstream əlçatmaz olanda server boş cavab əvəzinə köhnə, yaşı
+        göstərilən data ilə açılır.
+        '''
+        with self._lock:
+            if self._snapshot.version or not readings:
+                return None
+            data = {name: value for name, (_, value) in readings.items()}
+            fetched = {name: ts for name, (ts, _) in readings.items()}
+            snapshot = AQISnapshot(
+                data=MappingProxyType(data),
+                status=MappingProxyType(dict.fromkeys(data, 'stale')),
+                fetched_at=max(fetched.values()),
+                version=1,
+                district_fetched_at=MappingProxyType(fetched),
+            )
+            self._snapshot = snapshot
+        log.info('Snapshot son melum deyerlerden yuklendi', districts=len(data))
+        self._publish(snapshot)
+        return snapshot
+
+    def refresh(self):
+        '''Bütün lokasiyaları yenidən al və yeni snapshot dərc et'''
+        with self._lock:
+            results, status = self.collector.get_aqi_for_locations(
+                self.locations, fresh=True, lane='snapshot')
+            previous = self._snapshot
+            now = time.time()
+
+            data = dict(results)
+            fetched = {name: now for name in results}
+            status = dict(status)
+            for name, value in previous.data.items():
+                if name not in data:
+                    # Son uğurlu dəyəri saxla
+                    data[name] = value
+                    fetched[name] = previous.district_fetched_at.get(name, previous.fetched_at)
+                    status[name] = 'stale'
+
+            snapshot = AQISnapshot(
+                data=MappingProxyType(data),
+                status=MappingProxyType(status),
+                fetched_at=now,
+                version=previous.version + 1,
+                district_fetched_at=MappingProxyType(fetched),
+            )
+            self._snapshot = snapshot
+
+        log.info('Snapshot yenilendi', version=snapshot.version, ok=len(results),
+                 total=len(self.locations), stale=len(snapshot.stale_districts()))
+        self._publish(snapshot)
+        return snapshot
+
+    def _publish(self, snapshot):
+        self._ready.set()
+        for callback in self._subscribers:
+            try:
+                callback(snapshot)
+            except Exception:
+                log.exception('Snapshot abunəçi xetasi', callback=getattr(callback, '__qualname__', str(callback)))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='aqi-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                log.exception('Snapshot xetasi')
+            delay = self.interval + random.uniform(-self.jitter, self.jitter)
+            self._stop.wait(max(1.0, delay))
@@ -0,0 +1,122 @@
+'''Koordinat əməliyyatları: geohash snapping və ən yaxın lokasiya axtarışı (KD-tree).'''
+import heapq
+import math
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash_encode(lat, lon, precision=5):
+    '''Koordinatı geohash hüceyrəsinə çevir'''
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash):
+    '''(south, west, north, east)'''
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def snap(lat, lon, precision=5):
+    '''Koordinatı geohash hüceyrəsinin mərkəzinə çək: (geohash, lat, lon)'''
+    cell = geohash_encode(lat, lon, precision)
+    south, west, north, east = geohash_bounds(cell)
+    return cell, (south + north) / 2, (west + east) / 2
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class KDTree:
+    '''Lokasiyalar üzərində 2D KD-tree (lokal ekvirektangulyar proyeksiyada, km).
+
+    query() O(log n) orta mürəkkəblikdə ən yaxın k nöqtəni qaytarır;
+    nəticədəki məsafələr haversine ilə dəqiqləşdirilir.
+    '''
+
+    def __init__(self, points):
+        '''points: {ad: (lat, lon)}'''
+        self.points = dict(points)
+        lats = [lat for lat, _ in self.points.values()] or [0.0]
+        self._cos = math.cos(math.radians(sum(lats) / len(lats)))
+        items = [(self._project(lat, lon), name) for name, (lat, lon) in self.points.items()]
+        self._root = self._build(items, 0)
+
+    def _project(self, lat, lon):
+        return (lon * self._cos * 111.32, lat * 110.57)
+
+    def _build(self, items, depth):
+        if not items:
+            return None
+        axis = depth % 2
+        items.sort(key=lambda item: item[0][axis])
+        mid = len(items) // 2
+        point, name = items[mid]
+        return (point, name, axis,
+                self._build(items[:mid], depth + 1),
+                self._build(items[mid + 1:], depth + 1))
+
+    def query(self, lat, lon, k=1):
+        '''[(ad, məsafə_km)] ən yaxından uzağa'''
+        target = self._project(lat, lon)
+        heap = []  # (-d2, name) - k ən yaxın
+
+        def visit(node):
+            if node is None:
+                return
+            point, name, axis, left, right = node
+            d2 = (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, name))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, name))
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+
+        visit(self._root)
+        result = []
+        for _, name in sorted(heap, reverse=True):
+            p_lat, p_lon = self.points[name]
+            result.append((name, round(haversine_km(lat, lon, p_lat, p_lon), 2)))
+        return result
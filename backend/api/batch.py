@@ -0,0 +1,115 @@
+'''POST /api/aqi/batch: çoxlu koordinat/rayon üçün AQI bir sorğuda.
+
+Koordinatlar geohash hüceyrəsinin mərkəzinə çəkilir və təkrarlar
+birləşdirilir. Keşdə təzə olan hüceyrələr dərhal verilir, qalanları
+bir ümumi deadline ilə paralel alınır (ən çox max_fetch hüceyrə);
+alınmayanlar üçün ən yaxın rayonun snapshot dəyəri qaytarılır.
+Rayon adları snapshot-dan oxunur - upstream sorğusu yoxdur.
+
+Cavab sütunludur: unikal sətirlər üçün massivlər və hər girişin
+sətir nömrəsi (index), beləliklə təkrar nöqtələr cavabı böyütmür.
+'''
+from agents.spatial import snap
+
+FIELDS = ('aqi', 'dominant', 'pm2_5', 'pm10', 'co', 'no2', 'o3')
+
+
+def parse_points(points):
+    '''[[lat, lon], ...] və ya [{'lat':, 'lon':}, ...] -> [(lat, lon) | səhv mətni]'''
+    parsed = []
+    for point in points:
+        try:
+            if isinstance(point, dict):
+                lat, lon = float(point['lat']), float(point['lon'])
+            else:
+                lat, lon = (float(v) for v in point)
+        except (KeyError, TypeError, ValueError):
+            parsed.append('lat və lon rəqəm olmalıdır')
+            continue
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            parsed.append('Koordinat aralıqdan kənardır')
+            continue
+        parsed.append((lat, lon))
+    return parsed
+
+
+def batch_query(collector, snapshot, locations, location_index, points, districts,
+                precision, deadline, max_fetch):
+    '''Sütunlu cavab dict-i (jsonify üçün hazır)'''
+    rows = {}  # açar -> sətir nömrəsi
+    keys, lats, lons = [], [], []
+    index, errors = [], []
+
+    def row_for(key, lat, lon):
+        if key not in rows:
+            rows[key] = len(keys)
+            keys.append(key)
+            lats.append(lat)
+            lons.append(lon)
+        return rows[key]
+
+    for i, point in enumerate(parse_points(points)):
+        if isinstance(point, str):
+            index.append(-1)
+            errors.append({'input': i, 'error': point})
+            continue
+        cell, lat, lon = snap(point[0], point[1], precision)
+        index.append(row_for(cell, round(lat, 4), round(lon, 4)))
+
+    for i, name in enumerate(districts, start=len(points)):
+        coords = locations.get(name) if isinstance(name, str) else None
+        if coords is None:
+            index.append(-1)
+            errors.append({'input': i, 'error': 'Rayon tapılmadı'})
+            continue
+        index.append(row_for(name, coords['lat'], coords['lon']))
+
+    values = [None] * len(keys)
+    sources = [None] * len(keys)
+    ages = [None] * len(keys)
+    missing = {}
+    results = {}
+    for row, key in enumerate(keys):
+        if key in locations:
+            values[row] = snapshot.get(key)
+            if values[row]:
+                sources[row] = 'snapshot'
+                ages[row] = snapshot.district_age(key)
+            continue
+        cached = collector.peek_aqi(lats[row], lons[row])
+        if cached:
+            values[row], sources[row] = cached, 'cache'
+            ages[row] = collector.cache_age(lats[row], lons[row])
+        elif len(missing) < max_fetch:
+            missing[row] = {'lat': lats[row], 'lon': lons[row]}
+
+    if missing:
+        # Bütün çatışmayan hüceyrələr paralel, bir ümumi deadline ilə
+        results, _ = collector.get_aqi_for_locations(missing, deadline=deadline, lane='batch')
+        for row, data in results.items():
+            values[row], sources[row] = data, 'fetched'
+            ages[row] = collector.cache_age(lats[row], lons[row])
+
+    for row, key in enumerate(keys):
+        if values[row] is None and key not in locations:
+            # Alınmadı və ya max_fetch-dən artıqdır - ən yaxın rayonun dəyəri
+            nearest, _ = location_index.query(lats[row], lons[row], 1)[0]
+            values[row] = snapshot.get(nearest)
+            if values[row]:
+                sources[row] = 'nearest'
+                ages[row] = snapshot.district_age(nearest)
+
+    columns = {'key': keys, 'lat': lats, 'lon': lons, 'source': sources,
+               'age': [round(age, 1) if age is not None else None for age in ages]}
+    for field in FIELDS:
+        columns[field] = [value.get(field) if value else None for value in values]
+    return {
+        'precision': precision,
+        'count': len(index),
+        'rows': len(keys),
+        'index': index,
+        'columns': columns,
+        'errors': errors,
+        'attempted': len(missing),  # upstream-dən istənən hüceyrələr
+        'fetched': len(results),  # onlardan alınanlar
+    }
@@ -0,0 +1,137 @@
+'''AQI dəyişikliklərini SSE ilə yayan broadcaster (/api/aqi/stream).
+
+Hər yeni snapshot-da yalnız oxunuşu (və ya statusu) dəyişən rayonlardan
+delta hadisəsi qurulur və bir dəfə bayta kodlanır. Bağlantılar öz
+növbəsini saxlamır: hamısı eyni Condition-da gözləyir və ortaq halqa
+buferindən son gördüyü sıra nömrəsindən sonrakı hazır baytları oxuyur -
+bağlantı başına yaddaş bir generator və bir tam ədəddir.
+
+Hadisə id-si "versiya.hash" formatındadır (hash - tam vəziyyətin).
+Yenidən qoşulan klient Last-Event-ID göndərir; id buferdədirsə yalnız
+sonrakı deltalar, yoxdursa (köhnədir və ya başqa worker-dəndir) tam
+snapshot hadisəsi göndərilir.
+'''
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+
+from agents.log import get_logger
+
+log = get_logger(__name__)
+
+HEARTBEAT = b': ping\n\n'
+
+
+def sse_frame(event, event_id, data):
+    return (f'id: {event_id}\nevent: {event}\n'
+            f'data: {json.dumps(data, ensure_ascii=False, separators=(",", ":"))}\n\n').encode('utf-8')
+
+
+class AQIBroadcaster:
+    '''Snapshot abunəçisi; events() hər SSE bağlantısı üçün bayt generatorudur'''
+
+    def __init__(self, heartbeat=None, history=None, retry_ms=None):
+        self.heartbeat = heartbeat or float(os.getenv('AQI_STREAM_HEARTBEAT', 15))
+        self.retry_ms = retry_ms or int(os.getenv('AQI_STREAM_RETRY_MS', 5000))
+        # (seq, event_id, frame) - son deltalar
+        self._history = deque(maxlen=history or int(os.getenv('AQI_STREAM_HISTORY', 64)))
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._event_id = None
+        self._version = None
+        self._data = {}
+        self._status = {}
+        self._fetched_at = None
+        self._snapshot_frame = None  # tam vəziyyət, ilk lazım olanda bir dəfə kodlanır
+        self.clients = 0
+        self.published = 0
+
+    def update(self, snapshot):
+        data = dict(snapshot.data)
+        status = dict(snapshot.status)
+        with self._cond:
+            if self._version is not None and snapshot.version <= self._version:
+                return
+            changed = {name: value for name, value in data.items() if self._data.get(name) != value}
+            removed = [name for name in self._data if name not in data]
+            status_changed = {name: value for name, value in status.items()
+                              if self._status.get(name) != value}
+            state = json.dumps([data, status], sort_keys=True).encode('utf-8')
+            event_id = f'{snapshot.version}.{hashlib.blake2b(state, digest_size=6).hexdigest()}'
+            self._version, self._data, self._status = snapshot.version, data, status
+            self._fetched_at = snapshot.fetched_at
+            self._event_id = event_id
+            self._snapshot_frame = None
+            if not (changed or removed or status_changed):
+                return
+            delta = {'version': snapshot.version, 'fetched_at': snapshot.fetched_at, 'changed': changed}
+            if removed:
+                delta['removed'] = removed
+            if status_changed:
+                delta['status'] = status_changed
+            self._seq += 1
+            self._history.append((self._seq, event_id, sse_frame('delta', event_id, delta)))
+            self.published += 1
+            self._cond.notify_all()
+        log.debug('AQI delta yayildi', version=snapshot.version, changed=len(changed),
+                  clients=self.clients)
+
+    def _full_frame(self):
+        # self._cond tutulub
+        if self._snapshot_frame is None and self._event_id is not None:
+            self._snapshot_frame = sse_frame('snapshot', self._event_id, {
+                'version': self._version,
+                'fetched_at': self._fetched_at,
+                'results': self._data,
+                'status': self._status,
+            })
+        return self._snapshot_frame
+
+    def _frames_since(self, seq):
+        '''seq-dən sonrakı deltalar; klient buferdən geri qalıbsa tam snapshot'''
+        if seq == self._seq:
+            return []
+        if not self._history or seq < self._history[0][0] - 1:
+            frame = self._full_frame()
+            return [frame] if frame else []
+        return [frame for s, _, frame in self._history if s > seq]
+
+    def _resume(self, last_event_id):
+        '''Yeni bağlantı üçün ilk hadisələr'''
+        if last_event_id is not None:
+            if last_event_id == self._event_id:
+                return []
+            for seq, event_id, _ in self._history:
+                if event_id == last_event_id:
+                    return self._frames_since(seq)
+        frame = self._full_frame()
+        return [frame] if frame else []
+
+    def events(self, last_event_id=None):
+        with self._cond:
+            frames = self._resume(last_event_id)
+            seq = self._seq
+            self.clients += 1
+        try:
+            yield f'retry: {self.retry_ms}\n\n'.encode('ascii') + b''.join(frames)
+            while True:
+                with self._cond:
+                    if seq == self._seq:
+                        self._cond.wait(self.heartbeat)
+                    frames = self._frames_since(seq)
+                    seq = self._seq
+                yield b''.join(frames) if frames else HEARTBEAT
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    def stats(self):
+        return {
+            'clients': self.clients,
+            'published': self.published,
+            'version': self._version,
+            'event_id': self._event_id,
+            'history': len(self._history),
+        }
@@ -0,0 +1,100 @@
+'''Data versiyası başına bir dəfə kodlanan JSON cavabları.
+
+Snapshot dəyişəndə JSON bir dəfə serializə olunur və gzip/brotli
+variantları hazırlanır; sorğu yalnız hazır baytlardan birini seçir.
+ETag gövdənin hash-idir - gunicorn worker-ləri eyni data üçün eyni ETag
+verir. If-None-Match uyğun gələndə 304 gövdəsiz qayıdır.
+
+brotli paketi quraşdırılmayıbsa yalnız gzip verilir.
+'''
+import gzip
+import hashlib
+import json
+import threading
+from email.utils import formatdate
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class EncodedBody:
+    '''Dəyişməz JSON gövdəsi: identity, gzip və (varsa) brotli baytları'''
+
+    def __init__(self, data, last_modified):
+        self.body = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        self.tag = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        # mtime=0 - eyni data hər worker-də eyni bayt verir
+        self.encodings = {'gzip': gzip.compress(self.body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encodings['br'] = brotli.compress(self.body, quality=11)
+        self.last_modified = int(last_modified)
+        self.last_modified_http = formatdate(self.last_modified, usegmt=True)
+
+    def etag(self, encoding=None):
+        # Strong ETag hər kodlama üçün fərqli olmalıdır
+        return self.tag if encoding is None else f'{self.tag}-{encoding}'
+
+    def not_modified(self):
+        '''Klientin nüsxəsi bu gövdədirmi (hər hansı kodlamada)'''
+        if request.if_none_match:
+            return any(request.if_none_match.contains_weak(self.etag(encoding))
+                       for encoding in (None, *self.encodings))
+        since = request.if_modified_since
+        return since is not None and self.last_modified <= since.timestamp()
+
+    def response(self):
+        '''Accept-Encoding-ə uyğun hazır cavab və ya 304'''
+        encoding = request.accept_encodings.best_match(list(self.encodings))
+        if self.not_modified():
+            response = current_app.response_class(status=304)
+        else:
+            payload = self.encodings[encoding] if encoding else self.body
+            response = current_app.response_class(payload, mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.headers['ETag'] = f'"{self.etag(encoding)}"'
+        response.headers['Last-Modified'] = self.last_modified_http
+        # Brauzer keşdən istifadə edir, amma hər dəfə ETag ilə yoxlayır
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class SnapshotBody:
+    '''Snapshot abunəçisi: /api/aqi gövdəsini hər yeni versiyada bir dəfə kodlayır'''
+
+    def __init__(self):
+        self._current = (None, None)  # (version, EncodedBody) - bir atomik oxuma
+        self._lock = threading.Lock()
+        self.encoded = 0
+
+    def update(self, snapshot):
+        self.get(snapshot)
+
+    def get(self, snapshot):
+        '''Snapshot-un kodlanmış gövdəsi; abunə gecikibsə burada bir dəfə kodlanır'''
+        version, body = self._current
+        if version == snapshot.version:
+            return body
+        with self._lock:
+            version, body = self._current
+            if version != snapshot.version:
+                body = EncodedBody(dict(snapshot.data), snapshot.fetched_at)
+                self.encoded += 1
+                # Gecikmiş köhnə snapshot yenisini əvəz etməsin
+                if version is None or snapshot.version > version:
+                    self._current = (snapshot.version, body)
+        return body
+
+    def stats(self):
+        version, body = self._current
+        return {
+            'version': version,
+            'encoded': self.encoded,
+            'bytes': len(body.body) if body else 0,
+            'encodings': {name: len(data) for name, data in body.encodings.items()} if body else {},
+        }
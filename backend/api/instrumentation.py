@@ -0,0 +1,48 @@
+import time
+
+from flask import g, request
+
+from agents.metrics import REGISTRY
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP sorğusunun müddəti (stream cavab bitənə qədər)',
+    ('route', 'method'))
+REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'HTTP sorğuları status koduna görə', ('route', 'method', 'status'))
+IN_FLIGHT = REGISTRY.gauge(
+    'http_requests_in_flight', 'Hazırda işlənən sorğular', ('route',))
+EXCEPTIONS = REGISTRY.counter(
+    'http_exceptions_total', 'Handler-də tutulmamış xətalar', ('route',))
+
+
+def instrument(app):
+    '''Hər route üçün müddət, status və in-flight sayğacları.
+
+    route label-i URL şablonudur (/api/aqi/<district>), ona görə rayon
+    adları kardinallığı artırmır. teardown_request stream_with_context
+    cavablarında stream bitəndə çağırılır - SSE chat-in tam müddəti ölçülür.
+    '''
+    @app.before_request
+    def start_timer():
+        rule = request.url_rule
+        g.metrics_route = rule.rule if rule is not None else 'unmatched'
+        g.metrics_start = time.perf_counter()
+        IN_FLIGHT.inc(route=g.metrics_route)
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def observe(exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        route = g.metrics_route
+        IN_FLIGHT.dec(route=route)
+        status = 500 if exc is not None else g.get('metrics_status', 500)
+        REQUEST_LATENCY.observe(time.perf_counter() - start, route=route, method=request.method)
+        REQUESTS.inc(route=route, method=request.method, status=status)
+        if exc is not None:
+            EXCEPTIONS.inc(route=route)
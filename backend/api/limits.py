@@ -0,0 +1,66 @@
+import os
+import threading
+from functools import wraps
+
+from flask import jsonify
+
+
+class ConcurrencyLimiter:
+    '''Endpoint üçün eyni anda işləyən sorğu limiti (worker başına).
+
+    Yavaş LLM route-ları bütün worker tutumunu tutmasın deyə limit dolanda
+    sorğu qısa gözləyir, sonra 503 + Retry-After alır. Stream cavablarda
+    yer cavab bağlananda boşaldılır.
+    '''
+
+    def __init__(self, name, limit, wait=None):
+        self.name = name
+        self.limit = limit
+        self.wait = wait if wait is not None else float(os.getenv('CONCURRENCY_WAIT', 0.5))
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejected = 0
+
+    def _acquire(self):
+        if not self._semaphore.acquire(timeout=self.wait):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.active += 1
+        return True
+
+    def _release(self):
+        with self._lock:
+            self.active -= 1
+        self._semaphore.release()
+
+    def __call__(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self._acquire():
+                response = jsonify({'error': 'Server məşğuldur, bir az sonra yenidən cəhd edin'})
+                response.status_code = 503
+                response.headers['Retry-After'] = '2'
+                return response
+            try:
+                response = view(*args, **kwargs)
+            except BaseException:
+                self._release()
+                raise
+            if getattr(response, 'is_streamed', False):
+                response.call_on_close(self._release)
+            else:
+                self._release()
+            return response
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            return {'limit': self.limit, 'active': self.active, 'rejected': self.rejected}
+
+
+def limiter(name, default):
+    '''{NAME}_CONCURRENCY mühit dəyişəni ilə konfiqurasiya olunan limiter'''
+    return ConcurrencyLimiter(name, int(os.getenv(f'{name.upper()}_CONCURRENCY', default)))
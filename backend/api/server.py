@@ -1,60 +1,133 @@
-﻿from flask import Flask, jsonify, request, send_from_directory
+﻿from flask import Flask, Request, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
+import io
+import json
 import os
 import sys
-from werkzeug.utils import secure_filename
-from agents.health_advisor import HealthAdvisor
-from agents.image_analyzer import ImageAnalyzer
+import time
 from agents.data_collector import DataCollector
-from agents.health_advisor import HealthAdvisor # Fayl yoluna uyğun import
-
-# Obyekti yarat
-health_advisor = HealthAdvisor()
+from agents.locations import AZERBAIJAN_LOCATIONS
+from agents.snapshot import SnapshotPoller
+from agents.history_store import HistoryStore, METRICS
+from agents.heatmap import MAX_ZOOM, HeatmapRenderer, empty_tile
+from agents.spatial import KDTree, snap
+from agents.llm_cache import LLMResponseCache
+from agents.conversation import ConversationStore
+from agents.alerts import AlertEngine
+from agents.aqi_engine import category, category_range
+from agents.registry import AgentRegistry
+from agents.scheduler import QuotaExceeded, all_stats as upstream_stats, get_scheduler
+from agents.breaker import CircuitOpen, all_stats as breaker_stats, get_breaker
+from agents.gemini import GEMINI_REQUEST_OPTIONS
+from agents.log import DroppingQueueHandler, configure_logging, get_logger
+from agents.metrics import REGISTRY
+from agents.profiler import SamplingProfiler
+from api.batch import batch_query
+from api.broadcast import AQIBroadcaster
+from api.encoded import SnapshotBody
+from api.instrumentation import instrument
+from api.limits import limiter
 
 # Layihənin kök qovluğunu (backend) tap və sys.path-ə əlavə et
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
+class InMemoryRequest(Request):
+    '''Multipart faylları müvəqqəti fayla deyil, yaddaşa oxunur (ölçü MAX_CONTENT_LENGTH ilə məhduddur)'''
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
+# Tətbiqin giriş nöqtəsi: root logger burada (worker başına bir dəfə) qurulur
+configure_logging()
+log = get_logger(__name__)
+
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 CORS(app)
+# Route üzrə müddət/status/in-flight metrikləri (/metrics)
+instrument(app)
+# PROFILER_ENABLED=1 olanda /api/aqi və /api/chat-ın bir hissəsi profil olunur
+profiler = SamplingProfiler()
 
 # Upload parametrləri
-UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+IMAGE_BATCH_MAX = int(os.getenv('IMAGE_BATCH_MAX', 32))
 
 # Instance-ları yarat (BİR DƏFƏ!)
 collector = DataCollector()
-analyzer = ImageAnalyzer()
-advisor = HealthAdvisor()
 
-# ... qalan kod eyni qala ...
+# AQI arxa planda yenilənir, endpointlər yalnız snapshot oxuyur
+poller = SnapshotPoller(collector, AZERBAIJAN_LOCATIONS)
+history = HistoryStore()
+heatmap = HeatmapRenderer(AZERBAIJAN_LOCATIONS)
+poller.subscribe(history.append_snapshot)
+poller.subscribe(heatmap.update)
+# /api/aqi gövdəsi hər data versiyasında bir dəfə JSON + gzip/brotli kodlanır
+aqi_body = SnapshotBody()
+poller.subscribe(aqi_body.update)
+# /api/aqi/stream klientlərinə yalnız dəyişən rayonlar göndərilir
+aqi_broadcaster = AQIBroadcaster()
+poller.subscribe(aqi_broadcaster.update)
+# Server tərəfində xəbərdarlıq abunələri - hər snapshot-da yalnız keçilən hədlər
+alerts = AlertEngine(AZERBAIJAN_LOCATIONS)
+poller.subscribe(alerts.evaluate)
+# Upstream əlçatmaz olsa da server son məlum dəyərlərlə (yaşı göstərilir) açılır
+poller.seed(history.latest(max_age=float(os.getenv('AQI_LKG_MAX_AGE', 86400))))
+
+# Ən yaxın rayon axtarışı üçün indeks və koordinat hüceyrəsinin ölçüsü
+location_index = KDTree({name: (c['lat'], c['lon']) for name, c in AZERBAIJAN_LOCATIONS.items()})
+NEAREST_GEOHASH_PRECISION = int(os.getenv('NEAREST_GEOHASH_PRECISION', 5))
+# Hüceyrə sorğusu bundan uzun çəkərsə ən yaxın rayonun snapshot dəyəri qaytarılır
+NEAREST_DEADLINE = float(os.getenv('NEAREST_DEADLINE', 2.0))
+# /api/aqi/batch: giriş limiti, bir sorğuda upstream-dən alınan hüceyrə limiti və ümumi deadline
+AQI_BATCH_MAX = int(os.getenv('AQI_BATCH_MAX', 500))
+AQI_BATCH_MAX_FETCH = int(os.getenv('AQI_BATCH_MAX_FETCH', 64))
+AQI_BATCH_DEADLINE = float(os.getenv('AQI_BATCH_DEADLINE', 3.0))
+poller.start()
+# Gemini cavabları üçün ortaq keş (/api/compare və profilsiz chat sualları)
+llm_cache = LLMResponseCache()
+# Söhbət tarixçəsi sessiya üzrə (X-Session-Id / session_id)
+conversations = ConversationStore()
+
+# Gemini SDK və PIL tələb edən agentlər ilk istifadədə yaradılır -
+# server (və /api/health) SDK yüklənməsini gözləmədən açılır
+agent_registry = AgentRegistry()
+
+def build_health_advisor():
+    from agents.health_advisor import HealthAdvisor
+    return HealthAdvisor(poller=poller, llm_cache=llm_cache, conversations=conversations,
+                         collector=collector)
+
+def build_image_analyzer():
+    from agents.image_analyzer import ImageAnalyzer
+    return ImageAnalyzer()
+
+def build_compare_model():
+    from agents.gemini import configure_gemini
+    return configure_gemini().GenerativeModel('gemini-3-flash-preview')
+
+agent_registry.register('health_advisor', build_health_advisor)
+agent_registry.register('image_analyzer', build_image_analyzer)
+agent_registry.register('compare_model', build_compare_model)
+# Gemini kvotası chat, müqayisə və foto analizi arasında paylaşılır
+gemini_scheduler = get_scheduler('gemini')
+gemini_breaker = get_breaker('gemini')
+if os.getenv('AGENT_PREWARM') == '1':
+    agent_registry.warm()
+
+# Yavaş LLM route-ları üçün worker başına eyni anda sorğu limiti
+chat_limit = limiter('chat', 16)
+compare_limit = limiter('compare', 8)
+# Şəkil dekodlama/kiçiltmə CPU-nu tutur; tək və batch route-lar bir limiti paylaşır
+image_limit = limiter('image', 4)
+# Açıq SSE bağlantıları (gevent-də boş bağlantı ucuzdur, sync worker-də isə bir worker tutur)
+aqi_stream_limit = limiter('aqi_stream', 1000)
 
-# Azərbaycanın şəhər və rayonları
-AZERBAIJAN_LOCATIONS = {
-    # BAKI RAYONLARI
-    'Bakı - Nəsimi': {'lat': 40.3947, 'lon': 49.8822, 'city': 'Bakı'},
-    'Bakı - Nərimanov': {'lat': 40.4015, 'lon': 49.8539, 'city': 'Bakı'},
-    'Bakı - Səbail': {'lat': 40.3656, 'lon': 49.8354, 'city': 'Bakı'},
-    'Bakı - Yasamal': {'lat': 40.3917, 'lon': 49.8064, 'city': 'Bakı'},
-    'Bakı - Binəqədi': {'lat': 40.4550, 'lon': 49.8203, 'city': 'Bakı'},
-    'Bakı - Xətai': {'lat': 40.3800, 'lon': 49.8100, 'city': 'Bakı'},
-    'Bakı - Suraxanı': {'lat': 40.4200, 'lon': 50.0100, 'city': 'Bakı'},
-    'Bakı - Sabunçu': {'lat': 40.4400, 'lon': 49.9500, 'city': 'Bakı'},
-    'Bakı - Xəzər': {'lat': 40.4700, 'lon': 50.0300, 'city': 'Bakı'},
-    'Bakı - Qaradağ': {'lat': 40.3500, 'lon': 49.7000, 'city': 'Bakı'},
-
-    # DİGƏR ƏSAS ŞƏHƏRLƏR
-    'Gəncə': {'lat': 40.6828, 'lon': 46.3606, 'city': 'Gəncə'},
-    'Sumqayıt': {'lat': 40.5897, 'lon': 49.6686, 'city': 'Sumqayıt'},
-    'Mingəçevir': {'lat': 40.7703, 'lon': 47.0497, 'city': 'Mingəçevir'},
-    'Şirvan': {'lat': 39.9372, 'lon': 48.9208, 'city': 'Şirvan'},
-    'Lənkəran': {'lat': 38.7542, 'lon': 48.8508, 'city': 'Lənkəran'},
-    'Naxçıvan': {'lat': 39.2090, 'lon': 45.4120, 'city': 'Naxçıvan'},
-    'Şəki': {'lat': 41.1919, 'lon': 47.1706, 'city': 'Şəki'},
-}
+# ... qalan kod eyni qala ...
 
 def allowed_file(filename):
     """Yalnız icazə verilən fayl tiplərini yoxlayır"""
@@ -117,7 +190,16 @@ def home():
                 <h3>📊 AQI Endpointləri</h3>
                 <p><code>GET /api/health</code> - Server status</p>
                 <p><code>GET /api/aqi</code> - Bütün rayonların AQI məlumatı</p>
+                <p><code>GET /api/aqi/stream</code> - Canlı AQI yenilənmələri (SSE, yalnız dəyişən rayonlar)</p>
                 <p><code>GET /api/aqi/{rayon_adı}</code> - Xüsusi rayonun AQI məlumatı</p>
+                <p><code>GET /api/aqi/{rayon_adı}/forecast</code> - Saatlıq AQI proqnozu</p>
+                <p><code>GET /api/aqi/nearest?lat=&amp;lon=</code> - Koordinat üçün AQI və ən yaxın rayonlar</p>
+                <p><code>POST /api/aqi/batch</code> - Çoxlu koordinat/rayon üçün AQI (sütunlu cavab)</p>
+                <p><code>GET /api/aqi/tiles/{z}/{x}/{y}.png</code> - AQI istilik xəritəsi tile-ları</p>
+                <p><code>GET /api/aqi/grid/{baku|azerbaijan}</code> - AQI raster (uint16)</p>
+                <p><code>GET /api/aqi/history</code> - AQI tarixçəsi (saatlıq/günlük min/orta/max)</p>
+                <p><code>POST /api/alerts</code> - Hədd keçiləndə xəbərdarlıq abunəsi (webhook və ya lokal)</p>
+                <p><code>GET /api/alerts/events</code> - Lokal sink-dəki son xəbərdarlıqlar</p>
             </div>
             
             <div class="endpoint">
@@ -125,6 +207,7 @@ def home():
                 <p><code>POST /api/chat</code> - AI ilə söhbət</p>
                 <p><code>POST /api/chat/reset</code> - Söhbəti sıfırla</p>
                 <p><code>POST /api/analyze-image</code> - Şəkil analizi</p>
+                <p><code>POST /api/analyze-image/batch</code> - Çox şəkil üçün lokal duman qiymətləndirməsi</p>
             </div>
             
             <div class="endpoint">
@@ -149,29 +232,374 @@ def home():
 def health_check():
     return jsonify({'status': 'OK', 'message': 'Backend işləyir!'})
 
+def current_snapshot():
+    '''Son snapshot; server yeni açılıbsa ilk yenilənməni qısa gözlə'''
+    snapshot = poller.current()
+    if not snapshot.version:
+        snapshot = poller.wait_ready(timeout=collector.fetch_deadline)
+    return snapshot
+
+def with_snapshot_headers(response, snapshot, district=None):
+    '''Datanın nə qədər təzə olduğunu header-lərdə göstər.
+
+    district verilərsə yaş həmin rayonun son uğurlu alınmasına görədir;
+    X-Data-Stale köhnə (upstream alınmayan) dəyərləri bildirir.
+    '''
+    if snapshot.version:
+        if district is None:
+            response.headers['X-Data-Age'] = str(int(snapshot.age))
+            response.headers['X-Data-Fetched-At'] = str(int(snapshot.fetched_at))
+            stale = len(snapshot.stale_districts())
+        else:
+            response.headers['X-Data-Age'] = str(int(snapshot.district_age(district)))
+            response.headers['X-Data-Fetched-At'] = str(int(
+                snapshot.district_fetched_at.get(district, snapshot.fetched_at)))
+            stale = int(snapshot.status.get(district) == 'stale')
+        response.headers['X-Data-Version'] = str(snapshot.version)
+        if stale:
+            response.headers['X-Data-Stale'] = str(stale)
+    return response
+
 @app.route('/api/aqi', methods=['GET'])
+@profiler.profile('aqi')
 def get_all_aqi():
-    results = {}
-    for district, coords in AZERBAIJAN_LOCATIONS.items():
-        aqi_data = collector.get_aqi_for_location(coords['lat'], coords['lon'])
-        if aqi_data:
-            results[district] = aqi_data
-    return jsonify(results)
+    # Şəbəkə sorğusu yoxdur - son snapshot qaytarılır
+    snapshot = current_snapshot()
+    if request.args.get('details'):
+        response = jsonify({
+            'results': dict(snapshot.data),
+            'status': dict(snapshot.status),
+            'fetched_at': snapshot.fetched_at,
+            'age': round(snapshot.age, 1),
+            # Köhnə saxlanılan rayonlar üçün yaş snapshot-dan böyükdür
+            'ages': {name: round(snapshot.district_age(name), 1) for name in snapshot.data},
+        })
+    else:
+        # Hazır baytlar; If-None-Match uyğundursa 304
+        response = aqi_body.get(snapshot).response()
+    return with_snapshot_headers(response, snapshot)
+
+@app.route('/api/aqi/stream', methods=['GET'])
+@aqi_stream_limit
+def stream_aqi():
+    '''Canlı AQI (SSE): əvvəl snapshot, sonra yalnız dəyişən rayonlar (delta), hər 15s ping'''
+    # stream_with_context istifadə olunmur - açıq bağlantı request kontekstini saxlamasın
+    return app.response_class(
+        aqi_broadcaster.events(request.headers.get('Last-Event-ID')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/api/aqi/history', methods=['GET'])
+def get_aqi_history():
+    '''AQI tarixçəsi: ?district=&start=&end=&resolution=raw|hour|day|auto&metrics=aqi,pm2_5'''
+    districts = [d for value in request.args.getlist('district') for d in value.split(',') if d]
+    unknown = [d for d in districts if d not in AZERBAIJAN_LOCATIONS]
+    if unknown:
+        return jsonify({'error': 'Rayon tapılmadı', 'districts': unknown}), 404
+
+    metrics = request.args.get('metrics')
+    metrics = metrics.split(',') if metrics else METRICS
+    resolution = request.args.get('resolution', 'auto')
+    try:
+        end = int(request.args.get('end') or time.time())
+        start = int(request.args.get('start') or end - 86400)
+        if resolution == 'auto':
+            resolution = history.auto_resolution(start, end)
+        series = history.query(districts or None, start, end, resolution, metrics)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'start': start,
+        'end': end,
+        'resolution': resolution,
+        'series': series,
+    })
+
+@app.route('/api/aqi/nearest', methods=['GET'])
+def get_nearest_aqi():
+    '''İstənilən koordinat üçün AQI: ?lat=&lon=&k=3
+
+    Koordinat geohash hüceyrəsinin mərkəzinə çəkilir, ona görə eyni
+    hüceyrədəki istifadəçilər bir keşlənmiş sorğunu paylaşır.
+    '''
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        k = min(max(int(request.args.get('k', 3)), 1), len(AZERBAIJAN_LOCATIONS))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat və lon rəqəm olmalıdır'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'Koordinat aralıqdan kənardır'}), 400
+
+    snapshot = current_snapshot()
+    nearest = [
+        {'district': name, 'distance_km': distance, 'aqi': (snapshot.get(name) or {}).get('aqi')}
+        for name, distance in location_index.query(lat, lon, k)
+    ]
+
+    cell, cell_lat, cell_lon = snap(lat, lon, NEAREST_GEOHASH_PRECISION)
+    cell_coords = {'lat': round(cell_lat, 4), 'lon': round(cell_lon, 4)}
+    # Upstream yavaşdırsa cavab NEAREST_DEADLINE-dan çox gözləmir
+    results, _ = collector.get_aqi_for_locations({cell: cell_coords}, deadline=NEAREST_DEADLINE)
+    aqi_data = results.get(cell)
+    source = 'cell'
+    age = collector.cache_age(cell_coords['lat'], cell_coords['lon']) if aqi_data else None
+    if not aqi_data:
+        # Upstream alınmadısa ən yaxın rayonun snapshot dəyəri
+        aqi_data = snapshot.get(nearest[0]['district'])
+        source = 'nearest'
+        age = snapshot.district_age(nearest[0]['district']) if aqi_data else None
+
+    return jsonify({
+        'cell': cell,
+        'cell_center': {'lat': cell_lat, 'lon': cell_lon},
+        'source': source,
+        'aqi': aqi_data,
+        'age': round(age, 1) if age is not None else None,
+        'nearest': nearest,
+    })
+
+@app.route('/api/aqi/batch', methods=['POST'])
+def get_aqi_batch():
+    '''Çoxlu nöqtə üçün AQI: {"points": [[lat, lon], ...], "districts": [...], "precision": 5}'''
+    data = request.get_json(silent=True) or {}
+    points = data.get('points') or []
+    districts = data.get('districts') or []
+    if not isinstance(points, list) or not isinstance(districts, list):
+        return jsonify({'error': 'points və districts siyahı olmalıdır'}), 400
+    if not points and not districts:
+        return jsonify({'error': 'points və ya districts lazımdır'}), 400
+    if len(points) + len(districts) > AQI_BATCH_MAX:
+        return jsonify({'error': f'Ən çox {AQI_BATCH_MAX} nöqtə'}), 413
+    try:
+        precision = min(max(int(data.get('precision', NEAREST_GEOHASH_PRECISION)), 3), 7)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'precision tam ədəd olmalıdır'}), 400
+
+    result = batch_query(collector, current_snapshot(), AZERBAIJAN_LOCATIONS, location_index,
+                         points, districts, precision, AQI_BATCH_DEADLINE, AQI_BATCH_MAX_FETCH)
+    log.debug('AQI batch', count=result['count'], rows=result['rows'], attempted=result['attempted'],
+              fetched=result['fetched'])
+    return jsonify(result)
+
+@app.route('/api/aqi/tiles/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def get_aqi_tile(z, x, y):
+    '''İnterpolyasiya olunmuş AQI xəritə tile-ı (XYZ, 256px PNG)'''
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        return jsonify({'error': 'Yanlış tile'}), 400
+    if not heatmap.covers(z, x, y):
+        # Regionlardan kənar tile render olunmur və keşə düşmür - hamısı eyni şəffaf PNG
+        if request.if_none_match.contains_weak('empty'):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(empty_tile(), mimetype='image/png')
+        response.headers['ETag'] = '"empty"'
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+        return response
+    # ETag datanın hash-indəndir - bütün worker-lərdə eyni data üçün eynidir
+    tag = heatmap.tag
+    if tag is not None and request.if_none_match.contains_weak(f'{tag}-{z}-{x}-{y}'):
+        response = app.response_class(status=304)
+    else:
+        body, tag = heatmap.tile(z, x, y)
+        if body is None:
+            return jsonify({'error': 'AQI data hələ hazır deyil'}), 503
+        response = app.response_class(body, mimetype='image/png')
+    response.headers['ETag'] = f'"{tag}-{z}-{x}-{y}"'
+    response.headers['Cache-Control'] = f'public, max-age={int(poller.interval)}'
+    return response
+
+@app.route('/api/aqi/grid/<region>', methods=['GET'])
+def get_aqi_grid(region):
+    '''Region üçün hazır AQI raster-i (uint16 little-endian, sətirlər şimaldan cənuba)'''
+    grid = heatmap.grid(region)
+    if grid is None:
+        return jsonify({'error': 'Grid tapılmadı'}), 404
+    response = app.response_class(grid['body'], mimetype='application/octet-stream')
+    response.headers['X-Grid-Bbox'] = ','.join(str(v) for v in grid['bbox'])
+    response.headers['X-Grid-Shape'] = ','.join(str(v) for v in grid['shape'])
+    response.headers['X-Data-Version'] = str(heatmap.version)
+    return response
+
+@app.route('/api/aqi/<district>/forecast', methods=['GET'])
+def get_district_forecast(district):
+    '''Saatlıq AQI proqnozu (OpenWeather air_pollution/forecast)'''
+    if district not in AZERBAIJAN_LOCATIONS:
+        return jsonify({'error': 'Rayon tapılmadı'}), 404
+    coords = AZERBAIJAN_LOCATIONS[district]
+    forecast = collector.peek_forecast(coords['lat'], coords['lon'])
+    if forecast is None:
+        # Yalnız istənən rayon interaktiv növbədə gözlənilir; qalanları
+        # arxa planda aşağı prioritetli 'batch' növbəsində keşə yığılır
+        forecast = collector.get_forecast(coords['lat'], coords['lon'])
+        collector.prefetch_forecasts(
+            {name: c for name, c in AZERBAIJAN_LOCATIONS.items() if name != district})
+    if forecast is None:
+        return jsonify({'error': 'Proqnoz alınmadı'}), 500
+    return app.response_class(forecast.to_json(), mimetype='application/json')
 
 @app.route('/api/aqi/<district>', methods=['GET'])
 def get_district_aqi(district):
     if district not in AZERBAIJAN_LOCATIONS:
         return jsonify({'error': 'Rayon tapılmadı'}), 404
-    coords = AZERBAIJAN_LOCATIONS[district]
-    aqi_data = collector.get_aqi_for_location(coords['lat'], coords['lon'])
+    snapshot = current_snapshot()
+    aqi_data = snapshot.get(district)
     if aqi_data:
-        return jsonify(aqi_data)
+        return with_snapshot_headers(jsonify(aqi_data), snapshot, district)
     else:
         return jsonify({'error': 'AQI data alınmadı'}), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    '''Keşlərin hit/miss/stale və birləşdirilmiş sorğu sayğacları'''
+    return jsonify({
+        'aqi': collector.cache.stats(),
+        'forecast': collector.forecast_cache.stats(),
+        'singleflight': collector.inflight.stats(),
+        'llm': llm_cache.stats(),
+        'conversations': conversations.stats(),
+        'image': (agent_registry.get('image_analyzer').stats()
+                  if agent_registry.is_built('image_analyzer') else None),
+        'agents': agent_registry.stats(),
+    })
+
+@app.route('/api/alerts', methods=['POST'])
+def create_alert():
+    '''Abunə: {"district", "metric": "aqi", "threshold", "condition", "webhook"}'''
+    data = request.get_json(silent=True) or {}
+    try:
+        subscription = alerts.subscribe(
+            data.get('district'), data.get('metric', 'aqi'), data.get('threshold'),
+            data.get('condition', ''), data.get('webhook'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(alert_response(subscription)), 201
+
+@app.route('/api/alerts/events', methods=['GET'])
+def get_alert_events():
+    '''Lokal sink: ?since=<seq>&subscription=<id>'''
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': 'since tam ədəd olmalıdır'}), 400
+    events = alerts.recent_events(since, request.args.get('subscription'))
+    return jsonify({'events': events, 'last': events[-1]['seq'] if events else since})
+
+@app.route('/api/alerts/<sub_id>', methods=['GET'])
+def get_alert(sub_id):
+    subscription = alerts.get(sub_id)
+    if subscription is None:
+        return jsonify({'error': 'Abunə tapılmadı'}), 404
+    return jsonify(alert_response(subscription))
+
+@app.route('/api/alerts/<sub_id>', methods=['DELETE'])
+def delete_alert(sub_id):
+    if not alerts.unsubscribe(sub_id):
+        return jsonify({'error': 'Abunə tapılmadı'}), 404
+    return jsonify({'deleted': sub_id})
+
+def alert_response(subscription):
+    '''Abunə + indiki dəyər; active - hədd hazırda keçilibmi'''
+    value = alerts.current_value(subscription)
+    return dict(subscription.to_dict(), value=value,
+                active=value is not None and value >= subscription.threshold)
+
+@app.route('/api/upstreams', methods=['GET'])
+def upstreams():
+    '''Upstream-lər: kvota (token, növbə, imtina) və breaker vəziyyəti'''
+    stats = upstream_stats()
+    for name, breaker in breaker_stats().items():
+        stats.setdefault(name, {})['breaker'] = breaker
+    return jsonify(stats)
+
+# Onsuz da sayğacı olan komponentlər - dəyərlər scrape zamanı oxunur
+def cache_stats_by_name():
+    caches = {
+        'aqi': collector.cache.stats(),
+        'forecast': collector.forecast_cache.stats(),
+        'llm': llm_cache.stats(),
+    }
+    if agent_registry.is_built('image_analyzer'):
+        caches['image'] = agent_registry.get('image_analyzer').stats()
+    return caches
+
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+REGISTRY.register_callback(
+    'cache_requests_total', 'Keş oxumaları nəticəyə görə (hit/miss/stale)', ('cache', 'result'), 'counter',
+    lambda: {(name, result): stats[result]
+             for name, stats in cache_stats_by_name().items()
+             for result in ('hits', 'misses', 'stale') if result in stats})
+REGISTRY.register_callback(
+    'cache_hit_ratio', 'Keş hit nisbəti (stale daxil)', ('cache',), 'gauge',
+    lambda: {(name,): stats['hit_ratio'] for name, stats in cache_stats_by_name().items()})
+REGISTRY.register_callback(
+    'cache_entries', 'Keşdəki element sayı', ('cache',), 'gauge',
+    lambda: {(name,): stats['size'] for name, stats in cache_stats_by_name().items() if 'size' in stats})
+REGISTRY.register_callback(
+    'upstream_coalesced_total', 'SingleFlight ilə birləşdirilmiş upstream sorğuları', (), 'counter',
+    lambda: {(): collector.inflight.stats()['coalesced']})
+REGISTRY.register_callback(
+    'upstream_circuit_state', 'Breaker vəziyyəti (0 closed, 1 half_open, 2 open)', ('upstream',), 'gauge',
+    lambda: {(name,): CIRCUIT_STATES[stats['state']] for name, stats in breaker_stats().items()})
+REGISTRY.register_callback(
+    'upstream_quota_tokens', 'Upstream kvotasında qalan token', ('upstream',), 'gauge',
+    lambda: {(name,): stats['tokens'] for name, stats in upstream_stats().items()})
+REGISTRY.register_callback(
+    'upstream_queue_depth', 'Kvota növbəsində gözləyən çağırışlar', ('upstream', 'lane'), 'gauge',
+    lambda: {(name, lane): depth for name, stats in upstream_stats().items()
+             for lane, depth in stats['queue_depth'].items()})
+REGISTRY.register_callback(
+    'upstream_shed_total', 'Kvota dolu olduğundan imtina edilən çağırışlar', ('upstream', 'lane'), 'counter',
+    lambda: {(name, lane): count for name, stats in upstream_stats().items()
+             for lane, count in stats['shed'].items()})
+REGISTRY.register_callback(
+    'aqi_snapshot_age_seconds', 'Son AQI snapshot-unun yaşı', (), 'gauge',
+    lambda: {(): round(poller.current().age, 1)} if poller.current().version else {})
+REGISTRY.register_callback(
+    'aqi_snapshot_stale_districts', 'Son yenilənmədə alınmayan (köhnə dəyəri saxlanılan) rayonlar', (), 'gauge',
+    lambda: {(): len(poller.current().stale_districts())})
+REGISTRY.register_callback(
+    'aqi_body_encodings_total', '/api/aqi gövdəsinin kodlanma sayı (data versiyası başına bir)', (), 'counter',
+    lambda: {(): aqi_body.encoded})
+REGISTRY.register_callback(
+    'aqi_stream_clients', 'Açıq /api/aqi/stream bağlantıları', (), 'gauge',
+    lambda: {(): aqi_broadcaster.clients})
+REGISTRY.register_callback(
+    'aqi_stream_events_total', 'Yayılan AQI delta hadisələri', (), 'counter',
+    lambda: {(): aqi_broadcaster.published})
+REGISTRY.register_callback(
+    'alert_subscriptions', 'Aktiv xəbərdarlıq abunələri', (), 'gauge',
+    lambda: {(): alerts.stats()['subscriptions']})
+REGISTRY.register_callback(
+    'conversation_sessions', 'Aktiv söhbət sessiyaları', (), 'gauge',
+    lambda: {(): conversations.stats()['sessions']})
+REGISTRY.register_callback(
+    'log_records_dropped_total', 'Log növbəsi dolu olduğundan atılan qeydlər', (), 'counter',
+    lambda: {(): DroppingQueueHandler.dropped})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    '''Prometheus text formatı (bu worker-in sayğacları)'''
+    return app.response_class(REGISTRY.expose(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/debug/profile', methods=['GET'])
+def debug_profile():
+    '''Profiler nümunələri collapsed-stack formatında: ?reset=1 sonra sıfırlanır'''
+    if not profiler.enabled:
+        return jsonify({'error': 'Profiler söndürülüb (PROFILER_ENABLED=1)'}), 404
+    if request.args.get('format') == 'json':
+        return jsonify(profiler.stats())
+    return app.response_class(profiler.collapsed(reset=bool(request.args.get('reset'))),
+                              mimetype='text/plain; charset=utf-8')
+
 # ===========================================
 # 3. CHAT ENDPOINTS
 @app.route('/api/chat', methods=['POST'])
+@chat_limit
+@profiler.profile('chat')
 def chat():
     '''AI ile sohbet'''
     data = request.get_json()
@@ -183,30 +611,136 @@ def chat():
     user_profile = data.get('profile', {})
     language = data.get('language', 'az')
 
-    print(f"DEBUG: Frontend-den gelen dil: {language}")
+    log.debug('Chat sorgusu', language=language, stream=bool(data.get('stream')))
 
-    result = health_advisor.get_health_advice(
-        user_message,
-        user_profile,
-        language
-    )
+    # Sessiya yoxdursa yenisi yaradılır və cavabda qaytarılır
+    session_id = request_session_id(data) or conversations.new_session_id()
 
-    return jsonify(result)
+    if data.get('stream') or request.accept_mimetypes.best == 'text/event-stream':
+        response = stream_chat(user_message, user_profile, language, session_id)
+    else:
+        result = agent_registry.get('health_advisor').get_health_advice(
+            user_message,
+            user_profile,
+            language,
+            session_id
+        )
+        result['session_id'] = session_id
+        response = jsonify(result)
+
+    response.headers['X-Session-Id'] = session_id
+    return response
 
     
 
    
 
+def request_session_id(data=None):
+    '''Sessiya açarı: X-Session-Id header-i və ya JSON-dakı session_id'''
+    session_id = request.headers.get('X-Session-Id')
+    if not session_id and isinstance(data, dict):
+        session_id = data.get('session_id')
+    # Mətn olmayan dəyər (rəqəm, siyahı...) göndərilməmiş sayılır
+    if isinstance(session_id, str) and session_id and len(session_id) <= 64:
+        return session_id
+    return None
+
+def sse_event(event, data):
+    '''Server-Sent Events formatında bir hadisə'''
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+def stream_chat(user_message, user_profile, language, session_id=None):
+    '''Cavabı SSE ilə hissə-hissə göndər: meta, chunk..., done'''
+    def generate():
+        for event, payload in agent_registry.get('health_advisor').stream_health_advice(
+                user_message, user_profile, language, session_id):
+            if event == 'chunk':
+                payload = {'text': payload}
+            elif event == 'meta':
+                payload = dict(payload, session_id=session_id)
+            yield sse_event(event, payload)
+
+    return app.response_class(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 @app.route('/api/chat/reset', methods=['POST'])
 def reset_chat():
     '''Sohbeti sifirla'''
-    advisor.reset_conversation()
+    # Tarixçə advisor-dan asılı deyil - SDK yüklənməsin deyə birbaşa store-dan silinir
+    conversations.reset(request_session_id(request.get_json(silent=True)))
     return jsonify({'status': 'ok', 'message': 'Sohbet silinib'})
 
 
+@app.route('/api/analyze-image', methods=['POST'])
+@image_limit
+def analyze_image():
+    """Foto analiz endpoint: JSON {"image": base64} və ya multipart "image" faylı"""
+    upload = request.files.get('image')
+    data = request.get_json(silent=True) or {}
+    if upload is not None:
+        if not allowed_file(upload.filename or ''):
+            return jsonify({'error': 'Fayl tipi dəstəklənmir'}), 400
+        image_data = upload.read()
+    else:
+        if 'image' not in data:
+            return jsonify({'error': 'Image data lazimdir'}), 400
+        image_data = data['image']
+    # ?refine=0 - Gemini-siz, yalnız lokal duman qiymətləndirməsi
+    refine = request.args.get('refine', data.get('refine'))
+    if refine is not None:
+        refine = str(refine).lower() not in ('0', 'false', 'no')
+
+    # Şəkil yaddaşda kiçildilir; eyni foto keşdən qaytarılır
+    analyzer = agent_registry.get('image_analyzer')
+    from agents.image_analyzer import ImageDecodeError
+    try:
+        result, cached = analyzer.analyze_image_data(image_data, refine)
+    except ImageDecodeError as e:
+        return jsonify({'error': 'Foto analiz edilə bilmədi', 'details': str(e)}), 400
+
+    response = jsonify(result)
+    response.headers['X-Cache'] = 'HIT' if cached else 'MISS'
+    return response
+
+
+@app.route('/api/analyze-image/batch', methods=['POST'])
+@image_limit
+def analyze_image_batch():
+    '''Çox foto üçün lokal duman qiymətləndirməsi: {"images": [base64, ...]}'''
+    data = request.get_json(silent=True) or {}
+    images = data.get('images')
+    if not isinstance(images, list) or not images:
+        return jsonify({'error': 'images siyahısı lazimdir'}), 400
+    if len(images) > IMAGE_BATCH_MAX:
+        return jsonify({'error': f'Ən çox {IMAGE_BATCH_MAX} şəkil göndərilə bilər'}), 400
+    return jsonify({'results': agent_registry.get('image_analyzer').analyze_batch(images)})
+
+
+def compare_fallback(loc1, loc2, lang):
+    '''Gemini-siz qısa müqayisə - yalnız göndərilən AQI dəyərlərindən'''
+    aqi1, aqi2 = float(loc1['aqi']), float(loc2['aqi'])
+    cleaner, dirtier = (loc1, loc2) if aqi1 <= aqi2 else (loc2, loc1)
+    diff = int(abs(aqi1 - aqi2))
+    if lang == 'az':
+        if diff == 0:
+            return f"⚖️ {loc1['name']} və {loc2['name']} rayonlarında AQI eynidir ({int(aqi1)})."
+        return (f"✅ {cleaner['name']} daha təmizdir (AQI {int(float(cleaner['aqi']))}), "
+                f"{dirtier['name']} rayonunda AQI {diff} vahid yüksəkdir "
+                f"({int(float(dirtier['aqi']))}).")
+    if diff == 0:
+        return f"⚖️ {loc1['name']} and {loc2['name']} have the same AQI ({int(aqi1)})."
+    return (f"✅ {cleaner['name']} is cleaner (AQI {int(float(cleaner['aqi']))}); "
+            f"{dirtier['name']} is {diff} points higher ({int(float(dirtier['aqi']))}).")
+
+
 @app.route('/api/compare', methods=['POST'])
+@compare_limit
 def compare_districts():
     """Rayon müqayisəsi - Gemini 3"""
+    cache_key = None
     try:
         data = request.get_json()
         
@@ -217,14 +751,18 @@ def compare_districts():
         if not loc1 or not loc2:
             return jsonify({'error': 'Rayonlar lazimdir'}), 400
         
-        print(f'Müqayisə: {loc1["name"]} vs {loc2["name"]}')
-        
+        log.debug('Muqayise', location1=loc1['name'], location2=loc2['name'])
+
+        # AQI kateqoriya aralığına yuvarlaqlaşdırılır ki, cavab keşlənə bilsin
+        range1 = '{}-{}'.format(*category_range(float(loc1['aqi'])))
+        range2 = '{}-{}'.format(*category_range(float(loc2['aqi'])))
+
         # Prompt
         if lang == 'az':
             prompt = f'''İki rayonun hava keyfiyyətini müqayisə et və Azərbaycan dilində cavab ver:
 
-📍 {loc1['name']}: AQI {loc1['aqi']}
-📍 {loc2['name']}: AQI {loc2['aqi']}
+📍 {loc1['name']}: AQI {range1}
+📍 {loc2['name']}: AQI {range2}
 
 TAPŞIRIQ:
 1. Hansı rayon daha təmizdir açıqla
@@ -237,57 +775,63 @@ Cavab:'''
         else:
             prompt = f'''Compare air quality and respond in English:
 
-📍 {loc1['name']}: AQI {loc1['aqi']}
-📍 {loc2['name']}: AQI {loc2['aqi']}
+📍 {loc1['name']}: AQI {range1}
+📍 {loc2['name']}: AQI {range2}
 
 Give brief comparison (5-8 sentences) with emojis.
 
 Response:'''
         
-        # Gemini 3 çağır
-        import google.generativeai as genai
-        model = genai.GenerativeModel('gemini-3-flash-preview')
-        response = model.generate_content(prompt)
-        ai_analysis = response.text
-        
-        print('✅ Gemini 3 müqayisə cavabı hazır')
-        
-        return jsonify({
-            'ai_analysis': ai_analysis,
-            'location1': loc1,
-            'location2': loc2
-        })
-        
-    except Exception as e:
-        print(f'❌ Compare xetasi: {e}')
-        import traceback
-        traceback.print_exc()
-        
-        fallback = '⚠️ Hər iki rayonda AQI eyni səviyyədədir (75 - Orta). Ümumi ehtiyat tədbirləri tətbiq edin.' if lang == 'az' else '⚠️ Both districts have similar AQI (75 - Moderate). Apply general precautions.'
-        
-        return jsonify({
-            'ai_analysis': fallback
-        }), 200
+        # Gemini 3 çağır - eyni rayon cütü və kateqoriyalar üçün keşdən
+        cache_key = llm_cache.signature(
+            'compare',
+            language=lang,
+            locations=[
+                (llm_cache.normalize_text(loc1['name']), category(float(loc1['aqi']))),
+                (llm_cache.normalize_text(loc2['name']), category(float(loc2['aqi']))),
+            ],
+        )
+        ai_analysis, cached = llm_cache.get_or_generate(
+            cache_key, lambda: gemini_breaker.call(lambda: gemini_scheduler.call(
+                'compare', lambda: agent_registry.get('compare_model').generate_content(
+                    prompt, request_options=GEMINI_REQUEST_OPTIONS))).text)
+
+        log.debug('Muqayise cavabi hazir', cached=cached)
 
-            
-        
-   
-        
-      # ✅ DÜZƏLİŞ: health_advisor → advisor
-        response = advisor.model.generate_content(prompt)  # BURASI 278-ci SƏTR
-        ai_analysis = response.text
-        
         return jsonify({
             'ai_analysis': ai_analysis,
             'location1': loc1,
-            'location2': loc2
+            'location2': loc2,
+            'cached': cached
         })
-        
-    except Exception as e:
-        print(f'Compare xetasi: {e}')
-        return jsonify({
-            'ai_analysis': '⚠️ Texniki problem. Zəhmət olmasa yenidən cəhd edin.'
-        }), 500
+
+    except (QuotaExceeded, CircuitOpen) as e:
+        # Kvota chat üçün saxlanılır və ya Gemini düşüb - sorğu göndərilmir
+        log.info('Compare sorgusu gonderilmedi', reason=str(e))
+        response = compare_degraded(cache_key, loc1, loc2, lang)
+        wait = e.wait if isinstance(e, QuotaExceeded) else e.retry_after
+        response.headers['Retry-After'] = str(max(1, int(wait)))
+        return response
+
+    except Exception:
+        log.exception('Compare xetasi')
+        if cache_key is None:
+            # Açar qurulmayıbsa göndərilən rayon datası yanlışdır
+            return jsonify({'error': 'Rayon datası yanlışdır (name, aqi lazımdır)'}), 400
+        return compare_degraded(cache_key, loc1, loc2, lang)
+
+
+def compare_degraded(cache_key, loc1, loc2, lang):
+    '''Gemini-siz cavab: son keşlənmiş müqayisə (yaşı ilə), yoxdursa real AQI-lərdən compare_fallback'''
+    stale, age = llm_cache.get_stale(cache_key)
+    body = {'location1': loc1, 'location2': loc2}
+    if stale is not None:
+        body.update({'ai_analysis': stale, 'cached': True, 'stale': True, 'age': int(age)})
+    else:
+        body.update({'ai_analysis': compare_fallback(loc1, loc2, lang), 'cached': False,
+                     'fallback': True})
+    return jsonify(body)
+
 # ===========================================
 # 4. STATIC FAYLLAR (ƏGƏR FRONTEND VARSA)
 # ===========================================
@@ -0,0 +1,124 @@
+'''Xəbərdarlıq abunələrinin bir snapshot üçün yoxlanma müddəti.
+
+Bütün rayon və metriklərə paylanmış N abunə yaradılır, sonra dəyərləri
+təsadüfi addımlarla dəyişən snapshot-lar AlertEngine.evaluate()-ə
+verilir. Müqayisə üçün eyni snapshot-lar bütün abunələri tək-tək
+yoxlayan sadə dövrlə də hesablanır və hadisə sayları tutuşdurulur.
+
+İstifadə (backend qovluğundan):
+    python -m benchmarks.bench_alerts --subscriptions 100000 500000
+    python -m benchmarks.bench_alerts --subscriptions 200000 --db /tmp/alerts.db
+'''
+import argparse
+import os
+import random
+import time
+from types import MappingProxyType
+
+from agents.alerts import AlertEngine
+from agents.history_store import METRICS
+from agents.locations import AZERBAIJAN_LOCATIONS
+from agents.snapshot import AQISnapshot
+from benchmarks.harness import percentile
+
+# Metrik üzrə (hədd aralığı, snapshot-lar arası addım)
+RANGES = {
+    'aqi': ((50, 300), 15),
+    'pm2_5': ((10, 150), 8),
+    'pm10': ((20, 300), 15),
+    'co': ((200, 5000), 150),
+    'no2': ((20, 200), 10),
+    'o3': ((20, 200), 10),
+}
+
+
+def make_snapshots(count, rng):
+    readings = {name: {metric: (low + high) / 2 for metric, ((low, high), _) in RANGES.items()}
+                for name in AZERBAIJAN_LOCATIONS}
+    snapshots = []
+    for version in range(1, count + 1):
+        readings = {
+            name: {metric: max(0.0, round(value + rng.uniform(-1, 1) * RANGES[metric][1], 2))
+                   for metric, value in reading.items()}
+            for name, reading in readings.items()
+        }
+        snapshots.append(AQISnapshot(
+            data=MappingProxyType(readings),
+            status=MappingProxyType(dict.fromkeys(readings, 'ok')),
+            fetched_at=time.time(),
+            version=version,
+        ))
+    return snapshots
+
+
+def naive_events(subscriptions, previous, snapshot):
+    '''Hər abunəni tək-tək yoxla (indekssiz)'''
+    count = 0
+    for district, metric, threshold in subscriptions:
+        before = previous.data[district][metric]
+        after = snapshot.data[district][metric]
+        if before < threshold <= after or after < threshold <= before:
+            count += 1
+    return count
+
+
+def run(size, snapshots, db, rng):
+    engine = AlertEngine(AZERBAIJAN_LOCATIONS, path=db or '', max_subscriptions=size,
+                         recent=1)
+    districts = list(AZERBAIJAN_LOCATIONS)
+    subscriptions = []
+    start = time.perf_counter()
+    for _ in range(size):
+        district = rng.choice(districts)
+        metric = rng.choice(METRICS)
+        (low, high), _ = RANGES[metric]
+        threshold = round(rng.uniform(low, high), 1)
+        engine.subscribe(district, metric, threshold)
+        subscriptions.append((district, metric, threshold))
+    created = time.perf_counter() - start
+
+    engine.evaluate(snapshots[0])  # ilk dəyərlər - hadisə yoxdur
+    timings, events = [], 0
+    for snapshot in snapshots[1:]:
+        start = time.perf_counter()
+        events += len(engine.evaluate(snapshot))
+        timings.append(time.perf_counter() - start)
+
+    sample = snapshots[:6]
+    start = time.perf_counter()
+    naive = sum(naive_events(subscriptions, previous, snapshot)
+                for previous, snapshot in zip(sample, sample[1:]))
+    naive_time = (time.perf_counter() - start) / (len(sample) - 1)
+    # Yalnız indeks axtarışı (hadisə obyektləri qurulmadan)
+    start = time.perf_counter()
+    indexed = sum(len(engine.index.crossed((d, m), previous.data[d][m], snapshot.data[d][m])[0])
+                  for previous, snapshot in zip(sample, sample[1:])
+                  for d in AZERBAIJAN_LOCATIONS for m in METRICS)
+    index_time = (time.perf_counter() - start) / (len(sample) - 1)
+
+    print(f'{size:>8} abunə: yaratma {size / created:>9.0f}/s   '
+          f'yoxlama p50 {percentile(timings, 0.5) * 1000:7.3f}ms  '
+          f'p99 {percentile(timings, 0.99) * 1000:7.3f}ms   '
+          f'hadisə/snapshot {events / len(timings):8.1f}   '
+          f'axtarış: indeks {index_time * 1000:6.3f}ms, indekssiz {naive_time * 1000:7.1f}ms'
+          + ('' if naive == indexed else f'   UYĞUNSUZLUQ {naive} != {indexed}'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscriptions', nargs='+', type=int, default=[10_000, 100_000, 500_000])
+    parser.add_argument('--snapshots', type=int, default=50)
+    parser.add_argument('--db', help='SQLite faylı (verilməsə yaddaşda)')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    snapshots = make_snapshots(args.snapshots, rng)
+    print(f'{len(AZERBAIJAN_LOCATIONS)} rayon x {len(METRICS)} metrik, {args.snapshots} snapshot')
+    for size in args.subscriptions:
+        if args.db and os.path.exists(args.db):
+            os.remove(args.db)
+        run(size, snapshots, args.db, rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+'''AQI engine-in sürəti: saniyədə neçə oxunuş hesablanır.
+
+İstifadə (backend qovluğundan):
+    python -m benchmarks.bench_aqi_engine --rows 5000000
+'''
+import argparse
+import time
+
+import numpy as np
+
+from agents import aqi_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n = args.rows
+    readings = {
+        'pm2_5': rng.uniform(0, 300, n),
+        'pm10': rng.uniform(0, 500, n),
+        'co': rng.uniform(100, 20000, n),
+        'no2': rng.uniform(0, 400, n),
+        'o3': rng.uniform(0, 400, n),
+    }
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        aqi, dominant = aqi_engine.compute(**readings)
+        best = min(best, time.perf_counter() - start)
+
+    print(f'{n} oxunuş: {best * 1000:.1f} ms  ->  {n / best / 1e6:.2f} milyon oxunuş/s')
+    print(f'orta AQI {aqi.mean():.1f}, dominant paylanması '
+          f'{dict(zip(aqi_engine.POLLUTANTS, np.bincount(dominant, minlength=5).tolist()))}')
+
+    # Müqayisə üçün: tək-tək (Python dövrü) hesablanma
+    sample = 20_000
+    start = time.perf_counter()
+    for i in range(sample):
+        aqi_engine.compute_from_components({p: readings[p][i] for p in aqi_engine.POLLUTANTS})
+    elapsed = time.perf_counter() - start
+    print(f'tək-tək hesablanma: {sample / elapsed:.0f} oxunuş/s')
+
+
+if __name__ == '__main__':
+    main()
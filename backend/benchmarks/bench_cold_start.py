@@ -0,0 +1,96 @@
+'''Soyuq start profili: api.server importu və ilk /api/health cavabına qədər vaxt.
+
+Ayrı prosesdə `python -X importtime` ilə api.server import olunur, ən
+bahalı modullar çap edilir və ağır SDK-ların (Gemini, PIL) boot zamanı
+yüklənmədiyi yoxlanılır. --budget-ms aşılarsa çıxış kodu 1 olur, ona
+görə CI-da hədəf kimi işlədilə bilər.
+
+İstifadə (backend qovluğundan):
+    python -m benchmarks.bench_cold_start --budget-ms 800
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.stubs import start_openweather_stub
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Bu modullar yalnız onlardan istifadə edən route-larda yüklənməlidir
+DEFERRED_MODULES = ('google.generativeai', 'PIL.Image', 'agents.health_advisor', 'agents.image_analyzer')
+
+PROBE = '''
+import json, os, sys, time
+start = time.perf_counter()
+import api.server
+imported = time.perf_counter()
+response = api.server.app.test_client().get('/api/health')
+ready = time.perf_counter()
+print('COLD_START ' + json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'health_ms': (ready - start) * 1000,
+    'status': response.status_code,
+    'loaded': [m for m in %r if m in sys.modules],
+}), flush=True)
+os._exit(0)
+'''
+
+
+def parse_importtime(stderr, top):
+    '''-X importtime çıxışından ən bahalı (cumulative) modullar'''
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='ilk /api/health cavabı üçün maksimum vaxt')
+    args = parser.parse_args()
+
+    server, url = start_openweather_stub(latency=0.05)
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': BACKEND_DIR,
+        'OPENWEATHER_BASE_URL': url,
+        'OPENWEATHER_API_KEY': 'bench',
+        'AQI_HISTORY_DB': os.path.join(tempfile.mkdtemp(), 'history.db'),
+    })
+    env.pop('AGENT_PREWARM', None)
+    try:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE % (DEFERRED_MODULES,)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120)
+    finally:
+        server.shutdown()
+
+    # Poller-in çap etdikləri də stdout-dadır - nəticə sətri prefikslə tapılır
+    line = next(l for l in result.stdout.splitlines() if l.startswith('COLD_START '))
+    summary = json.loads(line[len('COLD_START '):])
+    print(f'{"cumulative":>12} {"self":>10}  modul')
+    for cumulative_us, self_us, name in parse_importtime(result.stderr, args.top):
+        print(f'{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}')
+
+    print(f'\napi.server importu: {summary["import_ms"]:.0f} ms')
+    print(f'ilk /api/health cavabı: {summary["health_ms"]:.0f} ms (status {summary["status"]})')
+    failed = False
+    if summary['loaded']:
+        print(f'XETA: boot zamanı yüklənməməli modullar yükləndi: {", ".join(summary["loaded"])}')
+        failed = True
+    if args.budget_ms is not None and summary['health_ms'] > args.budget_ms:
+        print(f'XETA: {args.budget_ms:.0f} ms büdcəsi aşıldı')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
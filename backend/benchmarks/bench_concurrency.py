@@ -0,0 +1,111 @@
+'''Worker başına neçə eyni anda chat istifadəçisinin /api/aqi-ni yavaşlatmadan
+xidmət alındığını ölçür - sync və gevent worker-lərinin müqayisəsi.
+
+Lokal OpenWeather və Gemini stub-ları ilə tam offline işləyir.
+
+İstifadə (backend qovluğundan):
+    python -m benchmarks.bench_concurrency --modes sync gevent --users 1 8 32 128
+'''
+import argparse
+import threading
+import time
+
+import requests
+
+from benchmarks.harness import percentile, start_app
+from benchmarks.stubs import start_gemini_stub, start_openweather_stub
+
+
+def run_level(base, users, duration):
+    '''users sayda chat klienti + /api/aqi zondu duration saniyə'''
+    stop = threading.Event()
+    chat = {'ok': 0, 'busy': 0, 'error': 0}
+    probe = []
+    probe_errors = [0]
+    lock = threading.Lock()
+
+    def chat_user(i):
+        session = requests.Session()
+        n = 0
+        while not stop.is_set():
+            n += 1
+            try:
+                # Profil keşi keçir - hər sorğu Gemini-yə gedir
+                r = session.post(f'{base}/api/chat', timeout=60, json={
+                    'message': f'sual {i}-{n}', 'profile': {'condition': 'bench'}})
+                key = 'ok' if r.ok else ('busy' if r.status_code == 503 else 'error')
+            except requests.RequestException:
+                key = 'error'
+            with lock:
+                chat[key] += 1
+
+    def prober():
+        session = requests.Session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                session.get(f'{base}/api/aqi', timeout=30).raise_for_status()
+                probe.append(time.perf_counter() - start)
+            except requests.RequestException:
+                probe_errors[0] += 1
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=chat_user, args=(i,), daemon=True) for i in range(users)]
+    threads.append(threading.Thread(target=prober, daemon=True))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=65)
+
+    return {
+        'users': users,
+        'chat_per_sec': chat['ok'] / duration,
+        'chat_busy': chat['busy'],
+        'chat_errors': chat['error'],
+        'aqi_p50_ms': percentile(probe, 0.5) * 1000,
+        'aqi_p99_ms': percentile(probe, 0.99) * 1000,
+        'aqi_probes': len(probe),
+        'aqi_errors': probe_errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gevent'])
+    parser.add_argument('--users', nargs='+', type=int, default=[1, 8, 32, 128])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--gemini-latency', type=float, default=1.0)
+    parser.add_argument('--aqi-slo-ms', type=float, default=200.0,
+                        help='/api/aqi p99 bu həddən aşağıdırsa səviyyə "keçdi" sayılır')
+    args = parser.parse_args()
+
+    ow_server, ow_url = start_openweather_stub(latency=0.05)
+    gemini_server, gemini_url = start_gemini_stub(latency=args.gemini_latency)
+    try:
+        for mode in args.modes:
+            process, base = start_app(mode, ow_url, gemini_url, {'CHAT_CONCURRENCY': '1000'})
+            supported = 0
+            try:
+                print(f'\n== {mode} worker (1 worker, Gemini gecikməsi {args.gemini_latency}s) ==')
+                print(f"{'istifadəçi':>10} {'chat/s':>8} {'503':>5} {'xəta':>5} "
+                      f"{'aqi p50':>9} {'aqi p99':>9} {'aqi xəta':>9}")
+                for users in args.users:
+                    r = run_level(base, users, args.duration)
+                    print(f"{r['users']:>10} {r['chat_per_sec']:>8.1f} {r['chat_busy']:>5} "
+                          f"{r['chat_errors']:>5} {r['aqi_p50_ms']:>7.1f}ms {r['aqi_p99_ms']:>7.1f}ms "
+                          f"{r['aqi_errors']:>9}")
+                    if r['aqi_p99_ms'] < args.aqi_slo_ms and not r['aqi_errors'] and not r['chat_errors']:
+                        supported = users
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+            print(f'-> {mode}: /api/aqi SLO pozulmadan {supported} eyni anda chat istifadəçisi')
+    finally:
+        ow_server.shutdown()
+        gemini_server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
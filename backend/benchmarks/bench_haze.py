@@ -0,0 +1,72 @@
+'''Lokal duman qiymətləndirməsinin sürəti: saniyədə neçə şəkil.
+
+Sintetik göy üzü fotoları (qradiyent + bina siluetləri + müxtəlif duman
+səviyyəsi) yaradılır; tək-tək və batch rejimləri müqayisə olunur.
+
+İstifadə (backend qovluğundan):
+    python -m benchmarks.bench_haze --images 256 --batch 32
+'''
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from agents import haze
+from agents.image_analyzer import decode_image, prepare_image
+
+
+def synthetic_photo(rng, width=1600, height=1200):
+    '''Mavi səma, tünd siluetlər və təsadüfi duman qatı olan JPEG bytes'''
+    sky_top = rng.uniform([40, 90, 180], [120, 170, 250])
+    sky = np.linspace(sky_top, sky_top * 0.6 + 90, height)[:, None, :]
+    photo = np.broadcast_to(sky, (height, width, 3)).copy()
+    skyline = (height * rng.uniform(0.55, 0.8, width // 40)).astype(int).repeat(40)[:width]
+    rows = np.arange(height)[:, None]
+    photo[rows > skyline[None, :]] = rng.uniform(20, 80, 3)
+    density = rng.uniform(0, 0.8)
+    photo = photo * (1 - density) + rng.uniform(170, 220) * density
+    photo += rng.normal(0, 3, photo.shape)
+    buffer = io.BytesIO()
+    Image.fromarray(photo.clip(0, 255).astype(np.uint8)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue(), density
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=256)
+    parser.add_argument('--batch', type=int, default=32)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    photos = [synthetic_photo(rng) for _ in range(args.images)]
+    print(f'{args.images} foto, orta ölçü {sum(len(p) for p, _ in photos) / len(photos) / 1024:.0f} KB')
+
+    # Tam yol: decode + kiçiltmə + qiymətləndirmə, tək-tək
+    start = time.perf_counter()
+    estimates = [haze.estimate(prepare_image(decode_image(p))[0]) for p, _ in photos]
+    elapsed = time.perf_counter() - start
+    print(f'tək-tək (decode daxil): {args.images / elapsed:.0f} şəkil/s, '
+          f'{elapsed / args.images * 1000:.1f} ms/şəkil')
+
+    # Yalnız qiymətləndirmə - decode olunmuş şəkillər üzərində
+    images = [decode_image(p) for p, _ in photos]
+    start = time.perf_counter()
+    for img in images:
+        haze.estimate(img)
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(0, len(images), args.batch):
+        haze.estimate_batch(images[i:i + args.batch])
+    batched = time.perf_counter() - start
+    print(f'qiymətləndirmə tək-tək: {args.images / single:.0f} şəkil/s')
+    print(f'qiymətləndirmə batch={args.batch}: {args.images / batched:.0f} şəkil/s')
+
+    densities = np.array([d for _, d in photos])
+    index = np.array([e['haze_index'] for e in estimates])
+    print(f'duman sıxlığı ilə haze_index korrelyasiyası: {np.corrcoef(densities, index)[0, 1]:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''Pool-suz (requests.get) və keep-alive session ilə sorğu gecikməsinin müqayisəsi.
+
+İstifadə (backend qovluğundan):
+    python -m benchmarks.bench_http_pool --calls 500 --threads 8
+'''
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from agents.http_client import build_session
+from benchmarks.stubs import start_openweather_stub
+
+
+def _run(get, url, calls, threads):
+    params = {'lat': 40.39, 'lon': 49.88, 'appid': 'bench'}
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        response = get(url, params=params, timeout=10)
+        response.raise_for_status()
+        response.json()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(calls)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'calls_per_sec': calls / elapsed,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    server, url = start_openweather_stub()
+    session = build_session(pool_size=args.threads)
+    try:
+        # İsinmə
+        _run(session.get, url, 20, args.threads)
+        results = {
+            'requests.get (pool yox)': _run(requests.get, url, args.calls, args.threads),
+            'Session (keep-alive)': _run(session.get, url, args.calls, args.threads),
+        }
+    finally:
+        server.shutdown()
+
+    print(f'{args.calls} sorğu, {args.threads} thread')
+    for name, r in results.items():
+        print(f"{name:26} {r['calls_per_sec']:8.0f} sorğu/s  "
+              f"orta {r['mean_ms']:6.2f} ms  p50 {r['p50_ms']:6.2f} ms  p99 {r['p99_ms']:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+'''Offline yük/gecikmə testi: /api/aqi, /api/aqi/<district>, /api/chat, /api/compare.
+
+Lokal OpenWeather və Gemini stub-ları (gecikmə və xəta nisbəti
+verilir) qarşısında gunicorn-la server açılır, hər ssenari hər
+concurrency səviyyəsində duration saniyə qapalı dövrədə (hər klient
+cavabı alıb növbəti sorğunu göndərir) yüklənir. Throughput və
+p50/p95/p99 çap olunur, nəticə JSON-a yazılır və baseline ilə
+müqayisə edilir - reqressiya varsa çıxış kodu 1 olur.
+
+Kvotalar (RATE_PER_MIN) və chat/compare limitləri default olaraq
+qaldırılır ki, serverin özü ölçülsün; --env ilə dəyişdirilə bilər.
+
+İstifadə (backend qovluğundan):
+    python -m benchmarks.bench_load --concurrency 1 8 32 --save-baseline
+    python -m benchmarks.bench_load --concurrency 1 8 32      # baseline ilə müqayisə
+    python -m benchmarks.bench_load --scenarios chat --gemini-error-rate 0.2
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from agents.locations import AZERBAIJAN_LOCATIONS
+from benchmarks.harness import BACKEND_DIR, percentile, start_app
+from benchmarks.stubs import start_gemini_stub, start_openweather_stub
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, 'latest.json')
+
+QUESTIONS = ('Bu gün çölə çıxmaq olar?', 'Uşaqla parka getmək təhlükəsizdir?',
+             'Qaçış üçün hava necədir?', 'Pəncərəni açım?', 'Maska lazımdır?')
+
+DEFAULT_ENV = {
+    'OPENWEATHER_RATE_PER_MIN': '1000000',
+    'OPENWEATHER_BURST': '100000',
+    'GEMINI_RATE_PER_MIN': '1000000',
+    'GEMINI_BURST': '100000',
+    'CHAT_CONCURRENCY': '1000',
+    'COMPARE_CONCURRENCY': '1000',
+    'LOG_LEVEL': 'WARNING',
+}
+
+
+def _district_request(rng):
+    return 'GET', f'/api/aqi/{rng.choice(list(AZERBAIJAN_LOCATIONS))}', None
+
+
+def _chat_request(rng):
+    # Profil keşi keçir - hər sorğu Gemini-yə (stub) gedir
+    return 'POST', '/api/chat', {
+        'message': rng.choice(QUESTIONS),
+        'profile': {'condition': 'bench'},
+        'language': rng.choice(('az', 'en')),
+    }
+
+
+def _compare_request(rng):
+    first, second = rng.sample(list(AZERBAIJAN_LOCATIONS), 2)
+    return 'POST', '/api/compare', {
+        'location1': {'name': first, 'aqi': rng.randint(20, 180)},
+        'location2': {'name': second, 'aqi': rng.randint(20, 180)},
+        'language': 'az',
+    }
+
+
+# ad -> random.Random alıb (method, path, json) qaytaran funksiya
+SCENARIOS = {
+    'aqi': lambda rng: ('GET', '/api/aqi', None),
+    'district': _district_request,
+    'chat': _chat_request,
+    'compare': _compare_request,
+}
+# Cavabında 'fallback' olan ssenarilər (Gemini alınmayanda 200 qayıdır)
+FALLBACK_SCENARIOS = ('chat', 'compare')
+
+
+def run_scenario(base, name, concurrency, duration, warmup=1.0, seed=0):
+    '''concurrency klient duration saniyə; ilk warmup saniyə nəticəyə düşmür'''
+    make_request = SCENARIOS[name]
+    latencies = []
+    statuses = {}
+    fallbacks = [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+    measure_from = time.perf_counter() + warmup
+
+    def client(i):
+        rng = random.Random(seed * 1000 + i)
+        session = requests.Session()
+        while not stop.is_set():
+            method, path, body = make_request(rng)
+            start = time.perf_counter()
+            try:
+                response = session.request(method, base + path, json=body, timeout=60)
+                status = response.status_code
+                fallback = name in FALLBACK_SCENARIOS and response.ok and \
+                    bool(response.json().get('fallback'))
+            except (requests.RequestException, ValueError):
+                status, fallback = 'error', False
+            end = time.perf_counter()
+            if start < measure_from:
+                continue
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(end - start)
+                fallbacks[0] += fallback
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup + duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=65)
+
+    total = sum(statuses.values())
+    ok = statuses.get(200, 0)
+    return {
+        'scenario': name,
+        'concurrency': concurrency,
+        'requests': total,
+        'ok': ok,
+        'error_rate': round((total - ok) / total, 4) if total else 0.0,
+        'fallback_rate': round(fallbacks[0] / ok, 4) if ok else 0.0,
+        'statuses': {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        'throughput_rps': round(ok / duration, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    '''(sətirlər, reqressiyalar): p95/p99 və throughput tolerance-dan çox pisləşibsə reqressiya'''
+    previous = {(r['scenario'], r['concurrency']): r for r in baseline['results']}
+    rows = []
+    regressions = []
+    for result in results:
+        key = (result['scenario'], result['concurrency'])
+        old = previous.get(key)
+        if old is None:
+            continue
+        problems = []
+        for metric in ('p95_ms', 'p99_ms'):
+            if old[metric] and result[metric] > old[metric] * (1 + tolerance):
+                problems.append(metric)
+        if old['throughput_rps'] and result['throughput_rps'] < old['throughput_rps'] * (1 - tolerance):
+            problems.append('throughput_rps')
+        if result['error_rate'] > old['error_rate'] + 0.01:
+            problems.append('error_rate')
+        rows.append((result, old, problems))
+        if problems:
+            regressions.append((key, problems))
+    return rows, regressions
+
+
+def _change(new, old):
+    if not old:
+        return '   n/a'
+    return f'{(new - old) / old * 100:+6.1f}%'
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--worker-class', default='gevent')
+    parser.add_argument('--ow-latency', type=float, default=0.05)
+    parser.add_argument('--ow-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-latency', type=float, default=0.5)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--env', nargs='*', default=[], metavar='KEY=VALUE',
+                        help='server üçün əlavə mühit dəyişənləri')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='nəticəni baseline kimi yaz')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='baseline-dan icazə verilən pisləşmə (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    extra_env = dict(DEFAULT_ENV)
+    extra_env.update(item.split('=', 1) for item in args.env)
+
+    ow_server, ow_url = start_openweather_stub(latency=args.ow_latency, error_rate=args.ow_error_rate)
+    gemini_server, gemini_url = start_gemini_stub(latency=args.gemini_latency,
+                                                  error_rate=args.gemini_error_rate)
+    results = []
+    try:
+        process, base = start_app(args.worker_class, ow_url, gemini_url, extra_env)
+        try:
+            print(f"{'ssenari':<10} {'conc':>5} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} "
+                  f"{'xəta':>7} {'fallback':>9}")
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    r = run_scenario(base, name, concurrency, args.duration, args.warmup)
+                    results.append(r)
+                    print(f"{name:<10} {concurrency:>5} {r['throughput_rps']:>9.1f} "
+                          f"{r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms "
+                          f"{r['error_rate'] * 100:>6.1f}% {r['fallback_rate'] * 100:>8.1f}%")
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    finally:
+        ow_server.shutdown()
+        gemini_server.shutdown()
+
+    report = {
+        'meta': {
+            'created': int(time.time()),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {key: value for key, value in vars(args).items()
+                       if key not in ('output', 'baseline', 'save_baseline')},
+            'server_env': extra_env,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f'\nNəticə yazıldı: {args.output}')
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'Baseline yeniləndi: {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f'Baseline yoxdur ({args.baseline}) - --save-baseline ilə yaradın')
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows, regressions = compare_to_baseline(results, baseline, args.tolerance)
+    print(f"\nBaseline ilə müqayisə ({baseline['meta'].get('commit') or '?'}, "
+          f"tolerance {args.tolerance * 100:.0f}%):")
+    print(f"{'ssenari':<10} {'conc':>5} {'req/s':>8} {'p95':>8} {'p99':>8}")
+    for result, old, problems in rows:
+        print(f"{result['scenario']:<10} {result['concurrency']:>5} "
+              f"{_change(result['throughput_rps'], old['throughput_rps']):>8} "
+              f"{_change(result['p95_ms'], old['p95_ms']):>8} "
+              f"{_change(result['p99_ms'], old['p99_ms']):>8}"
+              + (f"  REQRESSIYA: {', '.join(problems)}" if problems else ''))
+    if regressions:
+        print(f'\nXETA: {len(regressions)} ölçüdə reqressiya')
+        sys.exit(1)
+    print('\nReqressiya yoxdur')
+
+
+if __name__ == '__main__':
+    main()
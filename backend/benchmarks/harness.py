@@ -0,0 +1,57 @@
+'''Benchmark-lar üçün ortaq köməkçilər: gunicorn ilə server başlatma və percentil'''
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(worker_class, openweather_url, gemini_url, extra_env=None):
+    '''gunicorn-u bir worker ilə başlat, (process, base_url) qaytar'''
+    port = _free_port()
+    data_dir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'WEB_CONCURRENCY': '1',
+        'OPENWEATHER_BASE_URL': openweather_url,
+        'OPENWEATHER_API_KEY': 'bench',
+        'GEMINI_API_ENDPOINT': gemini_url,
+        'GEMINI_TRANSPORT': 'rest',
+        'GEMINI_API_KEY': 'bench',
+        'AQI_HISTORY_DB': os.path.join(data_dir, 'history.db'),
+        'ALERTS_DB': os.path.join(data_dir, 'alerts.db'),
+    })
+    env.update(extra_env or {})
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'api.server:app', '--config', 'gunicorn.conf.py'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{base}/api/aqi', timeout=5).ok:
+                return process, base
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{worker_class} server başlamadı')
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
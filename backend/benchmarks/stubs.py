@@ -0,0 +1,156 @@
+'''Benchmark-lar üçün lokal stub serverlər (şəbəkə lazım deyil)'''
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _reading(rng, dt):
+    return {
+        'dt': dt,
+        'main': {'aqi': rng.randint(1, 5)},
+        'components': {
+            'pm2_5': rng.uniform(2, 80),
+            'pm10': rng.uniform(5, 150),
+            'co': rng.uniform(150, 900),
+            'no2': rng.uniform(2, 90),
+            'o3': rng.uniform(10, 160),
+        },
+    }
+
+
+class OpenWeatherStubHandler(BaseHTTPRequestHandler):
+    '''OpenWeather air_pollution (və /forecast) API-nin sadə imitasiyası'''
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and random.random() < server.error_rate:
+            self._send(503, {'cod': 503, 'message': 'stub error'})
+            return
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        seed = f"{query.get('lat', [''])[0]},{query.get('lon', [''])[0]}"
+        rng = random.Random(seed + str(int(time.time() // 3600)))
+        now = int(time.time()) // 3600 * 3600
+        if url.path.endswith('/forecast'):
+            body = {'list': [_reading(rng, now + 3600 * i) for i in range(96)]}
+        else:
+            body = {'list': [_reading(rng, now)]}
+        self._send(200, body)
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.requests_served += 1
+
+    def log_message(self, *args):
+        pass
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    '''Gemini REST API-nin (generateContent / streamGenerateContent) imitasiyası'''
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    reply = ('Bu, test cavabıdır. Hava keyfiyyəti orta səviyyədədir, '
+             'həssas qruplar ehtiyatlı olmalıdır. ✅').split(' ')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        server = self.server
+        if server.error_rate and random.random() < server.error_rate:
+            time.sleep(server.latency / 4)
+            self._send_json(503, {'error': {'code': 503, 'message': 'stub overloaded',
+                                            'status': 'UNAVAILABLE'}})
+            return
+
+        if ':streamGenerateContent' in self.path:
+            self._stream()
+        else:
+            time.sleep(server.latency)
+            self._send_json(200, self._candidate(' '.join(self.reply)))
+
+    def _candidate(self, text):
+        return {
+            'candidates': [{
+                'content': {'parts': [{'text': text}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0,
+            }],
+            'usageMetadata': {'promptTokenCount': 100, 'candidatesTokenCount': len(self.reply)},
+        }
+
+    def _stream(self):
+        # İlk hissə gecikmənin 1/4-də, qalanları bərabər paylanır
+        server = self.server
+        words = self.reply
+        pieces = [' '.join(words[i:i + 4]) + ' ' for i in range(0, len(words), 4)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        time.sleep(server.latency / 4)
+        self.wfile.write(b'[')
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(server.latency * 3 / 4 / max(1, len(pieces) - 1))
+                self.wfile.write(b',')
+            self.wfile.write(json.dumps(self._candidate(piece)).encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b']')
+        self.close_connection = True
+        server.requests_served += 1
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.requests_served += 1
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Klient bağlantını kəsəndə (proses bitdi, timeout) traceback çap etmə
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(handler, latency=0.0, error_rate=0.0, port=0):
+    '''Stub serveri arxa planda başlat, (server, base_url) qaytar'''
+    server = StubServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.requests_served = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    return server, f'http://{host}:{port}'
+
+
+def start_openweather_stub(latency=0.0, error_rate=0.0, port=0):
+    server, base = start_server(OpenWeatherStubHandler, latency, error_rate, port)
+    return server, f'{base}/data/2.5/air_pollution'
+
+
+def start_gemini_stub(latency=0.0, error_rate=0.0, port=0):
+    '''GEMINI_API_ENDPOINT üçün baza URL qaytarır'''
+    return start_server(GeminiStubHandler, latency, error_rate, port)
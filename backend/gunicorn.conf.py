@@ -0,0 +1,18 @@
+'''gunicorn konfiqurasiyası.
+
+Default olaraq gevent worker-ləri işlədilir: OpenWeather və Gemini
+sorğuları kooperativ olur, bir worker yüzlərlə açıq bağlantı saxlaya
+bilir. Köhnə rejim üçün GUNICORN_WORKER_CLASS=sync.
+'''
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+# Upstream kvotaları worker-lər arasında bölünür (agents/scheduler.py)
+os.environ['WEB_CONCURRENCY'] = str(workers)
+# gevent: worker başına eyni anda bağlantı; sync/gthread üçün nəzərə alınmır
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+keepalive = 5
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Testlər backend qovluğundan modul kimi import edir (agents.*, api.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
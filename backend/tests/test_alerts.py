@@ -0,0 +1,30 @@
+import threading
+
+import pytest
+
+from agents.alerts import AlertEngine
+from agents.locations import AZERBAIJAN_LOCATIONS
+
+
+@pytest.mark.parametrize('in_memory', [True, False])
+def test_concurrent_subscribes_respect_limit(tmp_path, in_memory):
+    path = '' if in_memory else str(tmp_path / 'alerts.db')
+    engine = AlertEngine(AZERBAIJAN_LOCATIONS, path=path, max_subscriptions=5)
+    district = next(iter(AZERBAIJAN_LOCATIONS))
+    barrier = threading.Barrier(20)
+    accepted = []
+
+    def subscribe():
+        barrier.wait()
+        try:
+            accepted.append(engine.subscribe(district, 'aqi', 100))
+        except ValueError:
+            pass
+
+    threads = [threading.Thread(target=subscribe) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(accepted) == 5
+    assert engine.stats()['subscriptions'] == 5
@@ -0,0 +1,36 @@
+import time
+from types import MappingProxyType
+
+from agents.locations import AZERBAIJAN_LOCATIONS
+from agents.snapshot import AQISnapshot
+from agents.spatial import KDTree
+from api.batch import batch_query
+
+
+class HalfFailingCollector:
+    '''Keş boşdur; upstream hüceyrələrin yalnız birincisini qaytarır'''
+
+    def peek_aqi(self, lat, lon):
+        return None
+
+    def cache_age(self, lat, lon):
+        return 0.0
+
+    def get_aqi_for_locations(self, coords, deadline=None, lane='interactive'):
+        first = next(iter(coords))
+        return {first: {'aqi': 42}}, {row: 'ok' if row == first else 'error' for row in coords}
+
+
+def test_fetched_counts_only_successful_cells():
+    snapshot = AQISnapshot(
+        data=MappingProxyType({name: {'aqi': 60} for name in AZERBAIJAN_LOCATIONS}),
+        status=MappingProxyType({}), fetched_at=time.time(), version=1)
+    index = KDTree({name: (c['lat'], c['lon']) for name, c in AZERBAIJAN_LOCATIONS.items()})
+
+    result = batch_query(HalfFailingCollector(), snapshot, AZERBAIJAN_LOCATIONS, index,
+                         [[40.40, 49.80], [40.60, 49.60], [41.00, 48.00]], [],
+                         precision=5, deadline=1.0, max_fetch=10)
+    assert result['attempted'] == 3
+    assert result['fetched'] == 1
+    assert result['columns']['source'].count('fetched') == 1
+    assert result['columns']['source'].count('nearest') == 2
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agents.breaker import CircuitBreaker, CircuitOpen
+from agents.scheduler import QuotaExceeded
+
+
+def half_open_breaker():
+    breaker = CircuitBreaker('test', open_seconds=0, hedge_delay=0.5)
+    breaker.state = 'open'
+    return breaker
+
+
+def test_rejected_probe_does_not_take_token():
+    breaker = half_open_breaker()
+    assert breaker.allow()  # sınaq yeri tutulub
+    tokens = []
+    with ThreadPoolExecutor(2) as executor, pytest.raises(CircuitOpen):
+        breaker.call_hedged(lambda: 'ok', executor, acquire=lambda: tokens.append(1))
+    assert tokens == []
+
+
+def test_quota_exceeded_releases_probe():
+    breaker = half_open_breaker()
+
+    def no_quota():
+        raise QuotaExceeded('test', 'interactive', 1.0)
+
+    with ThreadPoolExecutor(2) as executor:
+        with pytest.raises(QuotaExceeded):
+            breaker.call_hedged(lambda: 'ok', executor, acquire=no_quota)
+        # Sınaq yeri boşalıb - növbəti çağırış upstream-ə çatır və breaker bağlanır
+        tokens = []
+        assert breaker.call_hedged(lambda: 'ok', executor, acquire=lambda: tokens.append(1)) == 'ok'
+    assert tokens == [1]
+    assert breaker.state == 'closed'
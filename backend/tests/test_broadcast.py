@@ -0,0 +1,94 @@
+import json
+from types import MappingProxyType
+
+from agents.snapshot import AQISnapshot
+from api.broadcast import AQIBroadcaster
+
+
+def snapshot(version, aqi):
+    return AQISnapshot(data=MappingProxyType({'Bakı': {'aqi': aqi}, 'Gəncə': {'aqi': 50}}),
+                       status=MappingProxyType({'Bakı': 'ok', 'Gəncə': 'ok'}),
+                       fetched_at=1000.0 + version, version=version)
+
+
+def parse(chunk):
+    '''Bayt parçası -> [(event, id, data)]'''
+    frames = []
+    for block in chunk.decode('utf-8').split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+        if 'event' in fields:
+            frames.append((fields['event'], fields['id'], json.loads(fields['data'])))
+    return frames
+
+
+def event_ids(broadcaster):
+    return [event_id for _, event_id, _ in broadcaster._history]
+
+
+def test_resume_from_last_event_id_sends_only_missed_deltas():
+    broadcaster = AQIBroadcaster(heartbeat=0.01, history=8)
+    for version in range(1, 5):
+        broadcaster.update(snapshot(version, 60 + version))
+    ids = event_ids(broadcaster)
+
+    frames = parse(next(broadcaster.events(ids[1])))
+    assert [(event, event_id) for event, event_id, _ in frames] == [('delta', ids[2]), ('delta', ids[3])]
+    assert frames[-1][2]['changed'] == {'Bakı': {'aqi': 64}}
+
+
+def test_resume_with_current_id_sends_nothing_and_unknown_id_gets_snapshot():
+    broadcaster = AQIBroadcaster(heartbeat=0.01, history=8)
+    broadcaster.update(snapshot(1, 61))
+    broadcaster.update(snapshot(2, 62))
+    current = event_ids(broadcaster)[-1]
+
+    assert parse(next(broadcaster.events(current))) == []
+    frames = parse(next(broadcaster.events('999.başqa-worker')))
+    assert [event for event, _, _ in frames] == ['snapshot']
+    assert frames[0][2]['results']['Bakı'] == {'aqi': 62}
+
+
+def test_unchanged_snapshot_publishes_no_delta():
+    broadcaster = AQIBroadcaster(heartbeat=0.01, history=8)
+    broadcaster.update(snapshot(1, 61))
+    broadcaster.update(snapshot(2, 61))
+    assert broadcaster.stats()['published'] == 1
+
+
+def test_slow_subscriber_is_resynced_with_snapshot_instead_of_buffered():
+    broadcaster = AQIBroadcaster(heartbeat=0.01, history=2)
+    broadcaster.update(snapshot(1, 61))
+    stream = broadcaster.events()
+    next(stream)  # ilk tam snapshot
+
+    # Klient oxumur, bu arada buferdən çox delta yığılır
+    for version in range(2, 10):
+        broadcaster.update(snapshot(version, 60 + version))
+    assert len(broadcaster._history) == 2  # yaddaş klientdən asılı deyil
+
+    frames = parse(next(stream))
+    assert [event for event, _, _ in frames] == ['snapshot']
+    assert frames[0][2]['version'] == 9
+    assert frames[0][1] == event_ids(broadcaster)[-1]
+
+
+def test_subscriber_keeping_up_gets_deltas_and_heartbeats():
+    broadcaster = AQIBroadcaster(heartbeat=0.01, history=8)
+    broadcaster.update(snapshot(1, 61))
+    stream = broadcaster.events()
+    next(stream)
+    broadcaster.update(snapshot(2, 62))
+    assert [event for event, _, _ in parse(next(stream))] == ['delta']
+    assert next(stream) == b': ping\n\n'
+
+
+def test_closed_stream_releases_client():
+    broadcaster = AQIBroadcaster(heartbeat=0.01, history=8)
+    broadcaster.update(snapshot(1, 61))
+    streams = [broadcaster.events() for _ in range(3)]
+    for stream in streams:
+        next(stream)
+    assert broadcaster.stats()['clients'] == 3
+    for stream in streams:
+        stream.close()
+    assert broadcaster.stats()['clients'] == 0
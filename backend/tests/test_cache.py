@@ -0,0 +1,55 @@
+import threading
+import time
+
+from agents.cache import TTLCache
+
+
+def test_fresh_value_is_served_without_loading():
+    cache = TTLCache(ttl=60, maxsize=4)
+    assert cache.get_or_load('a', lambda: 1) == 1
+    assert cache.get_or_load('a', lambda: 2) == 1
+    stats = cache.stats()
+    assert (stats['misses'], stats['hits']) == (1, 1)
+
+
+def test_stale_value_served_while_single_refresh_runs():
+    cache = TTLCache(ttl=0.05, maxsize=4)
+    cache.set('a', 'old')
+    time.sleep(0.1)
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(5)
+        return 'new'
+
+    # Yeniləmə bitməyib - hər iki çağırış köhnə dəyəri gözləmədən alır
+    assert cache.get_or_load('a', slow_loader) == 'old'
+    assert cache.get_or_load('a', slow_loader) == 'old'
+    assert cache.stats()['refreshing'] == 1
+    release.set()
+    for _ in range(100):
+        if cache.peek('a') == 'new':
+            break
+        time.sleep(0.01)
+    assert cache.peek('a') == 'new'
+    assert len(calls) == 1
+    assert cache.stats()['refreshing'] == 0
+
+
+def test_failed_load_is_not_cached():
+    cache = TTLCache(ttl=60, maxsize=4)
+    assert cache.get_or_load('a', lambda: None) is None
+    assert cache.get_or_load('a', lambda: 3) == 3
+
+
+def test_least_recently_used_is_evicted_at_maxsize():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get_or_load('a', lambda: None) == 1  # 'a' son istifadə olunan olur
+    cache.set('c', 3)
+    assert cache.peek('b') is None
+    assert cache.peek('a') == 1 and cache.peek('c') == 3
+    assert cache.stats()['evictions'] == 1
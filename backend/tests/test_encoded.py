@@ -0,0 +1,68 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from api import encoded
+from api.encoded import EncodedBody
+
+DATA = {'Bakı - Nəsimi': {'aqi': 57}, 'Sumqayıt': {'aqi': 88}}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    body = EncodedBody(DATA, last_modified=1_700_000_000)
+    app.add_url_rule('/aqi', 'aqi', body.response)
+    return app.test_client()
+
+
+def test_matching_if_none_match_returns_304(client):
+    first = client.get('/aqi', headers={'Accept-Encoding': 'gzip'})
+    assert first.status_code == 200
+    again = client.get('/aqi', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+    # Başqa kodlamanın ETag-i də eyni gövdədir
+    identity = client.get('/aqi', headers={'Accept-Encoding': 'identity'})
+    assert client.get('/aqi', headers={'If-None-Match': identity.headers['ETag']}).status_code == 304
+    assert client.get('/aqi', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_same_data_gives_same_etag_across_instances():
+    assert EncodedBody(DATA, 0).etag() == EncodedBody(dict(reversed(DATA.items())), 0).etag()
+
+
+def test_gzip_is_chosen_when_accepted(client):
+    response = client.get('/aqi', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert json.loads(gzip.decompress(response.data)) == DATA
+
+
+def test_identity_without_accept_encoding(client):
+    response = client.get('/aqi', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(response.data) == DATA
+
+
+class FakeBrotli:
+    @staticmethod
+    def compress(data, quality=11):
+        return b'br:' + data
+
+
+def test_brotli_is_chosen_when_preferred(monkeypatch):
+    # brotli quraşdırılmaya bilər - seçim məntiqi üçün saxta kompressor
+    monkeypatch.setattr(encoded, 'brotli', FakeBrotli)
+    app = Flask(__name__)
+    app.add_url_rule('/aqi', 'aqi', EncodedBody(DATA, 0).response)
+    client = app.test_client()
+
+    response = client.get('/aqi', headers={'Accept-Encoding': 'gzip;q=0.5, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(response.data[3:]) == DATA
+    assert response.headers['ETag'].endswith('-br"')
+    assert client.get('/aqi', headers={'Accept-Encoding': 'br;q=0.5, gzip'}).headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,93 @@
+import re
+from types import MappingProxyType
+
+from agents.breaker import CircuitBreaker
+from agents.conversation import ConversationStore
+from agents.health_advisor import HealthAdvisor
+from agents.llm_cache import LLMResponseCache
+from agents.locations import ADVISOR_DISTRICTS
+from agents.snapshot import AQISnapshot
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class EchoModel:
+    '''Promptdakı AQI sətirlərini cavabda təkrarlayan saxta Gemini modeli'''
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return _Response('\n'.join(re.findall(r'.*AQI.*\d.*', prompt)))
+
+
+class StaticPoller:
+    def __init__(self, readings):
+        self.set(readings)
+
+    def set(self, readings):
+        self.snapshot = AQISnapshot(
+            data=MappingProxyType({district: {'aqi': readings[loc]} for loc, district in ADVISOR_DISTRICTS.items()}),
+            status=MappingProxyType({}), fetched_at=0.0, version=1)
+
+    def current(self):
+        return self.snapshot
+
+
+def make_advisor(poller, tmp_path):
+    advisor = HealthAdvisor.__new__(HealthAdvisor)
+    advisor.model = EchoModel()
+    advisor.poller = poller
+    advisor.collector = None
+    advisor.llm_cache = LLMResponseCache(path=str(tmp_path / 'llm.db'))
+    advisor.conversations = ConversationStore(path='')
+    advisor.breaker = type('Breaker', (), {'call': staticmethod(lambda fn: fn())})()
+    advisor.scheduler = type('Scheduler', (), {'call': staticmethod(lambda lane, fn: fn())})()
+    return advisor
+
+
+def test_cached_chat_answer_does_not_quote_old_exact_aqi(tmp_path):
+    first = dict.fromkeys(ADVISOR_DISTRICTS, 61)
+    second = dict.fromkeys(ADVISOR_DISTRICTS, 93)  # eyni kateqoriya (51-100), fərqli rəqəm
+    poller = StaticPoller(first)
+    advisor = make_advisor(poller, tmp_path)
+
+    fresh = advisor.get_health_advice('Çölə çıxmaq olar?', language='az')
+    assert not fresh['cached']
+    assert '61' not in advisor.model.prompts[0]
+    assert '51-100' in fresh['response']
+
+    poller.set(second)
+    reused = advisor.get_health_advice('Çölə çıxmaq olar?', language='az')
+    assert reused['cached']
+    assert reused['current_aqi'] == second
+    assert '61' not in reused['response'] and '93' not in reused['response']
+
+
+def test_profile_questions_keep_exact_aqi(tmp_path):
+    advisor = make_advisor(StaticPoller(dict.fromkeys(ADVISOR_DISTRICTS, 61)), tmp_path)
+    advisor.get_health_advice('Çölə çıxmaq olar?', {'condition': 'astma'}, language='az')
+    assert 'AQI 61' in advisor.model.prompts[0]
+
+
+class EmptyStreamModel:
+    def generate_content(self, prompt, stream=False, **kwargs):
+        return iter([_Response('')])
+
+
+def test_empty_stream_counts_as_breaker_failure(tmp_path):
+    advisor = make_advisor(StaticPoller(dict.fromkeys(ADVISOR_DISTRICTS, 61)), tmp_path)
+    advisor.model = EmptyStreamModel()
+    advisor.breaker = CircuitBreaker('test', open_seconds=0)
+    advisor.breaker.state = 'open'  # növbəti çağırış half_open sınağıdır
+    advisor.scheduler = type('Scheduler', (), {'acquire': staticmethod(lambda lane: 0.0)})()
+
+    events = list(advisor.stream_health_advice('Çölə çıxmaq olar?', {'condition': 'astma'}))
+    assert events[-1] == ('done', {'cached': False, 'fallback': True})
+    assert [e for e, _ in events].count('chunk') == 1
+    assert advisor.breaker.failures == 1
+    assert advisor.breaker.state == 'open'
@@ -0,0 +1,15 @@
+from agents.heatmap import HeatmapRenderer, empty_tile
+from agents.locations import AZERBAIJAN_LOCATIONS
+
+
+def test_tiles_outside_regions_are_not_covered():
+    heatmap = HeatmapRenderer(AZERBAIJAN_LOCATIONS)
+    assert heatmap.covers(0, 0, 0)
+    assert heatmap.covers(8, 163, 96)  # Bakı
+    assert not heatmap.covers(8, 0, 0)
+    assert not heatmap.covers(14, 1000, 1000)
+
+
+def test_empty_tile_is_shared_png():
+    assert empty_tile() is empty_tile()
+    assert empty_tile().startswith(b'\x89PNG')
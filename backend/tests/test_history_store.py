@@ -0,0 +1,53 @@
+import sqlite3
+
+from agents.history_store import METRICS, HistoryStore
+
+HOUR = 1_700_000_000 // 3600 * 3600
+
+
+def reading(aqi, pm2_5=None):
+    return {'aqi': aqi, 'pm2_5': pm2_5}
+
+
+def test_rollup_mean_ignores_missing_metric(tmp_path):
+    store = HistoryStore(str(tmp_path / 'h.db'), min_gap=0)
+    store.append({'Bakı': reading(100, 40)}, ts=HOUR)
+    store.append({'Bakı': reading(50)}, ts=HOUR + 60)
+
+    series = store.query(['Bakı'], HOUR, HOUR + 3600, 'hour', ('aqi', 'pm2_5'))['Bakı']
+    assert series['aqi_mean'] == [75.0]
+    # pm2_5 yalnız bir nöqtədə var - orta 20 deyil, 40-dır
+    assert series['pm2_5_mean'] == [40.0]
+
+
+def test_duplicate_polls_from_workers_are_written_once(tmp_path):
+    path = str(tmp_path / 'h.db')
+    workers = [HistoryStore(path, min_gap=300), HistoryStore(path, min_gap=300)]
+    assert workers[0].append({'Bakı': reading(100)}, ts=HOUR + 10) == 1
+    assert workers[1].append({'Bakı': reading(100)}, ts=HOUR + 12) == 0
+    assert workers[1].append({'Bakı': reading(80)}, ts=HOUR + 610) == 1
+
+    raw = workers[0].query(['Bakı'], HOUR, HOUR + 3600, 'raw', ('aqi',))['Bakı']
+    assert raw['ts'] == [HOUR + 10, HOUR + 610]
+    hourly = workers[0].query(['Bakı'], HOUR, HOUR + 3600, 'hour', ('aqi',))['Bakı']
+    assert hourly['aqi_mean'] == [90.0]
+
+
+def test_old_rollup_table_is_migrated(tmp_path):
+    path = str(tmp_path / 'h.db')
+    columns = ', '.join(f'{m}_{agg} REAL' for m in METRICS for agg in ('min', 'sum', 'max'))
+    conn = sqlite3.connect(path)
+    conn.execute(f'CREATE TABLE rollup_hour (district_id INTEGER NOT NULL, bucket INTEGER NOT NULL, '
+                 f'n INTEGER NOT NULL, {columns}, PRIMARY KEY (district_id, bucket)) WITHOUT ROWID')
+    conn.execute('CREATE TABLE districts (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    conn.execute("INSERT INTO districts (id, name) VALUES (1, 'Bakı')")
+    conn.execute('INSERT INTO rollup_hour (district_id, bucket, n, aqi_min, aqi_sum, aqi_max) '
+                 'VALUES (1, ?, 2, 40, 100, 60)', (HOUR,))
+    conn.commit()
+    conn.close()
+
+    store = HistoryStore(path, min_gap=0)
+    store.append({'Bakı': reading(80)}, ts=HOUR + 60)
+    series = store.query(['Bakı'], HOUR, HOUR + 3600, 'hour', ('aqi',))['Bakı']
+    assert series['aqi_mean'] == [60.0]
+    assert series['aqi_max'] == [80.0]
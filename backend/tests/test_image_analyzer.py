@@ -0,0 +1,19 @@
+import base64
+import io
+
+from PIL import Image
+
+from agents.image_analyzer import ImageAnalyzer
+
+
+def test_bytes_received_counts_decoded_size():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), (120, 130, 140)).save(buffer, format='JPEG')
+    raw = buffer.getvalue()
+    analyzer = ImageAnalyzer.__new__(ImageAnalyzer)
+    analyzer.refine = False
+    analyzer.bytes_received = 0
+
+    analyzer.analyze_image_data('data:image/jpeg;base64,' + base64.b64encode(raw).decode())
+    analyzer.analyze_image_data(raw)
+    assert analyzer.bytes_received == 2 * len(raw)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from agents.singleflight import SingleFlight
+
+
+def run_concurrently(flight, fn, callers=8):
+    '''callers thread eyni açarla do() çağırır: (nəticələr, xətalar)'''
+    results, errors = [], []
+    barrier = threading.Barrier(callers)
+
+    def call():
+        barrier.wait()
+        try:
+            results.append(flight.do('key', fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.2)
+        return object()
+
+    results, errors = run_concurrently(flight, fn)
+    assert len(calls) == 1
+    assert not errors
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert flight.stats()['coalesced'] == 7
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_error_is_raised_to_every_caller():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError('upstream')
+
+    results, errors = run_concurrently(flight, fn)
+    assert len(calls) == 1
+    assert not results
+    assert len(errors) == 8 and all(isinstance(e, RuntimeError) for e in errors)
+    # Xətadan sonra açar boşalır - növbəti çağırış yenidən icra olunur
+    assert flight.do('key', lambda: 'ok') == 'ok'
+
+
+def test_different_keys_run_independently():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do('c', lambda: int('x'))
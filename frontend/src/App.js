@@ -60,9 +60,27 @@ function App() {
     };
 
     fetchAQI();
-    const interval = setInterval(fetchAQI, 5 * 60 * 1000);
-    
-    return () => clearInterval(interval);
+
+    // Canlı yenilənmə: server yalnız dəyişən rayonları göndərir (SSE).
+    // Bağlantı qırılanda EventSource Last-Event-ID ilə özü yenidən qoşulur.
+    if (typeof EventSource === 'undefined') {
+      const interval = setInterval(fetchAQI, 5 * 60 * 1000);
+      return () => clearInterval(interval);
+    }
+    const source = new EventSource(`${API_URL}/api/aqi/stream`);
+    source.addEventListener('snapshot', (event) => {
+      setAqiData(JSON.parse(event.data).results);
+    });
+    source.addEventListener('delta', (event) => {
+      const delta = JSON.parse(event.data);
+      setAqiData((previous) => {
+        const next = { ...previous, ...delta.changed };
+        (delta.removed || []).forEach((name) => delete next[name]);
+        return next;
+      });
+    });
+
+    return () => source.close();
   }, [t.error]);
 
   const groupByCity = (data) => {